@@ -0,0 +1,384 @@
+import os
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import argparse
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from ...config.config import Config
+from ...utils.metadata_scanner import IMAGE_EXTENSIONS
+from .cascade import load_cascade, screened_result
+from .inference import compact_result
+from ..monitorAPIs.report_exporter import json_default, export_report, SUPPORTED_FORMATS
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_EXTENSIONS = ('.txt', '.lst', '.csv')
+
+
+def list_inputs(inputs):
+    """展开输入：目录递归列出图片，清单文件每行一个路径，其余视为图片路径"""
+    for item in inputs:
+        if os.path.isdir(item):
+            stack = [item]
+            while stack:
+                entries = []
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                            entries.append(entry.path)
+                yield from sorted(entries)
+        elif item.lower().endswith(MANIFEST_EXTENSIONS):
+            with open(item, encoding='utf-8') as f:
+                for line in f:
+                    path = line.split(',', 1)[0].strip()
+                    if path and not path.startswith('#'):
+                        yield path
+        else:
+            yield item
+
+
+def journal_path_for(inputs, model_name, job_dir=None):
+    """相同输入和模型对应同一个日志文件，重新提交即可续跑"""
+    key = json.dumps({'inputs': sorted(os.path.abspath(i) for i in inputs), 'model': model_name})
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    job_dir = job_dir or Config.batch_job_dir
+    os.makedirs(job_dir, exist_ok=True)
+    return os.path.join(job_dir, f"job_{digest}.db")
+
+
+class JobJournal:
+    """任务日志：记录每个条目的状态和结果，进程崩溃后可据此续跑"""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "id INTEGER PRIMARY KEY, path TEXT UNIQUE, status TEXT DEFAULT 'pending', "
+            "attempts INTEGER DEFAULT 0, result TEXT, error TEXT, finished REAL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_items_status ON items(status, id)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def add_items(self, paths, batch_size=5000):
+        """登记条目（已登记的路径保持原状态），返回新增数量"""
+        added = 0
+        batch = []
+        with self._lock:
+            for path in paths:
+                batch.append((path,))
+                if len(batch) >= batch_size:
+                    added += self._insert(batch)
+                    batch = []
+            if batch:
+                added += self._insert(batch)
+            self._conn.commit()
+        return added
+
+    def _insert(self, batch):
+        before = self._conn.total_changes
+        self._conn.executemany("INSERT OR IGNORE INTO items (path) VALUES (?)", batch)
+        return self._conn.total_changes - before
+
+    def retry_failed(self):
+        """失败的条目重新排队"""
+        with self._lock:
+            self._conn.execute("UPDATE items SET status='pending', attempts=0 WHERE status='failed'")
+            self._conn.commit()
+
+    def pending(self, after_id=0, limit=1000):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, path, attempts FROM items WHERE status='pending' AND id > ? "
+                "ORDER BY id LIMIT ?", (after_id, limit)).fetchall()
+
+    def checkpoint(self, updates):
+        """批量写入完成的条目：[(id, status, attempts, result, error)]"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE items SET status=?, attempts=?, result=?, error=?, finished=? WHERE id=?",
+                [(status, attempts, result, error, now, item_id)
+                 for item_id, status, attempts, result, error in updates])
+            self._conn.commit()
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall()
+        counts = {'pending': 0, 'done': 0, 'failed': 0}
+        counts.update(dict(rows))
+        counts['total'] = sum(counts.values())
+        return counts
+
+    def results(self, status='done'):
+        """逐条读取结果 (路径, 结果)"""
+        cursor = self._conn.cursor()
+        for path, result in cursor.execute(
+                "SELECT path, result FROM items WHERE status=? ORDER BY id", (status,)):
+            yield path, json.loads(result) if result else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Progress:
+    """按最近一段时间的完成速度估计吞吐量和剩余时间"""
+
+    def __init__(self, window=30.0):
+        self.window = window
+        self._points = deque()
+
+    def update(self, done):
+        now = time.monotonic()
+        self._points.append((now, done))
+        while len(self._points) > 2 and now - self._points[0][0] > self.window:
+            self._points.popleft()
+
+    def rate(self):
+        if len(self._points) < 2:
+            return 0.0
+        (t0, d0), (t1, d1) = self._points[0], self._points[-1]
+        return (d1 - d0) / (t1 - t0) if t1 > t0 else 0.0
+
+
+# 子进程中按权重路径缓存的模型
+_process_models = {}
+
+
+def detect_file(model_path, path):
+    """可在子进程中执行的检测函数：每个进程按权重路径只加载一次模型"""
+    from .inference import load_model, _compact_inference
+    model = _process_models.get(model_path)
+    if model is None:
+        model = _process_models[model_path] = load_model(model_path)
+    return _compact_inference(model, path)
+
+
+class BatchJob:
+    """可断点续跑的批量检测任务
+
+    条目先登记到日志，再由多个工作线程（或进程）并行处理；完成结果按
+    checkpoint_every 条或 checkpoint_interval 秒批量写回日志。中断后用同一
+    日志重新运行时，已完成的条目不会重复处理。
+
+    每个条目调用 detect_fn(*detect_args, 路径)。use_processes=True 时在进程池中
+    执行，detect_fn 必须是模块级函数、detect_args 必须可 pickle（lambda 和闭包
+    不行），如 detect_file 配合 detect_args=(权重路径,)。
+
+    cascade 为 CascadeDetector 时启用级联模式：每批待处理条目先整批初筛，
+    判为阴性的直接记为完成，只有其余条目送入 detect_fn。
+    """
+
+    def __init__(self, journal_path, detect_fn, workers=None, use_processes=False,
+                 checkpoint_every=200, checkpoint_interval=2.0, max_attempts=2, cascade=None,
+                 detect_args=()):
+        if use_processes:
+            try:
+                pickle.dumps((detect_fn, tuple(detect_args)))
+            except Exception as e:
+                raise ValueError(f"多进程模式需要模块级检测函数和可序列化的参数: {str(e)}") from e
+        self.journal = JobJournal(journal_path)
+        self.cascade = cascade
+        self.detect_fn = detect_fn
+        self.detect_args = tuple(detect_args)
+        self.workers = workers or Config.worker_count
+        self.use_processes = use_processes
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self.max_attempts = max_attempts
+        self._stop = threading.Event()
+
+    def add_inputs(self, inputs):
+        """登记目录/清单/图片路径"""
+        return self.journal.add_items(list_inputs(inputs))
+
+    def stop(self):
+        """请求停止：已提交的条目完成并写回日志后返回"""
+        self._stop.set()
+
+    def run(self, progress_callback=None, retry_failed=False):
+        """处理所有未完成条目，返回最终进度（stop() 之后需新建任务对象续跑）"""
+        if retry_failed:
+            self.journal.retry_failed()
+        counts = self.journal.counts()
+        total = counts['total']
+        done = counts['done'] + counts['failed']
+        failed = counts['failed']
+        processed = 0
+        progress = _Progress()
+        progress.update(done)
+
+        executor_cls = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        max_in_flight = self.workers * 4
+        updates = []
+        last_checkpoint = time.monotonic()
+        last_id = 0
+        queue = deque()
+        running = {}
+        started = time.monotonic()
+
+        def report():
+            rate = progress.rate()
+            remaining = total - done
+            info = {'total': total, 'done': done, 'processed': processed,
+                    'failed': failed, 'rate': rate,
+                    'eta': remaining / rate if rate > 0 else None,
+                    'elapsed': time.monotonic() - started}
+            if progress_callback is not None:
+                progress_callback(info)
+            return info
+
+        def screen(rows):
+            # 级联初筛：阴性条目直接完成，返回需要完整检测的条目
+            nonlocal done, processed
+            scores = self.cascade.scores([path for _, path, _ in rows])
+            escalate = []
+            for item_id, path, attempts in rows:
+                score = scores.get(path)
+                if score is not None and score < self.cascade.threshold:
+                    updates.append((item_id, 'done', attempts + 1,
+                                    json.dumps(screened_result(score)), None))
+                    done += 1
+                    processed += 1
+                else:
+                    # 初筛读取失败的条目也交给完整检测处理
+                    escalate.append((item_id, path, attempts))
+            return escalate
+
+        executor = executor_cls(max_workers=self.workers)
+        try:
+            while True:
+                # 按 id 顺序分批读取待处理条目（级联模式下整页都被筛掉时继续读下一页）
+                while not queue and not self._stop.is_set():
+                    rows = self.journal.pending(last_id, limit=max_in_flight * 4)
+                    if not rows:
+                        break
+                    last_id = rows[-1][0]
+                    if self.cascade is not None:
+                        rows = screen(rows)
+                        if updates and time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                            self.journal.checkpoint(updates)
+                            updates = []
+                            last_checkpoint = time.monotonic()
+                            progress.update(done)
+                            report()
+                    queue.extend(rows)
+                while queue and len(running) < max_in_flight and not self._stop.is_set():
+                    item_id, path, attempts = queue.popleft()
+                    future = executor.submit(self.detect_fn, *self.detect_args, path)
+                    running[future] = (item_id, path, attempts)
+                if not running:
+                    break
+
+                finished, _ = wait(running, timeout=self.checkpoint_interval,
+                                   return_when=FIRST_COMPLETED)
+                for future in finished:
+                    item_id, path, attempts = running.pop(future)
+                    attempts += 1
+                    try:
+                        # 掩码压缩为 RLE，NumPy 数值按数值写入日志
+                        result = json.dumps(compact_result(future.result()), ensure_ascii=False,
+                                            default=json_default)
+                        updates.append((item_id, 'done', attempts, result, None))
+                        done += 1
+                    except Exception as e:
+                        if attempts < self.max_attempts:
+                            queue.append((item_id, path, attempts))
+                            continue
+                        logger.warning(f"检测失败: {path}: {str(e)}")
+                        updates.append((item_id, 'failed', attempts, None, str(e)))
+                        done += 1
+                        failed += 1
+                    processed += 1
+
+                now = time.monotonic()
+                if updates and (len(updates) >= self.checkpoint_every
+                                or now - last_checkpoint >= self.checkpoint_interval):
+                    self.journal.checkpoint(updates)
+                    updates = []
+                    last_checkpoint = now
+                    progress.update(done)
+                    report()
+        finally:
+            # 中断（包括 KeyboardInterrupt）时也写回已完成的条目，未完成的下次重新处理
+            executor.shutdown(wait=True, cancel_futures=True)
+            if updates:
+                self.journal.checkpoint(updates)
+        progress.update(done)
+        return report()
+
+    def records(self, model_name=None):
+        """已完成条目转为导出记录（供 ReportExporter 流式写出）"""
+        for path, result in self.journal.results():
+            record = dict(result) if isinstance(result, dict) else {'result': result}
+            record['image_path'] = path
+            if model_name is not None:
+                record.setdefault('model', model_name)
+            yield record
+
+    def close(self):
+        self.journal.close()
+
+
+def main():
+    from .inference import load_model, _compact_inference
+
+    parser = argparse.ArgumentParser(description="批量检测目录或清单中的图片，中断后重新运行即可续跑")
+    parser.add_argument('inputs', nargs='+', help="图片目录、清单文件（每行一个路径）或图片路径")
+    parser.add_argument('--model', default=Config.model_path, help="模型权重路径")
+    parser.add_argument('--journal', default=None, help="任务日志路径（默认按输入和模型生成）")
+    parser.add_argument('--workers', type=int, default=Config.worker_count)
+    parser.add_argument('--processes', action='store_true',
+                        help="在多个进程中检测（每个进程各加载一份模型）")
+    parser.add_argument('--retry-failed', action='store_true', help="重试上次失败的条目")
+    parser.add_argument('--export', default=None, metavar='DIR', help="完成后将结果导出到该目录")
+    parser.add_argument('--formats', default="csv,jsonl,html",
+                        help=f"导出格式，逗号分隔（可选 {','.join(SUPPORTED_FORMATS)}）")
+    parser.add_argument('--overlay', action='store_true', help="导出时同时生成检测叠加图")
+    parser.add_argument('--cascade', nargs='?', const='', default=None,
+                        metavar='HEAD', help="启用级联初筛（分类头路径，默认取配置）")
+    args = parser.parse_args()
+
+    journal_path = args.journal or journal_path_for(args.inputs, args.model)
+    cascade = load_cascade(args.cascade or None) if args.cascade is not None else None
+    if args.processes:
+        job = BatchJob(journal_path, detect_file, workers=args.workers, use_processes=True,
+                       cascade=cascade, detect_args=(args.model,))
+    else:
+        model = load_model(args.model)
+        job = BatchJob(journal_path, lambda path: _compact_inference(model, path),
+                       workers=args.workers, cascade=cascade)
+    added = job.add_inputs(args.inputs)
+    print(f"任务日志: {journal_path}，新增 {added} 条")
+
+    def show(info):
+        eta = "--" if info['eta'] is None else time.strftime('%H:%M:%S', time.gmtime(info['eta']))
+        print(f"\r{info['done']}/{info['total']}  {info['rate']:.1f} 张/秒  "
+              f"失败 {info['failed']}  剩余 {eta}", end="", flush=True)
+
+    try:
+        job.run(show, retry_failed=args.retry_failed)
+    except KeyboardInterrupt:
+        print("\n已中断，进度已保存，重新运行同一命令即可续跑")
+        return
+    print()
+    if args.export:
+        summary = export_report(job.records(args.model), args.export,
+                                formats=[f.strip() for f in args.formats.split(',') if f.strip()],
+                                overlay=args.overlay)
+        print(f"已导出 {summary['rows']} 条结果到 {args.export}")
+    job.close()
+
+
+if __name__ == "__main__":
+    main()
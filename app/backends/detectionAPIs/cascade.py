@@ -0,0 +1,293 @@
+import csv
+import json
+import time
+import argparse
+import logging
+import numpy as np
+from ...config.config import Config
+from .preprocess import BatchPreprocessor
+
+logger = logging.getLogger(__name__)
+
+try:
+    import torch
+    import torch.nn as nn
+except ImportError:  # 早期特征初筛需要 PyTorch
+    torch = nn = None
+
+
+class EarlyFeatureExtractor:
+    """截取 ResNet 前几个阶段（到 layer1 或 layer2）作为轻量 CPU 特征提取器
+
+    输出全局平均池化与最大池化拼接后的特征，计算量约为完整检测器的一小部分。
+    """
+
+    def __init__(self, backbone=None, stage='layer2'):
+        if torch is None:
+            raise ImportError("早期特征初筛需要安装 PyTorch")
+        if backbone is None:
+            import torchvision
+            backbone = torchvision.models.resnet18(weights='DEFAULT')
+        layers = [backbone.conv1, backbone.bn1, backbone.relu, backbone.maxpool, backbone.layer1]
+        if stage == 'layer2':
+            layers.append(backbone.layer2)
+        elif stage != 'layer1':
+            raise ValueError(f"不支持的阶段: {stage}")
+        self.body = nn.Sequential(*layers).eval()
+
+    def __call__(self, batch):
+        """batch 为 (N, 3, H, W) 的 NumPy 数组或张量，返回 (N, 2C) 特征"""
+        with torch.no_grad():
+            x = torch.as_tensor(batch)
+            features = self.body(x)
+            pooled = torch.cat([features.mean(dim=(2, 3)), features.amax(dim=(2, 3))], dim=1)
+        return pooled.numpy()
+
+
+class LogisticHead:
+    """初筛分类头：特征标准化后的逻辑回归（牛顿法拟合，无需训练框架）"""
+
+    def __init__(self, l2=1e-2, stage='layer2'):
+        self.l2 = l2
+        self.stage = stage  # 特征提取截取的阶段
+        self.threshold = None  # 在验证集上调好的初筛阈值，随分类头一起保存
+        self.mean = self.std = self.weights = None
+
+    def fit(self, features, labels, iterations=25):
+        x = np.asarray(features, dtype=np.float64)
+        y = np.asarray(labels, dtype=np.float64)
+        self.mean = x.mean(axis=0)
+        self.std = x.std(axis=0) + 1e-6
+        x = np.hstack([(x - self.mean) / self.std, np.ones((len(x), 1))])
+        w = np.zeros(x.shape[1])
+        reg = self.l2 * np.eye(x.shape[1])
+        reg[-1, -1] = 0.0  # 偏置不做正则
+        for _ in range(iterations):
+            p = 1.0 / (1.0 + np.exp(-x @ w))
+            gradient = x.T @ (p - y) + reg @ w
+            hessian = (x * (p * (1 - p))[:, None]).T @ x + reg
+            step = np.linalg.solve(hessian, gradient)
+            w -= step
+            if np.abs(step).max() < 1e-6:
+                break
+        self.weights = w
+        return self
+
+    def predict(self, features):
+        """返回阳性概率"""
+        x = (np.asarray(features, dtype=np.float64) - self.mean) / self.std
+        return 1.0 / (1.0 + np.exp(-(x @ self.weights[:-1] + self.weights[-1])))
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'mean': self.mean.tolist(), 'std': self.std.tolist(),
+                       'weights': self.weights.tolist(), 'l2': self.l2,
+                       'stage': self.stage, 'threshold': self.threshold}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        head = cls(data['l2'], data.get('stage', 'layer2'))
+        head.threshold = data.get('threshold')
+        head.mean, head.std, head.weights = (np.asarray(data[k]) for k in ('mean', 'std', 'weights'))
+        return head
+
+
+def tune_threshold(scores, labels, target_recall=None):
+    """选择满足目标召回率的最大阈值（阈值越大，送入完整检测器的帧越少）"""
+    target_recall = Config.cascade_target_recall if target_recall is None else target_recall
+    if not 0.0 < target_recall <= 1.0:
+        raise ValueError(f"目标召回率应在 (0, 1] 内: {target_recall}")
+    scores = np.asarray(scores, dtype=np.float64)
+    positives = np.sort(scores[np.asarray(labels, dtype=bool)])
+    if not len(positives):
+        return 0.0
+    # 允许漏掉的阳性数（至少保留一个阳性）
+    allowed = int(np.floor(len(positives) * (1.0 - target_recall) + 1e-9))
+    return float(positives[min(allowed, len(positives) - 1)])
+
+
+def screened_result(score):
+    """初筛判为阴性的帧的结果"""
+    return {'detected': False, 'confidence': 1.0 - float(score),
+            'screen_score': float(score), 'screened': True}
+
+
+class CascadeDetector:
+    """两级级联：轻量初筛对每帧打分，只有分数不低于阈值的帧送入完整检测器
+
+    screen_fn(batch) -> 阳性概率数组；detect_fn(path) -> 完整检测结果。
+    """
+
+    def __init__(self, screen_fn, detect_fn, threshold, size=(224, 224), batch_size=16):
+        self.screen_fn = screen_fn
+        self.detect_fn = detect_fn
+        self.threshold = threshold
+        self.size = size
+        self.batch_size = batch_size
+        self.stats = {'frames': 0, 'escalated': 0, 'screen_seconds': 0.0, 'detect_seconds': 0.0}
+
+    def scores(self, paths):
+        """只做初筛，返回 {路径: 分数}"""
+        result = {}
+        with BatchPreprocessor(self.size, self.batch_size) as preprocessor:
+            for batch, batch_paths in preprocessor.batches(paths):
+                start = time.perf_counter()
+                for path, score in zip(batch_paths, self.screen_fn(batch)):
+                    result[path] = float(score)
+                self.stats['screen_seconds'] += time.perf_counter() - start
+        return result
+
+    def run(self, paths):
+        """逐帧产出 (路径, 结果)；初筛判为阴性的帧结果为 {'detected': False, 'screened': True}"""
+        with BatchPreprocessor(self.size, self.batch_size) as preprocessor:
+            for batch, batch_paths in preprocessor.batches(paths):
+                start = time.perf_counter()
+                scores = self.screen_fn(batch)
+                self.stats['screen_seconds'] += time.perf_counter() - start
+                for path, score in zip(batch_paths, scores):
+                    self.stats['frames'] += 1
+                    if score < self.threshold:
+                        yield path, screened_result(score)
+                        continue
+                    self.stats['escalated'] += 1
+                    start = time.perf_counter()
+                    result = self.detect_fn(path)
+                    self.stats['detect_seconds'] += time.perf_counter() - start
+                    yield path, result
+
+    def escalation_rate(self):
+        frames = self.stats['frames']
+        return self.stats['escalated'] / frames if frames else 0.0
+
+
+def load_cascade(head_path=None, detect_fn=None, threshold=None):
+    """加载保存的分类头及其阈值，构建级联检测器（head_path 默认取配置）"""
+    head_path = head_path or Config.cascade_head_path
+    if not head_path:
+        raise ValueError("未配置级联初筛分类头（Config.cascade_head_path）")
+    head = LogisticHead.load(head_path)
+    threshold = head.threshold if threshold is None else threshold
+    if threshold is None:
+        raise ValueError(f"分类头 {head_path} 中没有阈值，请先用验证集调阈值")
+    extractor = EarlyFeatureExtractor(stage=head.stage)
+    logger.info(f"已加载级联初筛 {head_path}: 阈值 {threshold:.4f}")
+    return CascadeDetector(lambda batch: head.predict(extractor(batch)), detect_fn, threshold)
+
+
+def _is_positive(result):
+    return bool(result and result.get('detected'))
+
+
+def measure_full_detector(detect_fn, paths, sample_size=32):
+    """在均匀抽取的固定样本上实测完整检测器每帧耗时（不区分阴阳性，避免偏差）"""
+    paths = list(paths)
+    if not paths:
+        return 0.0, 0
+    step = max(1, len(paths) // sample_size)
+    sample = paths[::step][:sample_size]
+    start = time.perf_counter()
+    for path in sample:
+        detect_fn(path)
+    return (time.perf_counter() - start) / len(sample), len(sample)
+
+
+def evaluate(cascade, paths, labels, full_seconds_per_frame=None, full_sample=32):
+    """在带标注的验证集上评估级联：召回率、送检比例和相对完整检测的吞吐量提升
+
+    full_seconds_per_frame 为空时在评估集中均匀抽取 full_sample 帧，实测完整
+    检测器的每帧耗时作为对比基准。
+    """
+    measured = 0
+    if full_seconds_per_frame is None:
+        full_seconds_per_frame, measured = measure_full_detector(
+            cascade.detect_fn, paths, full_sample)
+    labels = dict(zip(paths, (bool(l) for l in labels)))
+    start = time.perf_counter()
+    predictions = dict(cascade.run(paths))
+    elapsed = time.perf_counter() - start
+
+    tp = sum(1 for p, l in labels.items() if l and _is_positive(predictions.get(p)))
+    fn = sum(1 for p, l in labels.items() if l and not _is_positive(predictions.get(p)))
+    screened_out = sum(1 for p, l in labels.items()
+                       if l and predictions.get(p, {}).get('screened'))
+    full_elapsed = full_seconds_per_frame * len(paths)
+    return {
+        'frames': len(paths),
+        'positives': tp + fn,
+        'recall': tp / (tp + fn) if tp + fn else 1.0,
+        'missed_by_screen': screened_out,
+        'escalation_rate': cascade.escalation_rate(),
+        'threshold': cascade.threshold,
+        'full_seconds_per_frame': full_seconds_per_frame,
+        'full_sample': measured,
+        'cascade_fps': len(paths) / elapsed if elapsed else 0.0,
+        'full_fps': len(paths) / full_elapsed if full_elapsed else 0.0,
+        'speedup': full_elapsed / elapsed if elapsed else 0.0,
+    }
+
+
+def _read_manifest(path):
+    """读取标注清单：每行 '图片路径,标签(0/1)'"""
+    paths, labels = [], []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if len(row) >= 2 and not row[0].startswith('#'):
+                try:
+                    labels.append(int(row[1]))
+                except ValueError:
+                    continue  # 表头
+                paths.append(row[0])
+    return paths, labels
+
+
+def _recall(value):
+    value = float(value)
+    if not 0.0 < value <= 1.0:
+        raise argparse.ArgumentTypeError(f"目标召回率应在 (0, 1] 内: {value}")
+    return value
+
+
+def main():
+    from .inference import load_model, inference
+
+    parser = argparse.ArgumentParser(description="训练初筛分类头、按目标召回率调阈值并评估级联检测")
+    parser.add_argument('manifest', help="标注清单 CSV：图片路径,标签(0/1)")
+    parser.add_argument('--model', default=Config.model_path, help="完整检测模型权重")
+    parser.add_argument('--stage', choices=['layer1', 'layer2'], default='layer2')
+    parser.add_argument('--target-recall', type=_recall, default=Config.cascade_target_recall)
+    parser.add_argument('--head', default="cascade_head.json", help="分类头保存路径")
+    args = parser.parse_args()
+
+    paths, labels = _read_manifest(args.manifest)
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(paths))
+    # 训练 / 调阈值 / 评估 三份
+    splits = np.array_split(order, 3)
+    extractor = EarlyFeatureExtractor(stage=args.stage)
+
+    def features_of(indices):
+        feats = {}
+        with BatchPreprocessor((224, 224), 16) as preprocessor:
+            for batch, batch_paths in preprocessor.batches([paths[i] for i in indices]):
+                feats.update(zip(batch_paths, extractor(batch)))
+        kept = [i for i in indices if paths[i] in feats]
+        return np.stack([feats[paths[i]] for i in kept]), np.array([labels[i] for i in kept])
+
+    x_train, y_train = features_of(splits[0])
+    head = LogisticHead(stage=args.stage).fit(x_train, y_train)
+    x_cal, y_cal = features_of(splits[1])
+    threshold = tune_threshold(head.predict(x_cal), y_cal, args.target_recall)
+    head.threshold = threshold
+    head.save(args.head)
+
+    model = load_model(args.model)
+    cascade = CascadeDetector(lambda batch: head.predict(extractor(batch)),
+                              lambda path: inference(model, path), threshold)
+    report = evaluate(cascade, [paths[i] for i in splits[2]], [labels[i] for i in splits[2]])
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import time
+import logging
+import numpy as np
+from ...config.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def to_gray(image):
+    """转为 float32 灰度图"""
+    image = np.asarray(image)
+    if image.ndim == 3:
+        image = image.mean(axis=2, dtype=np.float32)
+    return image.astype(np.float32, copy=False)
+
+
+def block_difference(prev, cur, block_size):
+    """按块计算两帧灰度平均绝对差，返回 (Hb, Wb) 差异图"""
+    diff = np.abs(to_gray(cur) - to_gray(prev))
+    h, w = diff.shape
+    pad_h = (-h) % block_size
+    pad_w = (-w) % block_size
+    if pad_h or pad_w:
+        diff = np.pad(diff, ((0, pad_h), (0, pad_w)), mode='edge')
+    hb, wb = diff.shape[0] // block_size, diff.shape[1] // block_size
+    return diff.reshape(hb, block_size, wb, block_size).mean(axis=(1, 3))
+
+
+def _dilate(mask, margin):
+    """按 margin 个块膨胀变化掩码"""
+    if margin <= 0:
+        return mask
+    out = mask.copy()
+    for dy in range(-margin, margin + 1):
+        for dx in range(-margin, margin + 1):
+            shifted = np.zeros_like(mask)
+            ys = slice(max(dy, 0), mask.shape[0] + min(dy, 0))
+            xs = slice(max(dx, 0), mask.shape[1] + min(dx, 0))
+            ys_src = slice(max(-dy, 0), mask.shape[0] + min(-dy, 0))
+            xs_src = slice(max(-dx, 0), mask.shape[1] + min(-dx, 0))
+            shifted[ys, xs] = mask[ys_src, xs_src]
+            out |= shifted
+    return out
+
+
+def changed_regions(mask, block_size, image_shape, margin=1):
+    """将变化块掩码转为像素坐标下的 ROI 列表 [(x1, y1, x2, y2), ...]"""
+    mask = _dilate(mask, margin)
+    visited = np.zeros_like(mask)
+    regions = []
+    hb, wb = mask.shape
+    height, width = image_shape[:2]
+    for y0, x0 in zip(*np.nonzero(mask)):
+        if visited[y0, x0]:
+            continue
+        # 四连通区域生长，记录外接矩形
+        stack = [(y0, x0)]
+        visited[y0, x0] = True
+        y1, x1, y2, x2 = y0, x0, y0, x0
+        while stack:
+            y, x = stack.pop()
+            y1, x1, y2, x2 = min(y1, y), min(x1, x), max(y2, y), max(x2, x)
+            for ny, nx in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+                if 0 <= ny < hb and 0 <= nx < wb and mask[ny, nx] and not visited[ny, nx]:
+                    visited[ny, nx] = True
+                    stack.append((ny, nx))
+        regions.append((
+            int(x1 * block_size), int(y1 * block_size),
+            int(min((x2 + 1) * block_size, width)), int(min((y2 + 1) * block_size, height)),
+        ))
+    return regions
+
+
+def _intersects(box, region):
+    return not (box[2] <= region[0] or box[0] >= region[2] or
+                box[3] <= region[1] or box[1] >= region[3])
+
+
+def box_iou(a, b):
+    """两个 (x1, y1, x2, y2) 框的 IoU"""
+    iw = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    ih = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = iw * ih
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class ChangeDrivenDetector:
+    """变化驱动的检测前级：只在变化区域上重新检测，未变化区域沿用上一帧结果
+
+    detect_fn(image) 返回检测列表，每项为 {'bbox': (x1, y1, x2, y2), 'score', 'label'}。
+    """
+
+    def __init__(self, detect_fn, block_size=None, pixel_threshold=None,
+                 skip_ratio=None, full_ratio=None, margin=None, keyframe_interval=None):
+        self.detect_fn = detect_fn
+        self.block_size = block_size or Config.change_block_size
+        self.pixel_threshold = pixel_threshold if pixel_threshold is not None else Config.change_pixel_threshold
+        self.skip_ratio = skip_ratio if skip_ratio is not None else Config.change_skip_ratio
+        self.full_ratio = full_ratio if full_ratio is not None else Config.change_full_ratio
+        self.margin = margin if margin is not None else Config.change_roi_margin
+        self.keyframe_interval = keyframe_interval if keyframe_interval is not None else Config.change_keyframe_interval
+        self.reset()
+
+    def reset(self):
+        """清空上一帧状态和统计"""
+        self._prev_gray = None
+        self._detections = []
+        self._since_keyframe = 0
+        self.stats = {'frames': 0, 'skipped': 0, 'roi': 0, 'full': 0,
+                      'pixels_total': 0, 'pixels_processed': 0}
+
+    def _run_full(self, frame):
+        self.stats['full'] += 1
+        self.stats['pixels_processed'] += frame.shape[0] * frame.shape[1]
+        self._since_keyframe = 0
+        return list(self.detect_fn(frame))
+
+    def process(self, frame):
+        """处理一帧，返回 (检测结果, 模式)，模式为 'full' / 'roi' / 'skip'"""
+        frame = np.asarray(frame)
+        self.stats['frames'] += 1
+        self.stats['pixels_total'] += frame.shape[0] * frame.shape[1]
+
+        # 与最近一次实际检测（全帧或 ROI）的帧比较：跳过的帧不更新参考，
+        # 小幅或渐变的变化会逐帧累积，直到超过阈值后触发重新检测
+        gray = to_gray(frame)
+        prev = self._prev_gray
+        self._since_keyframe += 1
+        if (prev is None or prev.shape != gray.shape or
+                self._since_keyframe >= self.keyframe_interval):
+            self._prev_gray = gray
+            self._detections = self._run_full(frame)
+            return self._detections, 'full'
+
+        diff = block_difference(prev, gray, self.block_size)
+        mask = diff > self.pixel_threshold
+        ratio = float(mask.mean())
+        if ratio <= self.skip_ratio:
+            self.stats['skipped'] += 1
+            return self._detections, 'skip'
+        self._prev_gray = gray
+        if ratio >= self.full_ratio:
+            self._detections = self._run_full(frame)
+            return self._detections, 'full'
+
+        regions = changed_regions(mask, self.block_size, frame.shape, self.margin)
+        # 与变化区域不相交的旧检测直接沿用
+        detections = [d for d in self._detections
+                      if not any(_intersects(d['bbox'], r) for r in regions)]
+        for x1, y1, x2, y2 in regions:
+            self.stats['pixels_processed'] += (x2 - x1) * (y2 - y1)
+            for det in self.detect_fn(frame[y1:y2, x1:x2]):
+                bx1, by1, bx2, by2 = det['bbox']
+                det = dict(det)
+                det['bbox'] = (bx1 + x1, by1 + y1, bx2 + x1, by2 + y1)
+                detections.append(det)
+        self.stats['roi'] += 1
+        self._detections = detections
+        return detections, 'roi'
+
+    def compute_saved(self):
+        """按处理像素估算节省的计算比例"""
+        total = self.stats['pixels_total']
+        return 1.0 - self.stats['pixels_processed'] / total if total else 0.0
+
+
+def _match(reference, candidate, iou_threshold):
+    """贪心匹配，返回匹配上的数量"""
+    used = set()
+    matched = 0
+    for ref in sorted(reference, key=lambda d: -d.get('score', 0)):
+        best, best_iou = None, iou_threshold
+        for i, cand in enumerate(candidate):
+            if i in used or cand.get('label') != ref.get('label'):
+                continue
+            iou = box_iou(ref['bbox'], cand['bbox'])
+            if iou >= best_iou:
+                best, best_iou = i, iou
+        if best is not None:
+            used.add(best)
+            matched += 1
+    return matched
+
+
+def evaluate_sequence(frames, detect_fn, iou_threshold=0.5, **kwargs):
+    """在录制序列上对比全帧检测与变化驱动检测，报告节省的计算量与精度
+
+    以全帧检测结果为参考，返回节省的像素比例、检测耗时以及
+    变化驱动结果的 precision / recall。
+    """
+    detector = ChangeDrivenDetector(detect_fn, **kwargs)
+    full_time = cd_time = 0.0
+    ref_total = cand_total = matched = 0
+    for frame in frames:
+        start = time.perf_counter()
+        reference = list(detect_fn(frame))
+        full_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        candidate, _ = detector.process(frame)
+        cd_time += time.perf_counter() - start
+
+        ref_total += len(reference)
+        cand_total += len(candidate)
+        matched += _match(reference, candidate, iou_threshold)
+
+    report = dict(detector.stats)
+    report.update({
+        'compute_saved': detector.compute_saved(),
+        'full_time': full_time,
+        'change_driven_time': cd_time,
+        'time_saved': 1.0 - cd_time / full_time if full_time else 0.0,
+        'precision': matched / cand_total if cand_total else 1.0,
+        'recall': matched / ref_total if ref_total else 1.0,
+    })
+    logger.info(
+        f"变化驱动检测: 跳过 {report['skipped']}/{report['frames']} 帧, "
+        f"节省计算 {report['compute_saved']:.1%}, 耗时节省 {report['time_saved']:.1%}, "
+        f"precision {report['precision']:.3f}, recall {report['recall']:.3f}"
+    )
+    return report
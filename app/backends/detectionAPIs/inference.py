@@ -1,3 +1,18 @@
+import weakref
+import threading
+from ...utils.singleflight import SingleFlight, request_key
+from ...utils.mask_codec import compact_detections, encode_batch
+from ...utils.phash import DedupInference
+from ..systemAPIs.profiler import slow_request_watcher
+
+# 相同图片、模型和参数的并发请求共享同一次推理
+inference_flight = SingleFlight()
+
+# 每个模型一个近重复索引：同一序列中感知哈希相近的帧复用已有结果
+# 模型名 -> (模型弱引用, DedupInference)
+_dedup_by_model = {}
+_dedup_lock = threading.Lock()
+
 def inference(model, image_path):
     pass
 
@@ -7,4 +22,55 @@ def load_model(model_path):
 def load_image(image_path):
     pass
 
+def compact_result(result):
+    """将推理结果中的稠密掩码转为 RLE，接口只返回压缩后的掩码"""
+    if not isinstance(result, dict):
+        return result
+    result = dict(result)
+    masks = result.get('masks')
+    if masks is not None and not isinstance(masks, list):
+        result['masks'] = encode_batch(masks)
+    if result.get('detections'):
+        result['detections'] = compact_detections(result['detections'])
+    return result
+
+def _compact_inference(model, image_path):
+    # 所有推理入口都经过这里，耗时超过阈值时自动采样调用栈
+    with slow_request_watcher.track(f"inference {image_path}"):
+        return compact_result(inference(model, image_path))
+
+def shared_inference(model, image_path, model_name, params=None):
+    """去重推理：并发的相同请求只计算一次，全部请求获得同一结果"""
+    key = request_key(image_path, model_name, params)
+    return inference_flight.do(key, _compact_inference, model, image_path)
+
+def get_dedup_stats():
+    """返回请求去重统计（共享次数、节省的计算时间等）"""
+    return {'status': 'success', 'stats': inference_flight.stats()}
+
+def _model_ref(model):
+    # 弱引用不延长旧模型的生命周期（热替换后可及时释放）
+    try:
+        return weakref.ref(model)
+    except TypeError:
+        return lambda: model
+
+def dedup_inference(model, image_path, model_name, series=None):
+    """近重复帧跳过推理，返回 (结果, 复用的源图片路径或 None)"""
+    with _dedup_lock:
+        entry = _dedup_by_model.get(model_name)
+        if entry is None or entry[0]() is not model:
+            # 模型被替换（热替换或重新加载权重）后，旧模型的结果不再复用
+            if entry is not None:
+                entry[1].close()
+            entry = _dedup_by_model[model_name] = (_model_ref(model), DedupInference())
+    dedup = entry[1]
+    return dedup.process(image_path, series,
+                         detect_fn=lambda path: _compact_inference(model, path))
 
+def get_skip_stats():
+    """返回近重复跳过率统计"""
+    with _dedup_lock:
+        entries = [(name, dedup) for name, (_, dedup) in _dedup_by_model.items()]
+    return {'status': 'success',
+            'stats': {name: dedup.report() for name, dedup in entries}}
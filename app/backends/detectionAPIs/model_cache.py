@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from ...config.config import Config
+
+logger = logging.getLogger(__name__)
+
+try:
+    import torch
+except ImportError:  # 模型缓存需要 PyTorch
+    torch = None
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """流式计算文件 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _flatten_outputs(output):
+    """将模型输出（张量/元组/字典）展开为张量列表"""
+    if isinstance(output, torch.Tensor):
+        return [output]
+    if isinstance(output, dict):
+        return [t for key in sorted(output) for t in _flatten_outputs(output[key])]
+    if isinstance(output, (list, tuple)):
+        return [t for item in output for t in _flatten_outputs(item)]
+    return []
+
+
+def state_dict_digest(model):
+    """模型参数和缓冲区内容的 SHA-256（未指定权重文件时用于区分预训练/随机初始化）"""
+    digest = hashlib.sha256()
+    for name, tensor in sorted(model.state_dict().items()):
+        digest.update(name.encode('utf-8'))
+        digest.update(str(tuple(tensor.shape)).encode('utf-8'))
+        digest.update(tensor.detach().cpu().contiguous().view(-1).view(torch.uint8).numpy().tobytes())
+    return digest.hexdigest()
+
+
+def max_abs_error(expected, actual):
+    """两组输出的最大绝对误差"""
+    expected, actual = _flatten_outputs(expected), _flatten_outputs(actual)
+    if len(expected) != len(actual):
+        return float('inf')
+    error = 0.0
+    for a, b in zip(expected, actual):
+        if a.shape != b.shape:
+            return float('inf')
+        error = max(error, float((a.float() - b.float()).abs().max()))
+    return error
+
+
+def load_state_dict(weights_path):
+    """以 mmap 方式加载权重（旧版 PyTorch 不支持时退回普通加载）"""
+    try:
+        return torch.load(weights_path, map_location='cpu', mmap=True, weights_only=True)
+    except TypeError:
+        return torch.load(weights_path, map_location='cpu')
+
+
+class ModelArtifactCache:
+    """缓存 (模型, 权重) 对应的 TorchScript 冻结模型
+
+    首次加载时构建模型、转为 channels_last、trace 后 freeze 并做推理优化
+    （融合 Conv+BN 等），与原始权重的输出比对通过后写入缓存目录；之后直接
+    加载缓存的 TorchScript 文件，跳过 Python 端建模和权重加载。
+    """
+
+    def __init__(self, cache_dir=None, atol=1e-3, rtol=1e-3):
+        if torch is None:
+            raise ImportError("模型缓存需要安装 PyTorch")
+        self.cache_dir = cache_dir or Config.model_cache_dir
+        self.atol = atol
+        self.rtol = rtol
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _key(self, model_name, weights_id, input_shape):
+        parts = [model_name, torch.__version__, "x".join(str(d) for d in input_shape), weights_id]
+        return hashlib.sha256("|".join(parts).encode('utf-8')).hexdigest()[:32]
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".pt", base + ".json", base + ".ref.pt"
+
+    def build(self, model, example_input):
+        """trace + freeze + 推理优化，返回 TorchScript 模块"""
+        model = model.eval().to(memory_format=torch.channels_last)
+        example_input = example_input.contiguous(memory_format=torch.channels_last)
+        with torch.no_grad():
+            traced = torch.jit.trace(model, example_input)
+            frozen = torch.jit.freeze(traced)
+            try:
+                frozen = torch.jit.optimize_for_inference(frozen)
+            except (RuntimeError, AttributeError) as e:
+                logger.warning(f"推理优化失败，使用仅冻结的模型: {str(e)}")
+        return frozen
+
+    def load(self, model_name, weights_path, build_fn, input_shape=(1, 3, 224, 224), verify=True,
+             weights_tag=None):
+        """加载缓存模型，不存在或校验失败时重新构建
+
+        build_fn() 返回未加载权重的 nn.Module；weights_path 为空时使用
+        build_fn 自带的权重（如预训练权重）。此时缓存键由 weights_tag 区分
+        （如 'pretrained'，需保证同一标签对应相同权重）；未给出标签时先构建
+        模型并按参数内容计算键，随机初始化的模型因此不会命中其他权重的缓存。
+        """
+        model = None
+        if weights_path:
+            weights_id = "file:" + file_digest(weights_path)
+        elif weights_tag:
+            weights_id = "tag:" + str(weights_tag)
+        else:
+            model = build_fn()
+            weights_id = "state:" + state_dict_digest(model)
+        key = self._key(model_name, weights_id, input_shape)
+        artifact_path, meta_path, ref_path = self._paths(key)
+
+        if os.path.exists(artifact_path) and os.path.exists(meta_path):
+            start = time.perf_counter()
+            try:
+                module = torch.jit.load(artifact_path, map_location='cpu')
+                if verify:
+                    # 用缓存时保存的参考输入/输出快速自检
+                    reference = torch.load(ref_path, map_location='cpu', weights_only=True)
+                    with torch.no_grad():
+                        output = module(reference['input'])
+                    error = max_abs_error(reference['output'], output)
+                    if error > self.atol + self.rtol:
+                        raise ValueError(f"缓存模型输出偏差过大: {error:.3g}")
+                logger.info(f"从缓存加载模型 {model_name}: {time.perf_counter() - start:.2f}s")
+                return module
+            except Exception as e:
+                logger.warning(f"缓存模型不可用，重新构建: {str(e)}")
+
+        start = time.perf_counter()
+        if model is None:
+            model = build_fn()
+        if weights_path:
+            model.load_state_dict(load_state_dict(weights_path))
+        model.eval()
+        example_input = torch.randn(*input_shape)
+        with torch.no_grad():
+            expected = model(example_input)
+        module = self.build(model, example_input)
+        with torch.no_grad():
+            actual = module(example_input.contiguous(memory_format=torch.channels_last))
+
+        # 与原始权重的输出逐元素比对（输出个数或形状不同时误差为无穷大）
+        error = max_abs_error(expected, actual)
+        matches = error <= self.atol + self.rtol and all(
+            torch.allclose(a.float(), b.float(), atol=self.atol, rtol=self.rtol)
+            for a, b in zip(_flatten_outputs(expected), _flatten_outputs(actual)))
+        if not matches:
+            logger.warning(f"冻结模型与原始模型输出不一致（最大误差 {error:.3g}），"
+                           f"不写入缓存: {model_name}")
+            return model
+
+        torch.jit.save(module, artifact_path + ".tmp")
+        os.replace(artifact_path + ".tmp", artifact_path)
+        torch.save({'input': example_input, 'output': expected}, ref_path)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'model_name': model_name,
+                'weights_path': weights_path,
+                'weights_id': weights_id,
+                'input_shape': list(input_shape),
+                'torch_version': torch.__version__,
+                'max_abs_error': error,
+                'created': time.time(),
+            }, f, indent=2, ensure_ascii=False)
+        logger.info(f"已构建并缓存模型 {model_name}: {time.perf_counter() - start:.2f}s，"
+                    f"最大误差 {error:.3g}")
+        return module
+
+    def clear(self):
+        """删除所有缓存的模型"""
+        for name in os.listdir(self.cache_dir):
+            os.remove(os.path.join(self.cache_dir, name))
@@ -0,0 +1,213 @@
+import gc
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from ...utils.memory_governor import get_governor, PRIORITY_MODEL
+
+logger = logging.getLogger(__name__)
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+
+def _tensors_nbytes(modules):
+    """多个模块的参数和缓冲区总字节数（共享的张量只计一次）"""
+    seen = set()
+    total = 0
+    for module in modules:
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            if id(tensor) not in seen:
+                seen.add(id(tensor))
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def model_nbytes(model):
+    """估计模型占用的字节数（PyTorch 模块统计参数和缓冲区）"""
+    for obj in (model, getattr(model, 'model', None)):
+        if torch is not None and isinstance(obj, torch.nn.Module):
+            return _tensors_nbytes([obj])
+    return 0
+
+
+def attribute_nbytes(wrapper):
+    """包装对象（如 ModelManager）各属性中 PyTorch 模块的总字节数"""
+    if torch is None:
+        return 0
+    if isinstance(wrapper, torch.nn.Module):
+        return _tensors_nbytes([wrapper])
+    modules = [value for value in vars(wrapper).values() if isinstance(value, torch.nn.Module)]
+    return _tensors_nbytes(modules)
+
+
+class ModelVersion:
+    """一个已加载的模型版本及其引用计数"""
+
+    def __init__(self, version, model, source, load_seconds, warmup_seconds, nbytes=0):
+        self.version = version
+        self.model = model
+        self.source = source
+        self.load_seconds = load_seconds
+        self.warmup_seconds = warmup_seconds
+        self.created = time.time()
+        self.nbytes = nbytes
+        self.refs = 0
+        self.retired = False
+
+    def info(self):
+        return {'version': self.version, 'source': self.source, 'created': self.created,
+                'load_seconds': self.load_seconds, 'warmup_seconds': self.warmup_seconds,
+                'refs': self.refs, 'retired': self.retired, 'nbytes': self.nbytes}
+
+
+class HotSwapModel:
+    """模型热替换：新权重在后台加载并预热后原子切换，正在执行的请求继续使用旧版本
+
+    loader(source) 返回新模型对象，warmup(model) 用于预热（如跑一次假输入），
+    nbytes(model) 估计模型占用的字节数（供内存管理器统计，默认只识别 PyTorch
+    模块或其 model 属性）。切换后旧版本保留 keep_previous 个用于回滚，其余在
+    引用计数归零后释放。
+    """
+
+    def __init__(self, name, loader, warmup=None, keep_previous=1, nbytes=model_nbytes):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.keep_previous = keep_previous
+        self.nbytes = nbytes
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()  # 同一时间只加载一个新版本
+        self._current = None
+        self._history = []  # 可回滚的旧版本，最新的在末尾
+        self._retired = []  # 等待在途请求结束后释放
+        self._next_version = 1
+        self.governor_name = f"model_{name}_{id(self)}"
+        get_governor().register(self.governor_name, self.memory_usage,
+                                self.shrink_history, priority=PRIORITY_MODEL)
+
+    def close(self):
+        """不再使用时注销内存管理（在途请求持有的版本仍可正常完成）"""
+        get_governor().unregister(self.governor_name)
+
+    @property
+    def version(self):
+        current = self._current
+        return current.version if current is not None else None
+
+    @contextmanager
+    def use(self):
+        """在请求期间持有当前版本：期间发生切换也不会影响本次请求"""
+        with self._lock:
+            version = self._current
+            if version is None:
+                raise RuntimeError(f"模型 {self.name} 尚未加载")
+            version.refs += 1
+        try:
+            yield version.model
+        finally:
+            with self._lock:
+                version.refs -= 1
+                released = self._collect_locked()
+            self._release(released)
+
+    def load(self, source=None, activate=True):
+        """在调用线程中加载并预热新版本，完成后切换（耗时操作都在切换之前）"""
+        with self._load_lock:
+            start = time.perf_counter()
+            model = self.loader(source)
+            load_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            if self.warmup is not None:
+                self.warmup(model)
+            warmup_seconds = time.perf_counter() - start
+            nbytes = self.nbytes(model)
+            with self._lock:
+                version = ModelVersion(self._next_version, model, source,
+                                       load_seconds, warmup_seconds, nbytes)
+                self._next_version += 1
+            logger.info(f"模型 {self.name} 版本 {version.version} 加载完成: "
+                        f"加载 {load_seconds:.2f}s, 预热 {warmup_seconds:.2f}s")
+            if activate:
+                self.activate(version)
+            return version
+
+    def activate(self, version):
+        """原子切换到指定版本，原当前版本进入回滚历史"""
+        with self._lock:
+            previous = self._current
+            self._current = version
+            if previous is not None and previous is not version:
+                self._history.append(previous)
+            while len(self._history) > self.keep_previous:
+                self._retire_locked(self._history.pop(0))
+            released = self._collect_locked()
+        self._release(released)
+        logger.info(f"模型 {self.name} 已切换到版本 {version.version}")
+
+    def rollback(self):
+        """回滚到上一个版本，当前版本在请求结束后释放；返回回滚后的版本号"""
+        with self._lock:
+            if not self._history:
+                raise RuntimeError("没有可回滚的版本")
+            previous = self._history.pop()
+            if self._current is not None:
+                self._retire_locked(self._current)
+            self._current = previous
+            released = self._collect_locked()
+        self._release(released)
+        logger.info(f"模型 {self.name} 已回滚到版本 {previous.version}")
+        return previous.version
+
+    def can_rollback(self):
+        with self._lock:
+            return bool(self._history)
+
+    def _retire_locked(self, version):
+        version.retired = True
+        self._retired.append(version)
+
+    def _collect_locked(self):
+        """取出引用计数已归零的退役版本"""
+        released = [v for v in self._retired if v.refs == 0]
+        self._retired = [v for v in self._retired if v.refs > 0]
+        return released
+
+    def _release(self, versions):
+        if not versions:
+            return
+        for version in versions:
+            logger.info(f"释放模型 {self.name} 版本 {version.version}")
+            version.model = None
+        gc.collect()
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def versions(self):
+        """当前、可回滚和待释放的版本信息"""
+        with self._lock:
+            return {
+                'current': self._current.info() if self._current is not None else None,
+                'history': [v.info() for v in self._history],
+                'retired': [v.info() for v in self._retired],
+            }
+
+    def memory_usage(self):
+        with self._lock:
+            versions = ([self._current] if self._current is not None else []) + \
+                self._history + self._retired
+            return sum(v.nbytes for v in versions)
+
+    def shrink_history(self, nbytes):
+        """内存紧张时放弃回滚历史（最旧的先释放），不影响当前版本"""
+        freed = 0
+        with self._lock:
+            while self._history and freed < nbytes:
+                version = self._history.pop(0)
+                freed += version.nbytes
+                self._retire_locked(version)
+            released = self._collect_locked()
+        self._release(released)
+        return freed
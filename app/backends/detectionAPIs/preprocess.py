@@ -0,0 +1,276 @@
+import os
+import time
+import argparse
+import tracemalloc
+import threading
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from ...config.config import Config
+
+logger = logging.getLogger(__name__)
+
+try:
+    import cv2
+except ImportError:  # 图片解码和缩放需要 OpenCV
+    cv2 = None
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+# ImageNet 归一化参数（RGB）
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+# 逐张处理时每张图的临时数组：缩放结果、float 转换、归一化、CHW 连续化，外加每批一次 stack
+_NAIVE_ALLOCS_PER_IMAGE = 4
+
+
+class BufferPool:
+    """预分配的批缓冲区池：uint8 HWC 暂存区 + float32 NCHW 输出区，循环复用"""
+
+    def __init__(self, batch_size, size, count=2, channels=3):
+        h, w = size
+        self.count = count
+        self._free = list(range(count))
+        self._cond = threading.Condition()
+        self.staging = [np.empty((batch_size, h, w, channels), dtype=np.uint8) for _ in range(count)]
+        self.outputs = [np.empty((batch_size, channels, h, w), dtype=np.float32) for _ in range(count)]
+        self.allocated = 2 * count
+
+    def acquire(self):
+        """取一个空闲缓冲区编号，全部占用时等待"""
+        with self._cond:
+            while not self._free:
+                self._cond.wait()
+            return self._free.pop()
+
+    def release(self, slot):
+        with self._cond:
+            self._free.append(slot)
+            self._cond.notify()
+
+    def nbytes(self):
+        return sum(a.nbytes for a in self.staging) + sum(a.nbytes for a in self.outputs)
+
+
+class BatchPreprocessor:
+    """批量预处理：线程池解码并缩放到复用的暂存区，整批原地归一化并转为 NCHW
+
+    batches() 产出的数组是缓冲区的视图，只在下一次迭代前有效；
+    产出当前批的同时后台已在解码下一批。
+    """
+
+    def __init__(self, size=(224, 224), batch_size=None, workers=None,
+                 mean=IMAGENET_MEAN, std=IMAGENET_STD, as_tensor=False):
+        if cv2 is None:
+            raise ImportError("批量预处理需要安装 opencv-python")
+        if as_tensor and torch is None:
+            raise ImportError("输出张量需要安装 PyTorch")
+        self.size = tuple(size)
+        self.batch_size = batch_size or max(1, Config.batch_size)
+        self.workers = workers or Config.decode_workers
+        self.as_tensor = as_tensor
+        # (x / 255 - mean) / std = x * scale - bias，按通道广播
+        std = np.asarray(std, dtype=np.float32)
+        self._scale = (1.0 / (255.0 * std)).reshape(1, 3, 1, 1)
+        self._bias = (np.asarray(mean, dtype=np.float32) / std).reshape(1, 3, 1, 1)
+        self.pool = BufferPool(self.batch_size, self.size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix="preprocess")
+        self.stats = {'images': 0, 'batches': 0, 'failed': 0, 'seconds': 0.0}
+
+    def _decode_into(self, path, target):
+        """解码一张图并直接缩放写入暂存区（cv2 为 BGR，RGB 转换在归一化时完成）"""
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            raise IOError(f"无法读取图片: {path}")
+        h, w = self.size
+        if image.shape[:2] == (h, w):
+            np.copyto(target, image)
+        else:
+            interpolation = cv2.INTER_AREA if image.shape[0] > h else cv2.INTER_LINEAR
+            cv2.resize(image, (w, h), dst=target, interpolation=interpolation)
+
+    def _normalize(self, slot, n):
+        """整批原地处理：uint8 HWC(BGR) -> float32 NCHW(RGB) 并归一化，无临时数组"""
+        staging = self.pool.staging[slot][:n, :, :, ::-1]
+        output = self.pool.outputs[slot][:n]
+        # 输出区按 NHWC 视图写入，类型转换与布局转换一次完成
+        np.copyto(output.transpose(0, 2, 3, 1), staging, casting='unsafe')
+        output *= self._scale
+        output -= self._bias
+        return output
+
+    def _submit(self, paths):
+        slot = self.pool.acquire()
+        staging = self.pool.staging[slot]
+        futures = [self._executor.submit(self._decode_into, path, staging[i])
+                   for i, path in enumerate(paths)]
+        return slot, paths, futures
+
+    def _collect(self, job):
+        slot, paths, futures = job
+        ok = []
+        for i, future in enumerate(futures):
+            try:
+                future.result()
+                ok.append(i)
+            except Exception as e:
+                self.stats['failed'] += 1
+                logger.warning(f"预处理失败，跳过: {str(e)}")
+        if len(ok) < len(paths):
+            # 把成功的图片紧凑排列到缓冲区前部
+            staging = self.pool.staging[slot]
+            for dst, src in enumerate(ok):
+                if dst != src:
+                    staging[dst] = staging[src]
+        return slot, [paths[i] for i in ok]
+
+    def batches(self, paths):
+        """产出 (批数组, 对应路径)；批数组形状为 (n, 3, H, W)，C 连续"""
+        paths = list(paths)
+        chunks = [paths[i:i + self.batch_size] for i in range(0, len(paths), self.batch_size)]
+        if not chunks:
+            return
+        start = time.perf_counter()
+        pending = self._submit(chunks[0])
+        try:
+            for index in range(len(chunks)):
+                slot, batch_paths = self._collect(pending)
+                # 预取下一批（使用另一个缓冲区）
+                pending = self._submit(chunks[index + 1]) if index + 1 < len(chunks) else None
+                try:
+                    if batch_paths:
+                        batch = self._normalize(slot, len(batch_paths))
+                        self.stats['images'] += len(batch_paths)
+                        self.stats['batches'] += 1
+                        self.stats['seconds'] = time.perf_counter() - start
+                        yield (torch.from_numpy(batch) if self.as_tensor else batch), batch_paths
+                finally:
+                    self.pool.release(slot)
+        finally:
+            # 提前结束迭代时等待预取完成再归还缓冲区
+            if pending is not None:
+                for future in pending[2]:
+                    future.exception()
+                self.pool.release(pending[0])
+            self.stats['seconds'] = time.perf_counter() - start
+
+    def report(self):
+        """吞吐量和按逐张处理的临时数组个数估算的节省分配次数（实测见 measure_allocations）"""
+        images = self.stats['images']
+        naive = images * _NAIVE_ALLOCS_PER_IMAGE + self.stats['batches']
+        return {
+            'images': images,
+            'failed': self.stats['failed'],
+            'seconds': self.stats['seconds'],
+            'images_per_second': images / self.stats['seconds'] if self.stats['seconds'] else 0.0,
+            'buffers_allocated': self.pool.allocated,
+            'allocations_saved_estimate': max(0, naive - self.pool.allocated),
+            'buffer_mb': self.pool.nbytes() / (1 << 20),
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def naive_batches(paths, size=(224, 224), batch_size=16, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+    """逐张处理的基线：每张图单独缩放、转换、归一化和转置，每批再 stack"""
+    if cv2 is None:
+        raise ImportError("批量预处理需要安装 opencv-python")
+    h, w = size
+    mean = np.asarray(mean, dtype=np.float32)
+    std = np.asarray(std, dtype=np.float32)
+    paths = list(paths)
+    for start in range(0, len(paths), batch_size):
+        images, batch_paths = [], []
+        for path in paths[start:start + batch_size]:
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is None:
+                continue
+            image = cv2.resize(image, (w, h), interpolation=cv2.INTER_AREA)
+            image = (image[:, :, ::-1].astype(np.float32) / 255.0 - mean) / std
+            images.append(np.ascontiguousarray(image.transpose(2, 0, 1)))
+            batch_paths.append(path)
+        if images:
+            yield np.stack(images), batch_paths
+
+
+def _trace_batches(batches):
+    """逐批统计新分配内存的峰值（相对取批前的占用），返回 (批数, 图片数, 峰值字节总和)"""
+    count = images = total = 0
+    iterator = iter(batches)
+    while True:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        try:
+            _, batch_paths = next(iterator)
+        except StopIteration:
+            break
+        total += max(0, tracemalloc.get_traced_memory()[1] - base)
+        count += 1
+        images += len(batch_paths)
+    return count, images, total
+
+
+def measure_allocations(paths, size=(224, 224), batch_size=16, workers=None):
+    """用 tracemalloc 实测逐张处理与缓冲池处理每张图的临时内存分配
+
+    缓冲池在开始统计前创建，测得的是稳定运行时每批新分配的峰值字节数。
+    """
+    paths = list(paths)
+    tracemalloc.start()
+    try:
+        _, naive_images, naive_bytes = _trace_batches(naive_batches(paths, size, batch_size))
+        with BatchPreprocessor(size, batch_size, workers) as preprocessor:
+            _, pooled_images, pooled_bytes = _trace_batches(preprocessor.batches(paths))
+    finally:
+        tracemalloc.stop()
+    naive = naive_bytes / naive_images if naive_images else 0.0
+    pooled = pooled_bytes / pooled_images if pooled_images else 0.0
+    return {
+        'images': naive_images,
+        'naive_bytes_per_image': naive,
+        'pooled_bytes_per_image': pooled,
+        'bytes_saved_per_image': naive - pooled,
+        'reduction': 1.0 - pooled / naive if naive else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量批量预处理吞吐量")
+    parser.add_argument('folder', help="图片目录")
+    parser.add_argument('--size', type=int, default=224)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--measure-allocations', action='store_true',
+                        help="用 tracemalloc 实测逐张处理与缓冲池处理的临时内存分配")
+    args = parser.parse_args()
+
+    paths = [os.path.join(args.folder, name) for name in sorted(os.listdir(args.folder))
+             if name.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))]
+    with BatchPreprocessor((args.size, args.size), args.batch_size, args.workers) as preprocessor:
+        for _ in preprocessor.batches(paths):
+            pass
+        result = preprocessor.report()
+    print(f"{result['images']} 张图片, {result['seconds']:.2f}s, "
+          f"{result['images_per_second']:.1f} 张/秒, 失败 {result['failed']}, "
+          f"估计节省内存分配 {result['allocations_saved_estimate']} 次（按临时数组个数估算）")
+    if args.measure_allocations:
+        measured = measure_allocations(paths, (args.size, args.size), args.batch_size, args.workers)
+        print(f"实测每张图临时分配: 逐张处理 {measured['naive_bytes_per_image'] / 1024:.0f}KB, "
+              f"缓冲池 {measured['pooled_bytes_per_image'] / 1024:.0f}KB, "
+              f"减少 {measured['reduction']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import logging
+from ...utils.video_source import VideoSource
+from .change_detection import ChangeDrivenDetector
+
+logger = logging.getLogger(__name__)
+
+
+def process_video(source, detect_fn, registration=None, series=None, **video_kwargs):
+    """将视频帧直接送入检测和趋势配准流程，不落盘中间图片
+
+    每帧产出 {'index', 'timestamp', 'detections', 'mode', 'shift'}；
+    registration 为 RegistrationCache 时同时计算相对首帧的位移。
+    未指定 policy 时文件源不丢帧，只有实时流在检测跟不上时丢弃旧帧。
+    """
+    detector = ChangeDrivenDetector(detect_fn)
+    series = series if series is not None else str(source)
+    with VideoSource(source, **video_kwargs) as video:
+        for frame in video:
+            detections, mode = detector.process(frame.image)
+            shift = None
+            if registration is not None:
+                shift = registration.add_frame(series, frame.index, frame.image)
+            yield {
+                'index': frame.index,
+                'timestamp': frame.timestamp,
+                'detections': detections,
+                'mode': mode,
+                'shift': shift,
+            }
+    logger.info(f"视频处理完成: {video.stats}, 变化检测: {detector.stats}")
@@ -0,0 +1,313 @@
+import os
+import csv
+import json
+import heapq
+import html
+import time
+import threading
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from ...utils.mask_codec import compact_detections, decode as decode_mask, to_bbox as mask_bbox, to_rle
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet 输出为可选功能
+    pa = pq = None
+
+try:
+    import cv2
+except ImportError:  # 叠加图输出为可选功能
+    cv2 = None
+
+
+def json_default(value):
+    """JSON 序列化时转换 NumPy 标量和数组（检测器输出常含 NumPy 类型）"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+# 平铺输出（CSV/Parquet）的默认列
+DEFAULT_COLUMNS = ('image_path', 'timestamp', 'model', 'detected', 'confidence',
+                   'num_detections', 'expanding', 'rate', 'detections')
+
+SUPPORTED_FORMATS = ('csv', 'jsonl', 'parquet', 'html')
+
+# Parquet 列类型（未列出的列按字符串写出），固定类型避免各块推断不一致
+_PARQUET_TYPES = {
+    'timestamp': 'float64',
+    'detected': 'bool_',
+    'confidence': 'float64',
+    'num_detections': 'int64',
+    'expanding': 'bool_',
+    'rate': 'float64',
+}
+
+
+class _RunningStats:
+    """流式统计均值/最值，内存占用恒定"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        if value is None:
+            return
+        value = float(value)
+        self.count += 1
+        self.mean += (value - self.mean) / self.count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+
+def draw_overlay(image_path, detections, output_path):
+    """在图片上绘制检测框和掩码（RLE/多边形）并保存"""
+    image = cv2.imread(image_path)
+    if image is None:
+        raise IOError(f"无法读取图片: {image_path}")
+    h, w = image.shape[:2]
+    for det in detections:
+        bbox = det.get('bbox')
+        if det.get('mask') is not None:
+            rle = to_rle(det['mask'], h, w)
+            mask = decode_mask(rle)
+            image[mask] = (image[mask] * 0.5 + (0, 0, 127)).astype(image.dtype)
+            if bbox is None:
+                x, y, bw, bh = mask_bbox(rle)
+                bbox = (x, y, x + bw, y + bh)
+        if bbox is None:
+            continue
+        x1, y1, x2, y2 = [int(v) for v in bbox]
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        label = f"{det.get('label', '')} {det.get('score', 0):.2f}"
+        cv2.putText(image, label, (x1, max(0, y1 - 4)), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.5, (0, 0, 255), 1)
+    cv2.imwrite(output_path, image)
+
+
+class ReportExporter:
+    """流式导出检测/趋势/指标结果，逐块写出，内存占用与总行数无关
+
+    用法：
+        with ReportExporter(out_dir) as exporter:
+            for record in results:
+                exporter.write(record)
+    """
+
+    def __init__(self, output_dir, formats=('csv', 'jsonl', 'html'), columns=DEFAULT_COLUMNS,
+                 chunk_size=5000, overlay=False, overlay_workers=4, top_k=50,
+                 name="report"):
+        unknown = set(formats) - set(SUPPORTED_FORMATS)
+        if unknown:
+            raise ValueError(f"不支持的导出格式: {', '.join(sorted(unknown))}")
+        if 'parquet' in formats and pa is None:
+            raise ImportError("Parquet 导出需要安装 pyarrow")
+        if overlay and cv2 is None:
+            raise ImportError("叠加图导出需要安装 opencv-python")
+
+        self.output_dir = output_dir
+        self.formats = tuple(formats)
+        self.columns = tuple(columns)
+        self.chunk_size = chunk_size
+        self.name = name
+        os.makedirs(output_dir, exist_ok=True)
+
+        self._buffer = []
+        self._csv_file = self._csv_writer = None
+        self._jsonl_file = None
+        self._parquet_writer = None
+        if 'csv' in self.formats:
+            self._csv_file = open(self._path('csv'), 'w', newline='', encoding='utf-8')
+            self._csv_writer = csv.writer(self._csv_file)
+            self._csv_writer.writerow(self.columns)
+        if 'jsonl' in self.formats:
+            self._jsonl_file = open(self._path('jsonl'), 'w', encoding='utf-8')
+
+        # 汇总信息（恒定内存）
+        self.rows = 0
+        self._detected = 0
+        self._expanding = 0
+        self._confidence = _RunningStats()
+        self._rate = _RunningStats()
+        self._labels = {}
+        self._top = []  # 置信度最高的 top_k 帧（最小堆）
+        self._top_k = top_k
+        self._started = time.time()
+
+        # 叠加图写出线程池，信号量限制排队数量以控制内存
+        self._overlay_dir = None
+        self._pool = None
+        if overlay:
+            self._overlay_dir = os.path.join(output_dir, "overlays")
+            os.makedirs(self._overlay_dir, exist_ok=True)
+            self._pool = ThreadPoolExecutor(max_workers=overlay_workers,
+                                            thread_name_prefix="overlay")
+            self._pending = threading.BoundedSemaphore(overlay_workers * 4)
+            self.overlay_errors = 0
+
+    def _path(self, ext):
+        return os.path.join(self.output_dir, f"{self.name}.{ext}")
+
+    def _flatten(self, record):
+        detections = record.get('detections') or []
+        row = dict(record)
+        row.setdefault('num_detections', len(detections))
+        row['detections'] = (json.dumps(detections, ensure_ascii=False, default=json_default)
+                             if detections else "")
+        return [row.get(column) for column in self.columns]
+
+    def write(self, record):
+        """写入一条结果记录（检测结果中的稠密掩码会转为 RLE）"""
+        if record.get('detections'):
+            record = dict(record)
+            record['detections'] = compact_detections(record['detections'])
+        self.rows += 1
+        self._update_summary(record)
+        if self._jsonl_file is not None:
+            self._jsonl_file.write(json.dumps(record, ensure_ascii=False, default=json_default) + "\n")
+        if self._csv_writer is not None or 'parquet' in self.formats:
+            self._buffer.append(self._flatten(record))
+            if len(self._buffer) >= self.chunk_size:
+                self._flush_chunk()
+        if self._pool is not None and record.get('detections'):
+            self._submit_overlay(record)
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def _flush_chunk(self):
+        if not self._buffer:
+            return
+        if self._csv_writer is not None:
+            self._csv_writer.writerows(self._buffer)
+        if 'parquet' in self.formats:
+            arrays = []
+            for i, column in enumerate(self.columns):
+                values = [row[i] for row in self._buffer]
+                if column in _PARQUET_TYPES:
+                    arrays.append(pa.array(values, type=getattr(pa, _PARQUET_TYPES[column])()))
+                else:
+                    arrays.append(pa.array([None if v is None else str(v) for v in values],
+                                           type=pa.string()))
+            table = pa.Table.from_arrays(arrays, names=list(self.columns))
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self._path('parquet'), table.schema)
+            self._parquet_writer.write_table(table)
+        self._buffer = []
+
+    def _submit_overlay(self, record):
+        self._pending.acquire()
+        base = os.path.splitext(os.path.basename(record['image_path']))[0]
+        output_path = os.path.join(self._overlay_dir, f"{self.rows:08d}_{base}.jpg")
+        future = self._pool.submit(draw_overlay, record['image_path'],
+                                   record['detections'], output_path)
+        future.add_done_callback(self._overlay_done)
+
+    def _overlay_done(self, future):
+        self._pending.release()
+        if future.exception() is not None:
+            self.overlay_errors += 1
+            logger.warning(f"叠加图写出失败: {future.exception()}")
+
+    def _update_summary(self, record):
+        if record.get('detected'):
+            self._detected += 1
+        if record.get('expanding'):
+            self._expanding += 1
+        self._confidence.add(record.get('confidence'))
+        self._rate.add(record.get('rate'))
+        for det in record.get('detections') or []:
+            label = str(det.get('label'))
+            self._labels[label] = self._labels.get(label, 0) + 1
+        confidence = record.get('confidence')
+        if confidence is not None and self._top_k:
+            item = (float(confidence), self.rows, record.get('image_path'))
+            if len(self._top) < self._top_k:
+                heapq.heappush(self._top, item)
+            else:
+                heapq.heappushpop(self._top, item)
+
+    def summary(self):
+        """返回汇总统计"""
+        return {
+            'rows': self.rows,
+            'detected': self._detected,
+            'detected_ratio': self._detected / self.rows if self.rows else 0.0,
+            'expanding': self._expanding,
+            'confidence_mean': self._confidence.mean if self._confidence.count else None,
+            'confidence_min': self._confidence.min,
+            'confidence_max': self._confidence.max,
+            'rate_mean': self._rate.mean if self._rate.count else None,
+            'labels': dict(self._labels),
+            'elapsed': time.time() - self._started,
+        }
+
+    def _write_html(self):
+        summary = self.summary()
+        fmt = lambda v, spec: "--" if v is None else format(v, spec)
+        rows = [
+            ("总帧数", summary['rows']),
+            ("检出残余物", f"{summary['detected']} ({summary['detected_ratio']:.2%})"),
+            ("褶皱扩大", summary['expanding']),
+            ("平均置信度", fmt(summary['confidence_mean'], '.2%')),
+            ("置信度范围", f"{fmt(summary['confidence_min'], '.2%')} ~ "
+                         f"{fmt(summary['confidence_max'], '.2%')}"),
+            ("平均变化率", fmt(summary['rate_mean'], '.2%')),
+            ("导出耗时", f"{summary['elapsed']:.1f}s"),
+        ]
+        table = "\n".join(f"<tr><th>{html.escape(k)}</th><td>{html.escape(str(v))}</td></tr>"
+                          for k, v in rows)
+        labels = "\n".join(f"<tr><td>{html.escape(k)}</td><td>{v}</td></tr>"
+                           for k, v in sorted(self._labels.items()))
+        top = "\n".join(
+            f"<tr><td>{index}</td><td>{html.escape(str(path))}</td><td>{conf:.2%}</td></tr>"
+            for conf, index, path in sorted(self._top, reverse=True))
+        with open(self._path('html'), 'w', encoding='utf-8') as f:
+            f.write(f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>检测报告</title>
+<style>body{{font-family:sans-serif}}table{{border-collapse:collapse;margin-bottom:20px}}
+th,td{{border:1px solid #ccc;padding:4px 8px;text-align:left}}</style></head>
+<body><h1>检测报告</h1>
+<table>{table}</table>
+<h2>类别统计</h2><table><tr><th>类别</th><th>数量</th></tr>{labels}</table>
+<h2>置信度最高的帧</h2><table><tr><th>序号</th><th>图片</th><th>置信度</th></tr>{top}</table>
+</body></html>
+""")
+
+    def close(self):
+        """写出剩余数据和汇总页，等待叠加图写完"""
+        self._flush_chunk()
+        if self._csv_file is not None:
+            self._csv_file.close()
+        if self._jsonl_file is not None:
+            self._jsonl_file.close()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+        if 'html' in self.formats:
+            self._write_html()
+        return self.summary()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def export_report(records, output_dir, **kwargs):
+    """将结果迭代器流式导出到 output_dir，返回汇总统计"""
+    with ReportExporter(output_dir, **kwargs) as exporter:
+        exporter.write_many(records)
+    return exporter.summary()
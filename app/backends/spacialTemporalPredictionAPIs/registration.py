@@ -0,0 +1,244 @@
+import threading
+import logging
+import numpy as np
+from ...utils.memory_governor import get_governor, PRIORITY_DATA
+
+logger = logging.getLogger(__name__)
+
+
+def to_gray(image):
+    """转为 float32 灰度图"""
+    image = np.asarray(image)
+    if image.ndim == 3:
+        image = image.mean(axis=2)
+    return image.astype(np.float32, copy=False)
+
+
+def downsample(image, factor):
+    """按 factor×factor 块均值下采样（支持 (H, W) 或 (N, H, W)）"""
+    if factor == 1:
+        return image
+    h = image.shape[-2] // factor * factor
+    w = image.shape[-1] // factor * factor
+    image = image[..., :h, :w]
+    shape = image.shape[:-2] + (h // factor, factor, w // factor, factor)
+    return image.reshape(shape).mean(axis=(-3, -1))
+
+
+def build_pyramid(image, levels):
+    """构建金字塔，返回 [level0, level1, ...]，每层边长减半"""
+    pyramid = [image]
+    for _ in range(1, levels):
+        pyramid.append(downsample(pyramid[-1], 2))
+    return pyramid
+
+
+_window_cache = {}
+
+
+def _hann_window(shape):
+    window = _window_cache.get(shape)
+    if window is None:
+        window = np.outer(np.hanning(shape[0]), np.hanning(shape[1])).astype(np.float32)
+        _window_cache[shape] = window
+    return window
+
+
+def spectrum(stack):
+    """对 (N, H, W) 图像栈加窗后批量计算 rfft2"""
+    stack = stack - stack.mean(axis=(-2, -1), keepdims=True)
+    return np.fft.rfft2(stack * _hann_window(stack.shape[-2:]))
+
+
+def correlation_surface(ref_spec, mov_spec, shape):
+    """批量计算相位相关曲面"""
+    cross = mov_spec * np.conj(ref_spec)
+    cross /= np.abs(cross) + 1e-9
+    return np.fft.irfft2(cross, s=shape)
+
+
+def _wrap(index, size):
+    return index - size if index > size // 2 else index
+
+
+def _subpixel(surface, y, x):
+    """抛物线拟合求亚像素峰值偏移"""
+    h, w = surface.shape
+
+    def fit(a, b, c):
+        denom = a - 2 * b + c
+        return 0.0 if abs(denom) < 1e-12 else 0.5 * (a - c) / denom
+
+    dy = fit(surface[(y - 1) % h, x], surface[y, x], surface[(y + 1) % h, x])
+    dx = fit(surface[y, (x - 1) % w], surface[y, x], surface[y, (x + 1) % w])
+    return dy, dx
+
+
+def _peak(surface, guess=None, radius=2):
+    """在相关曲面中找峰值；给定 guess 时只在其邻域内搜索"""
+    h, w = surface.shape
+    if guess is None:
+        y, x = np.unravel_index(int(np.argmax(surface)), surface.shape)
+    else:
+        ys = (np.arange(-radius, radius + 1) + int(round(guess[0]))) % h
+        xs = (np.arange(-radius, radius + 1) + int(round(guess[1]))) % w
+        window = surface[np.ix_(ys, xs)]
+        iy, ix = np.unravel_index(int(np.argmax(window)), window.shape)
+        y, x = ys[iy], xs[ix]
+    return int(y), int(x), float(surface[y, x])
+
+
+def phase_correlate(ref_stack, mov_stack):
+    """批量相位相关，返回每对图像的 (dy, dx) 位移和峰值响应
+
+    位移的含义为 mov ≈ roll(ref, (dy, dx))。
+    """
+    ref_stack = np.asarray(ref_stack, dtype=np.float32)
+    mov_stack = np.asarray(mov_stack, dtype=np.float32)
+    shape = ref_stack.shape[-2:]
+    surfaces = correlation_surface(spectrum(ref_stack), spectrum(mov_stack), shape)
+    shifts = np.zeros((len(surfaces), 2), dtype=np.float32)
+    responses = np.zeros(len(surfaces), dtype=np.float32)
+    for i, surface in enumerate(surfaces):
+        y, x, responses[i] = _peak(surface)
+        sy, sx = _subpixel(surface, y, x)
+        shifts[i] = (_wrap(y, shape[0]) + sy, _wrap(x, shape[1]) + sx)
+    return shifts, responses
+
+
+class RegistrationCache:
+    """按序列缓存相邻帧之间的平移量，每帧只配准一次
+
+    每个序列只保留最后一帧各金字塔层的频谱，新帧到来时只需计算自身的
+    频谱和一次逆变换；由粗到细的层级只在上一层预测位置附近搜索峰值。
+    """
+
+    def __init__(self, levels=4, finest_level=2, search_radius=2):
+        self.levels = levels  # 金字塔层数
+        self.finest_level = finest_level  # 参与配准的最精细层（0 为原图）
+        self.search_radius = search_radius  # 精细层的峰值搜索半径（像素）
+        self._series = {}
+        self._lock = threading.Lock()
+        get_governor().register(f"registration_{id(self)}", self.memory_usage,
+                                priority=PRIORITY_DATA)
+
+    def _pyramid_spectra(self, images):
+        """images: (N, H, W)，返回 {层号: (频谱, 层尺寸)}"""
+        base = downsample(images, 2 ** self.finest_level)
+        spectra = {}
+        level_image = base
+        for level in range(self.finest_level, self.levels):
+            if level > self.finest_level:
+                level_image = downsample(level_image, 2)
+            spectra[level] = (spectrum(level_image), level_image.shape[-2:])
+        return spectra
+
+    def _estimate(self, ref_spectra, mov_spectra, index):
+        """由粗到细估计参考帧与本批第 index 帧之间的位移（原图像素）"""
+        guess = None
+        response = 0.0
+        for level in range(self.levels - 1, self.finest_level - 1, -1):
+            ref_spec, shape = ref_spectra[level]
+            mov_spec, _ = mov_spectra[level]
+            surface = correlation_surface(ref_spec, mov_spec[index], shape)
+            if guess is None:
+                y, x, response = _peak(surface)
+            else:
+                y, x, response = _peak(surface, guess, self.search_radius)
+            estimate = (_wrap(y, shape[0]), _wrap(x, shape[1]))
+            if level == self.finest_level:
+                sy, sx = _subpixel(surface, y, x)
+                estimate = (estimate[0] + sy, estimate[1] + sx)
+            else:
+                guess = (estimate[0] * 2, estimate[1] * 2)
+        scale = 2 ** self.finest_level
+        return (float(estimate[0] * scale), float(estimate[1] * scale)), response
+
+    def add_frames(self, series, keys, images):
+        """批量加入一组按时间排序的帧，返回每帧相对序列首帧的累计位移"""
+        keys = list(keys)
+        if not keys:
+            return []
+        stack = np.stack([to_gray(image) for image in images])
+        spectra = self._pyramid_spectra(stack)
+        with self._lock:
+            state = self._series.setdefault(series, {
+                'transforms': {}, 'last_key': None, 'last_spectra': None, 'shape': None})
+            if state['shape'] is not None and state['shape'] != stack.shape[-2:]:
+                raise ValueError(f"序列 {series} 的帧尺寸不一致: {stack.shape[-2:]} != {state['shape']}")
+            state['shape'] = stack.shape[-2:]
+
+            results = []
+            for i, key in enumerate(keys):
+                if key in state['transforms']:
+                    results.append(state['transforms'][key]['cumulative'])
+                    continue
+                if state['last_spectra'] is None:
+                    shift, response = (0.0, 0.0), 1.0
+                    cumulative = (0.0, 0.0)
+                else:
+                    ref_spectra, ref_index = state['last_spectra']
+                    # 上一帧可能来自本批（按索引取）或上一次调用（单帧频谱）
+                    ref = {level: (spec[ref_index] if ref_index is not None else spec, shape)
+                           for level, (spec, shape) in ref_spectra.items()}
+                    shift, response = self._estimate(ref, spectra, i)
+                    prev = state['transforms'][state['last_key']]['cumulative']
+                    cumulative = (prev[0] + shift[0], prev[1] + shift[1])
+                state['transforms'][key] = {
+                    'shift': shift, 'cumulative': cumulative, 'response': response}
+                state['last_key'] = key
+                state['last_spectra'] = (spectra, i)
+                results.append(cumulative)
+
+            # 只保留最后一帧的频谱，释放整批数据
+            last_spectra, last_index = state['last_spectra']
+            if last_index is not None:
+                state['last_spectra'] = ({level: (spec[last_index].copy(), shape)
+                                          for level, (spec, shape) in last_spectra.items()}, None)
+            return results
+
+    def add_frame(self, series, key, image):
+        """加入一帧，返回其相对序列首帧的累计位移 (dy, dx)"""
+        return self.add_frames(series, [key], [image])[0]
+
+    def transform(self, series, key_a, key_b):
+        """返回帧 b 相对帧 a 的位移 (dy, dx)，只查缓存不重新计算"""
+        with self._lock:
+            transforms = self._series[series]['transforms']
+            a = transforms[key_a]['cumulative']
+            b = transforms[key_b]['cumulative']
+        return (b[0] - a[0], b[1] - a[1])
+
+    def memory_usage(self):
+        """缓存的频谱和位移占用的字节数"""
+        with self._lock:
+            total = 0
+            for state in self._series.values():
+                total += len(state['transforms']) * 200
+                if state['last_spectra'] is not None:
+                    total += sum(spec.nbytes for spec, _ in state['last_spectra'][0].values())
+            return total
+
+    def has_frame(self, series, key):
+        with self._lock:
+            return series in self._series and key in self._series[series]['transforms']
+
+    def clear(self, series=None):
+        with self._lock:
+            if series is None:
+                self._series.clear()
+            else:
+                self._series.pop(series, None)
+
+
+def align(image, shift):
+    """按整数像素反向平移图像使其与参考帧对齐，空出区域填 0"""
+    dy, dx = int(round(-shift[0])), int(round(-shift[1]))
+    aligned = np.zeros_like(image)
+    h, w = image.shape[:2]
+    src_y = slice(max(0, -dy), min(h, h - dy))
+    src_x = slice(max(0, -dx), min(w, w - dx))
+    dst_y = slice(max(0, dy), min(h, h + dy))
+    dst_x = slice(max(0, dx), min(w, w + dx))
+    aligned[dst_y, dst_x] = image[src_y, src_x]
+    return aligned
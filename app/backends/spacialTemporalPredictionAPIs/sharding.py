@@ -0,0 +1,287 @@
+import os
+import time
+import bisect
+import hashlib
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+try:
+    import cv2
+except ImportError:  # 默认的逐帧分析需要 OpenCV
+    cv2 = None
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """一致性哈希环，每个节点放置 vnodes 个虚拟节点使分片均匀"""
+
+    def __init__(self, nodes=(), vnodes=64):
+        self.vnodes = vnodes
+        self._keys = []
+        self._owners = []
+        self.nodes = set()
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for i in range(self.vnodes):
+            h = _hash(f"{node}#{i}")
+            index = bisect.bisect(self._keys, h)
+            self._keys.insert(index, h)
+            self._owners.insert(index, node)
+
+    def remove(self, node):
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        keep = [(k, o) for k, o in zip(self._keys, self._owners) if o != node]
+        self._keys = [k for k, _ in keep]
+        self._owners = [o for _, o in keep]
+
+    def get(self, key):
+        """返回负责 key 的节点；移除节点只会迁移该节点原有的分片"""
+        if not self._keys:
+            raise RuntimeError("没有可用节点")
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[index]
+
+
+def record_time(record):
+    """记录的时间：优先拍摄时间，其次修改时间"""
+    return record.get('capture_time') or record.get('mtime') or 0.0
+
+
+def make_chunks(records, chunk_seconds=86400.0):
+    """按 (序列, 时间窗) 切分记录，返回 {分片 key: 记录列表}"""
+    chunks = {}
+    for record in records:
+        t = record_time(record)
+        key = f"{record.get('series') or ''}:{int(t // chunk_seconds)}"
+        chunks.setdefault(key, []).append({'path': record['path'], 'time': t,
+                                           'series': record.get('series')})
+    return chunks
+
+
+def mean_intensity(path):
+    """默认逐帧分析：灰度均值作为趋势值，无检测结果"""
+    if cv2 is None:
+        raise ImportError("默认逐帧分析需要安装 opencv-python")
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"无法读取图片: {path}")
+    return {'value': float(image.mean()), 'detections': []}
+
+
+def analyze_chunk(key, frames, frame_fn):
+    """节点端：分析一个分片，返回逐帧结果和趋势回归所需的统计量
+
+    统计量为 (n, 时间均值, 值均值, 时间离差平方和, 协离差和)，
+    以分片内均值为中心累计，合并时不受大时间戳的精度影响。
+    """
+    results = []
+    errors = []
+    n = mean_t = mean_y = m2_t = c_ty = 0.0
+    for frame in frames:
+        try:
+            output = frame_fn(frame['path'])
+        except Exception as e:
+            # 单帧失败不视为节点失败
+            errors.append({'path': frame['path'], 'error': str(e)})
+            continue
+        detections = output.get('detections', [])
+        value = float(output.get('value', len(detections)))
+        t = frame['time']
+        results.append({'path': frame['path'], 'time': t, 'series': frame['series'],
+                        'value': value, 'detections': detections})
+        # Welford 在线更新
+        n += 1
+        dt = t - mean_t
+        mean_t += dt / n
+        mean_y += (value - mean_y) / n
+        m2_t += dt * (t - mean_t)
+        c_ty += dt * (value - mean_y)
+    return {'key': key, 'series': frames[0]['series'], 'frames': results, 'errors': errors,
+            'moments': (n, mean_t, mean_y, m2_t, c_ty), 'pid': os.getpid()}
+
+
+def _combine(a, b):
+    """合并两组分片统计量（Chan 并行算法）"""
+    n_a, t_a, y_a, m2_a, c_a = a
+    n_b, t_b, y_b, m2_b, c_b = b
+    n = n_a + n_b
+    if n == 0:
+        return a
+    dt = t_b - t_a
+    dy = y_b - y_a
+    return (n, t_a + dt * n_b / n, y_a + dy * n_b / n,
+            m2_a + m2_b + dt * dt * n_a * n_b / n,
+            c_a + c_b + dt * dy * n_a * n_b / n)
+
+
+def merge_partials(partials):
+    """合并各分片结果：逐帧结果按时间排序，趋势对合并后的统计量做整体最小二乘"""
+    series = {}
+    for partial in partials:
+        entry = series.setdefault(partial['series'], {'frames': [], 'errors': [],
+                                                      'moments': (0.0, 0.0, 0.0, 0.0, 0.0)})
+        entry['frames'].extend(partial['frames'])
+        entry['errors'].extend(partial['errors'])
+        entry['moments'] = _combine(entry['moments'], partial['moments'])
+
+    merged = {}
+    for name, entry in series.items():
+        entry['frames'].sort(key=lambda f: f['time'])
+        n, mean_t, mean_y, m2_t, c_ty = entry['moments']
+        slope = c_ty / m2_t if m2_t > 1e-12 else 0.0
+        merged[name] = {
+            'frames': entry['frames'],
+            'errors': entry['errors'],
+            'trend': {'slope': slope, 'intercept': mean_y - slope * mean_t,
+                      'mean': mean_y, 'count': int(n)},
+        }
+    return merged
+
+
+class LocalProcessNode:
+    """本机进程节点，用于在单机上模拟多台后端"""
+
+    def __init__(self, name):
+        self.name = name
+        self._executor = ProcessPoolExecutor(max_workers=1)
+
+    def submit(self, fn, *args):
+        return self._executor.submit(fn, *args)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ShardCoordinator:
+    """将长序列按 (序列, 时间窗) 分片，经一致性哈希分配到多个节点并合并结果
+
+    nodes 为 {名称: 节点}，节点需提供 submit(fn, *args) -> Future。
+    节点失败（提交或执行抛出异常，或分片超过 chunk_timeout 秒未完成）时将其
+    从哈希环移除，该节点上未完成的分片按新的哈希环重新分配；其余节点的分片
+    不受影响。
+    """
+
+    def __init__(self, nodes, chunk_seconds=86400.0, vnodes=64, max_in_flight=2,
+                 chunk_timeout=600.0):
+        self.nodes = dict(nodes)
+        self.ring = HashRing(self.nodes, vnodes=vnodes)
+        self.chunk_seconds = chunk_seconds
+        self.max_in_flight = max_in_flight  # 每个节点同时处理的分片数
+        self.chunk_timeout = chunk_timeout  # 单个分片的最长处理时间（秒），超时视为节点失败
+        self.failed = []
+        self.stats = {'chunks': 0, 'resharded': 0}
+
+    def _mark_failed(self, name, error):
+        if name in self.ring.nodes:
+            logger.warning(f"节点 {name} 失败，重新分片: {str(error)}")
+            self.ring.remove(name)
+            self.failed.append(name)
+
+    def run(self, records, frame_fn=mean_intensity):
+        """处理记录并返回 {序列: {'frames', 'trend'}}"""
+        chunks = make_chunks(records, self.chunk_seconds)
+        self.stats['chunks'] = len(chunks)
+        pending = {}  # 节点 -> 待处理的分片 key 列表
+        for key in sorted(chunks):
+            pending.setdefault(self.ring.get(key), []).append(key)
+
+        running = {}  # Future -> (节点, key, 开始时间)
+        partials = []
+        while pending or running:
+            # 按每个节点的并发上限派发分片
+            for name in list(pending):
+                if name not in self.ring.nodes:
+                    # 节点已失效：按新的哈希环重新分配
+                    for key in pending.pop(name):
+                        pending.setdefault(self.ring.get(key), []).append(key)
+                        self.stats['resharded'] += 1
+                    continue
+                busy = sum(1 for owner, _, _ in running.values() if owner == name)
+                while pending[name] and busy < self.max_in_flight:
+                    key = pending[name].pop(0)
+                    try:
+                        future = self.nodes[name].submit(analyze_chunk, key, chunks[key], frame_fn)
+                    except Exception as e:
+                        pending[name].insert(0, key)
+                        self._mark_failed(name, e)
+                        break
+                    running[future] = (name, key, time.monotonic())
+                    busy += 1
+                if not pending.get(name):
+                    pending.pop(name, None)
+            if not running:
+                continue
+
+            # 等待到最早的分片截止时间，挂起而不抛异常的节点也能被发现
+            deadline = min(started for _, _, started in running.values()) + self.chunk_timeout
+            done, _ = wait(running, timeout=max(0.0, deadline - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                name, key, _ = running.pop(future)
+                try:
+                    partials.append(future.result())
+                except Exception as e:
+                    self._mark_failed(name, e)
+                    pending.setdefault(self.ring.get(key), []).append(key)
+                    self.stats['resharded'] += 1
+            now = time.monotonic()
+            for future, (name, key, started) in list(running.items()):
+                if now - started >= self.chunk_timeout:
+                    # 超时分片的迟到结果直接丢弃
+                    del running[future]
+                    future.cancel()
+                    self._mark_failed(name, TimeoutError(f"分片 {key} 超过 {self.chunk_timeout}s 未完成"))
+                    pending.setdefault(self.ring.get(key), []).append(key)
+                    self.stats['resharded'] += 1
+        return merge_partials(partials)
+
+
+def scaling_curve(records, node_counts=(1, 2, 4), frame_fn=mean_intensity, chunk_seconds=86400.0):
+    """在本机用多个进程节点测量扩展曲线，返回 [{'nodes', 'seconds', 'frames_per_second'}]"""
+    curve = []
+    for count in node_counts:
+        nodes = {f"node-{i}": LocalProcessNode(f"node-{i}") for i in range(count)}
+        try:
+            coordinator = ShardCoordinator(nodes, chunk_seconds=chunk_seconds)
+            start = time.perf_counter()
+            coordinator.run(records, frame_fn)
+            elapsed = time.perf_counter() - start
+        finally:
+            for node in nodes.values():
+                node.shutdown()
+        curve.append({'nodes': count, 'seconds': elapsed,
+                      'frames_per_second': len(records) / elapsed if elapsed else 0.0})
+    return curve
+
+
+def main():
+    from ...utils.metadata_scanner import scan_metadata
+
+    parser = argparse.ArgumentParser(description="在本机多进程节点上测量序列分片处理的扩展曲线")
+    parser.add_argument('folder', help="图片目录")
+    parser.add_argument('--nodes', default="1,2,4", help="节点数列表，如 1,2,4")
+    parser.add_argument('--chunk-hours', type=float, default=24.0)
+    args = parser.parse_args()
+
+    records = [record for batch in scan_metadata([args.folder]) for record in batch]
+
+    counts = [int(n) for n in args.nodes.split(',')]
+    for point in scaling_curve(records, counts, chunk_seconds=args.chunk_hours * 3600):
+        print(f"{point['nodes']} 节点: {point['seconds']:.2f}s, {point['frames_per_second']:.1f} 帧/秒")
+
+
+if __name__ == "__main__":
+    main()
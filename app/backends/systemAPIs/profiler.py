@@ -0,0 +1,195 @@
+import os
+import sys
+import time
+import threading
+import logging
+from collections import Counter, deque
+from contextlib import contextmanager
+from ...config.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_stack(frame, max_depth=128):
+    """将帧链转为从外到内的 'module:function:line' 列表"""
+    stack = []
+    while frame is not None and len(stack) < max_depth:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def collapse(counts):
+    """输出 flamegraph.pl / speedscope 可读取的折叠栈文本"""
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common())
+
+
+class SamplingProfiler:
+    """按需启动的采样分析器，定时读取各线程调用栈并累计折叠栈"""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration=30.0, interval=0.005, thread_ids=None):
+        """开始采样；duration 秒后自动停止，thread_ids 为空时采样所有线程"""
+        if self.running:
+            raise RuntimeError("采样已在进行中")
+        with self._lock:
+            self._counts = Counter()
+            self.samples = 0
+        self._stop.clear()
+        self.started_at = time.time()
+        self.stopped_at = None
+        self._thread = threading.Thread(
+            target=self._run, args=(duration, interval, thread_ids),
+            name="SamplingProfiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止采样并返回折叠栈"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self.collapsed()
+
+    def _run(self, duration, interval, thread_ids):
+        own = threading.get_ident()
+        deadline = time.monotonic() + duration
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == own or (thread_ids and ident not in thread_ids):
+                        continue
+                    stack = ";".join([names.get(ident, str(ident))] + _frame_stack(frame))
+                    self._counts[stack] += 1
+                self.samples += 1
+            self._stop.wait(interval)
+        self.stopped_at = time.time()
+
+    def collapsed(self):
+        with self._lock:
+            return collapse(self._counts)
+
+    def write_collapsed(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.collapsed() + "\n")
+
+
+class SlowRequestWatcher:
+    """慢请求自动采样：请求耗时超过阈值后开始采样其所在线程，结束时保存结果"""
+
+    def __init__(self, threshold=None, interval=0.005, max_captures=20):
+        self.threshold = threshold if threshold is not None else Config.slow_request_threshold
+        self.interval = interval
+        self.captures = deque(maxlen=max_captures)
+        self._active = {}  # 请求 id -> 状态
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="SlowRequestWatcher",
+                                            daemon=True)
+            self._thread.start()
+
+    @contextmanager
+    def track(self, name):
+        """包裹一次请求处理"""
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            state = {'name': name, 'thread': threading.get_ident(),
+                     'start': time.monotonic(), 'counts': None}
+            self._active[request_id] = state
+            self._ensure_thread()
+        try:
+            yield
+        finally:
+            with self._lock:
+                del self._active[request_id]
+                if state['counts']:
+                    elapsed = time.monotonic() - state['start']
+                    self.captures.append({
+                        'name': name,
+                        'duration': elapsed,
+                        'time': time.time(),
+                        'collapsed': collapse(state['counts']),
+                    })
+                    logger.warning(f"慢请求 {name} 耗时 {elapsed:.2f}s，已保存采样结果")
+
+    def _run(self):
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                if not self._active:
+                    # 没有进行中的请求时退出，下次请求再启动
+                    self._thread = None
+                    return
+                slow = [s for s in self._active.values() if now - s['start'] >= self.threshold]
+            if slow:
+                frames = sys._current_frames()
+                with self._lock:
+                    for state in slow:
+                        frame = frames.get(state['thread'])
+                        if frame is None:
+                            continue
+                        if state['counts'] is None:
+                            state['counts'] = Counter()
+                        state['counts'][";".join([state['name']] + _frame_stack(frame))] += 1
+                time.sleep(self.interval)
+            else:
+                # 没有慢请求时低频轮询
+                time.sleep(min(self.threshold / 4, 0.05))
+
+
+# ---- 后端 API ----
+_profiler = SamplingProfiler()
+slow_request_watcher = SlowRequestWatcher()
+
+
+def start_profiling(duration=30.0, interval=0.005):
+    """开始采样（最长 duration 秒，不超过配置的上限）"""
+    duration = min(float(duration), Config.profile_max_duration)
+    try:
+        _profiler.start(duration, interval)
+        return {'status': 'success', 'duration': duration, 'interval': interval}
+    except RuntimeError as e:
+        return {'status': 'error', 'message': str(e)}
+
+
+def stop_profiling():
+    """停止采样并返回折叠栈"""
+    collapsed = _profiler.stop()
+    return {'status': 'success', 'samples': _profiler.samples, 'collapsed': collapsed}
+
+
+def get_profile():
+    """返回当前采样状态和结果（不停止采样）"""
+    return {
+        'status': 'success',
+        'running': _profiler.running,
+        'samples': _profiler.samples,
+        'collapsed': _profiler.collapsed(),
+    }
+
+
+def get_slow_captures():
+    """返回慢请求自动采样结果"""
+    return {'status': 'success', 'threshold': slow_request_watcher.threshold,
+            'captures': list(slow_request_watcher.captures)}
@@ -0,0 +1,238 @@
+import time
+import threading
+import logging
+from collections import deque
+from concurrent.futures import Future
+from ...config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# 优先级类别：权重越大分到的处理能力越多；max_wait 为允许的最长预计排队时间（秒）；
+# reserved 为只给该类别使用的工作线程数，避免批量任务占满全部线程
+PRIORITY_CLASSES = {
+    'interactive': {'weight': 16, 'max_wait': 2.0, 'client_quota': 4, 'reserved': 1},
+    'trend': {'weight': 4, 'max_wait': 30.0, 'client_quota': 8},
+    'bulk': {'weight': 1, 'max_wait': 600.0, 'client_quota': 256},
+}
+
+
+class Overloaded(Exception):
+    """过载时拒绝请求，retry_after 为建议的重试等待时间（秒）"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Task:
+    __slots__ = ('fn', 'args', 'kwargs', 'future', 'priority', 'client', 'finish', 'enqueued',
+                 'started')
+
+    def __init__(self, fn, args, kwargs, priority, client, finish):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.priority = priority
+        self.client = client
+        self.finish = finish
+        self.enqueued = time.monotonic()
+        self.started = None
+
+
+class RequestScheduler:
+    """带优先级、加权公平排队、按客户端配额和准入控制的请求调度器
+
+    每个优先级类别一条队列，任务按加权公平排队的虚拟完成时间出队，
+    交互请求权重大，批量任务只消耗剩余处理能力；类别的 reserved 线程
+    其他类别不能占用，交互请求不会排在执行中的批量任务之后。预计排队时间
+    超过该类别上限或客户端超出配额时抛出 Overloaded，由接口层返回 retry-after。
+    """
+
+    def __init__(self, workers=None, classes=None):
+        self.classes = classes or PRIORITY_CLASSES
+        self.workers = workers or Config.worker_count
+        self._queues = {name: deque() for name in self.classes}
+        self._last_finish = {name: 0.0 for name in self.classes}
+        self._service_time = {name: 0.1 for name in self.classes}  # 处理耗时的指数平均
+        self._client_load = {}  # (类别, 客户端) -> 排队 + 执行中的数量
+        self._virtual_time = 0.0
+        self._running = 0
+        self._running_by_class = {name: 0 for name in self.classes}
+        self._active = set()  # 执行中的任务
+        # 预留线程总数不超过 workers - 1，保证其他类别至少有一个线程可用
+        self._reserved = {}
+        available = self.workers - 1
+        for name, spec in self.classes.items():
+            self._reserved[name] = min(spec.get('reserved', 0), available)
+            available -= self._reserved[name]
+        self._cond = threading.Condition()
+        self._stopped = False
+        self.stats = {name: {'accepted': 0, 'rejected': 0, 'completed': 0} for name in self.classes}
+        self._threads = [threading.Thread(target=self._worker, name=f"scheduler-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def estimated_wait(self, priority):
+        """估计新请求的排队时间：排在它之前的加权工作量 / 工作线程数"""
+        with self._cond:
+            return self._estimated_wait_locked(priority)
+
+    def _estimated_wait_locked(self, priority):
+        weight = self.classes[priority]['weight']
+        ahead = 0.0
+        for name, queue in self._queues.items():
+            # 其他类别按权重比例分享处理能力
+            share = min(1.0, self.classes[name]['weight'] / weight)
+            ahead += len(queue) * self._service_time[name] * share
+        wait = ahead / self.workers
+        if self._active and not self._can_start_locked(priority):
+            # 没有可用线程时至少要等最早结束的执行中任务（按平均耗时估计剩余时间）
+            now = time.monotonic()
+            wait += min(max(0.0, self._service_time[task.priority] - (now - task.started))
+                        for task in self._active)
+        return wait
+
+    def _can_start_locked(self, priority):
+        """空闲线程扣除其他类别尚未用到的预留后，是否还能执行该类别的任务"""
+        free = self.workers - self._running
+        held = sum(max(0, reserved - self._running_by_class[name])
+                   for name, reserved in self._reserved.items() if name != priority)
+        return free - held >= 1
+
+    def submit(self, fn, *args, priority='interactive', client='default', cost=1.0, **kwargs):
+        """提交请求，返回 Future；过载时抛出 Overloaded"""
+        if priority not in self.classes:
+            raise ValueError(f"未知优先级: {priority}")
+        spec = self.classes[priority]
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("调度器已停止")
+            load_key = (priority, client)
+            if self._client_load.get(load_key, 0) >= spec['client_quota']:
+                self.stats[priority]['rejected'] += 1
+                raise Overloaded(f"客户端 {client} 超出 {priority} 配额",
+                                 retry_after=max(0.1, self._service_time[priority]))
+            wait = self._estimated_wait_locked(priority)
+            if wait > spec['max_wait']:
+                self.stats[priority]['rejected'] += 1
+                raise Overloaded(f"{priority} 队列过载，预计等待 {wait:.1f}s",
+                                 retry_after=round(wait - spec['max_wait'] + self._service_time[priority], 2))
+
+            # 加权公平排队：虚拟完成时间 = max(当前虚拟时间, 本类别上次完成时间) + 代价 / 权重
+            start = max(self._virtual_time, self._last_finish[priority])
+            finish = start + cost / spec['weight']
+            self._last_finish[priority] = finish
+            task = _Task(fn, args, kwargs, priority, client, finish)
+            self._queues[priority].append(task)
+            self._client_load[load_key] = self._client_load.get(load_key, 0) + 1
+            self.stats[priority]['accepted'] += 1
+            self._cond.notify()
+        return task.future
+
+    def _next_task(self):
+        """可执行类别中虚拟完成时间最小的任务，没有时返回 None"""
+        best = None
+        for name, queue in self._queues.items():
+            if (queue and self._can_start_locked(name)
+                    and (best is None or queue[0].finish < best[0].finish)):
+                best = queue
+        if best is None:
+            return None
+        task = best.popleft()
+        self._virtual_time = max(self._virtual_time, task.finish)
+        return task
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped and not any(self._queues.values()):
+                        return
+                    task = self._next_task()
+                    if task is not None:
+                        break
+                    self._cond.wait()
+                self._running += 1
+                self._running_by_class[task.priority] += 1
+                task.started = time.monotonic()
+                self._active.add(task)
+            if not task.future.set_running_or_notify_cancel():
+                self._finish(task, None)
+                continue
+            start = time.perf_counter()
+            try:
+                task.future.set_result(task.fn(*task.args, **task.kwargs))
+            except BaseException as e:
+                task.future.set_exception(e)
+            self._finish(task, time.perf_counter() - start)
+
+    def _finish(self, task, elapsed):
+        with self._cond:
+            self._running -= 1
+            self._running_by_class[task.priority] -= 1
+            self._active.discard(task)
+            # 预留线程释放后其他类别的任务可能变为可执行
+            self._cond.notify_all()
+            load_key = (task.priority, task.client)
+            self._client_load[load_key] -= 1
+            if not self._client_load[load_key]:
+                del self._client_load[load_key]
+            if elapsed is not None:
+                self._service_time[task.priority] = (
+                    0.8 * self._service_time[task.priority] + 0.2 * elapsed)
+                self.stats[task.priority]['completed'] += 1
+
+    def queue_lengths(self):
+        with self._cond:
+            return {name: len(queue) for name, queue in self._queues.items()}
+
+    def shutdown(self, wait=True):
+        """停止接收新请求，处理完队列后退出"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+def overloaded_response(error):
+    """将 Overloaded 转为接口响应（HTTP 层应返回 429 并带 Retry-After 头）"""
+    return {'status': 'busy', 'message': str(error), 'retry_after': error.retry_after}
+
+
+# ---- 后端 API ----
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """返回全局调度器（首次使用时创建）"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
+
+
+def schedule_request(fn, *args, priority='interactive', client='default', cost=1.0, timeout=None, **kwargs):
+    """经调度器执行请求并等待结果；过载时返回 busy 响应而不是排队"""
+    try:
+        future = get_scheduler().submit(fn, *args, priority=priority, client=client, cost=cost, **kwargs)
+    except Overloaded as e:
+        logger.info(f"拒绝请求 ({priority}/{client}): {str(e)}")
+        return overloaded_response(e)
+    return future.result(timeout)
+
+
+def get_scheduler_stats():
+    """返回各优先级的排队长度、预计等待和接受/拒绝/完成计数"""
+    scheduler = get_scheduler()
+    return {
+        'status': 'success',
+        'queues': scheduler.queue_lengths(),
+        'estimated_wait': {name: scheduler.estimated_wait(name) for name in scheduler.classes},
+        'stats': {name: dict(stats) for name, stats in scheduler.stats.items()},
+    }
@@ -0,0 +1,116 @@
+import os
+import time
+import itertools
+import argparse
+import logging
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def apply_thread_settings(settings=None):
+    """将线程设置应用到 PyTorch（未安装时忽略）"""
+    settings = settings or Config.performance()
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(int(settings['num_threads']))
+    try:
+        # 只能在首次并行计算前设置一次
+        torch.set_num_interop_threads(int(settings['interop_threads']))
+    except RuntimeError:
+        pass
+
+
+def candidate_settings(batch_sizes=(1, 2, 4, 8, 16), thread_counts=None):
+    """生成候选设置（批大小 × 线程数）"""
+    cpus = os.cpu_count() or 1
+    if thread_counts is None:
+        thread_counts = sorted({1, max(1, cpus // 4), max(1, cpus // 2), cpus})
+    for batch_size, threads in itertools.product(batch_sizes, thread_counts):
+        settings = Config.performance()
+        settings.update({
+            'batch_size': batch_size,
+            'num_threads': threads,
+            'decode_workers': max(1, min(cpus - threads, 8)),
+        })
+        yield settings
+
+
+def measure_throughput(benchmark, settings, warmup=1, repeats=3):
+    """测量一组设置下的吞吐量（张/秒），benchmark(settings) 返回处理的图片数"""
+    apply_thread_settings(settings)
+    for _ in range(warmup):
+        benchmark(settings)
+    count = 0
+    start = time.perf_counter()
+    for _ in range(repeats):
+        count += benchmark(settings)
+    elapsed = time.perf_counter() - start
+    return count / elapsed if elapsed > 0 else 0.0
+
+
+def autotune(model_name, benchmark, candidates=None, warmup=1, repeats=3, save=True):
+    """在本机上对候选设置做基准测试，保存并应用吞吐量最高的配置"""
+    best_settings, best_throughput = None, 0.0
+    results = []
+    for settings in candidates or candidate_settings():
+        try:
+            throughput = measure_throughput(benchmark, settings, warmup, repeats)
+        except Exception as e:
+            # 例如批过大导致内存不足，跳过该候选
+            logger.warning(f"候选设置 {settings} 测试失败: {str(e)}")
+            continue
+        results.append((settings, throughput))
+        logger.info(f"批大小 {settings['batch_size']}, 线程 {settings['num_threads']}: "
+                    f"{throughput:.1f} 张/秒")
+        if throughput > best_throughput:
+            best_settings, best_throughput = settings, throughput
+
+    if best_settings is None:
+        raise RuntimeError("没有可用的候选设置")
+    Config.update(best_settings)
+    apply_thread_settings(best_settings)
+    if save:
+        Config.save_profile(model_name, best_settings, {'throughput': best_throughput})
+    logger.info(f"最佳配置 {model_name}: {best_settings} ({best_throughput:.1f} 张/秒)")
+    return best_settings, results
+
+
+def torch_benchmark(model, input_size=(3, 224, 224), iterations=5):
+    """构造针对 PyTorch 模型的基准函数，使用随机输入按批推理"""
+    import torch
+
+    model.eval()
+
+    def run(settings):
+        batch = torch.randn(int(settings['batch_size']), *input_size)
+        with torch.no_grad():
+            for _ in range(iterations):
+                model(batch)
+        return int(settings['batch_size']) * iterations
+
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在本机上自动调优推理性能配置")
+    parser.add_argument('--model-name', required=True, help="保存配置时使用的模型名")
+    parser.add_argument('--model-path', default=Config.model_path, help="模型权重路径")
+    parser.add_argument('--input-size', type=int, nargs=3, default=(3, 224, 224),
+                        metavar=('C', 'H', 'W'))
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from ..backends.detectionAPIs.inference import load_model
+    model = load_model(args.model_path)
+    if model is None:
+        raise SystemExit(f"无法加载模型: {args.model_path}")
+    autotune(args.model_name, torch_benchmark(model, tuple(args.input_size)),
+             candidates=candidate_settings(tuple(args.batch_sizes)))
+
+
+if __name__ == "__main__":
+    main()
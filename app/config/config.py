@@ -1,4 +1,13 @@
+import os
+import json
+import socket
+import logging
+
+logger = logging.getLogger(__name__)
+
+
 class Config:
+    # ==================== 路径 ====================
     # 模型路径
     model_path = "model.pth"
 
@@ -7,3 +16,161 @@ class Config:
 
     # 结果路径
     result_path = "result.jpg"
+
+    # 图片目录数据库路径（":memory:" 表示仅在本次运行中保存；为文件时各标签页
+    # 分别保存在 <文件名>.<标签页>.db 中）
+    catalog_path = ":memory:"
+
+    # 性能配置文件路径（按主机和模型保存自动调优结果）
+    profile_path = "performance_profiles.json"
+
+    # TorchScript 冻结模型缓存目录
+    model_cache_dir = "model_cache"
+
+    # 批量检测任务日志目录（断点续跑）
+    batch_job_dir = "batch_jobs"
+
+    # ==================== 性能 ====================
+    # 推理批大小
+    batch_size = 1
+
+    # 推理线程数（算子内并行）
+    num_threads = os.cpu_count() or 1
+
+    # 算子间并行线程数
+    interop_threads = 1
+
+    # 图片解码/预处理线程数
+    decode_workers = min(4, os.cpu_count() or 1)
+
+    # 后台任务工作线程数
+    worker_count = 2
+
+    # 图片缓存预算（MB），限制查看器内存中已解码瓦片的总大小
+    image_cache_mb = 512
+
+    # ==================== 内存管理 ====================
+    # 进程内存预算（MB），超出后按优先级回收缓存
+    memory_budget_mb = 4096
+
+    # 内存检查间隔（秒）
+    memory_check_interval = 5.0
+
+    # ==================== 性能诊断 ====================
+    # 请求耗时超过该值（秒）时自动采样调用栈
+    slow_request_threshold = 1.0
+
+    # 手动采样的最长时间（秒）
+    profile_max_duration = 60.0
+
+    # ==================== 变化检测 ====================
+    # 块大小（像素）
+    change_block_size = 32
+
+    # 块内平均灰度差超过该值视为变化
+    change_pixel_threshold = 12.0
+
+    # 变化块比例不超过该值时跳过本帧
+    change_skip_ratio = 0.002
+
+    # 变化块比例超过该值时执行全帧检测
+    change_full_ratio = 0.3
+
+    # ROI 向外扩展的块数
+    change_roi_margin = 1
+
+    # 每隔多少帧强制执行一次全帧检测
+    change_keyframe_interval = 50
+
+    # 感知哈希汉明距离不超过该值的帧视为近重复，直接复用已有结果
+    dedup_hash_distance = 3
+
+    # 近重复索引最多保留的序列数（按最近使用淘汰）和每个序列保留的帧数
+    dedup_max_series = 64
+    dedup_max_per_series = 10000
+
+    # 级联检测：初筛阈值按该召回率在验证集上调整
+    cascade_target_recall = 0.99
+
+    # 级联初筛分类头路径（含阈值），为空时批量检测不启用级联
+    cascade_head_path = ""
+
+    # ==================== 图像查看 ====================
+    # 瓦片金字塔缓存目录
+    tile_cache_dir = "tile_cache"
+
+    # 瓦片边长（像素）
+    tile_size = 256
+
+    # 查看器内存中最多缓存的瓦片数
+    tile_memory_tiles = 256
+
+    # 瓦片磁盘缓存上限（MB），超出后按最近使用时间清理
+    tile_cache_max_mb = 2048
+
+    # 单张图片解码的内存上限（MB），Qt 5.15 默认 128MB，生成大图瓦片时不够用
+    image_decode_limit_mb = 2048
+
+    # 可由自动调优写入性能配置文件的字段
+    PERFORMANCE_KEYS = ('batch_size', 'num_threads', 'interop_threads',
+                        'decode_workers', 'worker_count', 'image_cache_mb')
+
+    @classmethod
+    def performance(cls):
+        """返回当前性能设置"""
+        return {key: getattr(cls, key) for key in cls.PERFORMANCE_KEYS}
+
+    @classmethod
+    def reset_performance(cls):
+        """将性能设置恢复为默认值"""
+        for key, value in _PERFORMANCE_DEFAULTS.items():
+            setattr(cls, key, value)
+
+    @classmethod
+    def update(cls, values):
+        """更新配置项，只接受已定义的字段"""
+        for key, value in values.items():
+            if not hasattr(cls, key) or key.startswith('_'):
+                raise KeyError(f"未知配置项: {key}")
+            setattr(cls, key, type(getattr(cls, key))(value))
+
+    @classmethod
+    def _read_profiles(cls):
+        try:
+            with open(cls.profile_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @classmethod
+    def load_profile(cls, model_name, host=None):
+        """加载本机该模型的性能配置，存在时应用并返回，否则返回 None"""
+        host = host or socket.gethostname()
+        profile = cls._read_profiles().get(host, {}).get(model_name)
+        # 先恢复默认值，避免沿用上一个模型的调优结果
+        cls.reset_performance()
+        if profile:
+            settings = {k: v for k, v in profile.get('settings', {}).items()
+                        if k in cls.PERFORMANCE_KEYS}
+            cls.update(settings)
+            logger.info(f"已加载性能配置 {host}/{model_name}: {settings}")
+            return settings
+        return None
+
+    @classmethod
+    def save_profile(cls, model_name, settings, metrics=None, host=None):
+        """保存本机该模型的性能配置"""
+        host = host or socket.gethostname()
+        profiles = cls._read_profiles()
+        profiles.setdefault(host, {})[model_name] = {
+            'settings': {k: settings[k] for k in cls.PERFORMANCE_KEYS if k in settings},
+            'metrics': metrics or {},
+        }
+        tmp_path = cls.profile_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(profiles, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, cls.profile_path)
+
+
+# 性能设置的默认值（加载其他模型的配置前恢复）
+_PERFORMANCE_DEFAULTS = Config.performance()
@@ -0,0 +1,219 @@
+import os
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 允许的排序字段（对外名称 -> SQL 表达式），避免拼接任意 SQL
+SORT_KEYS = {
+    'id': 'id',
+    'name': 'name',
+    'path': 'path',
+    'mtime': 'mtime',
+    'size': 'size',
+    'series': 'series',
+    # 优先使用 EXIF 拍摄时间，缺失时退回文件修改时间
+    'time': 'COALESCE(capture_time, mtime)',
+}
+
+# 后续版本新增的列（旧数据库打开时自动补齐）
+_EXTRA_COLUMNS = (
+    ('width', 'INTEGER'),
+    ('height', 'INTEGER'),
+    ('capture_time', 'REAL'),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id     INTEGER PRIMARY KEY,
+    path   TEXT NOT NULL UNIQUE,  -- UNIQUE 约束自带路径索引
+    name   TEXT NOT NULL,
+    series TEXT NOT NULL DEFAULT '',
+    mtime  REAL,
+    size   INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_images_mtime  ON images(mtime);
+CREATE INDEX IF NOT EXISTS idx_images_size   ON images(size);
+CREATE INDEX IF NOT EXISTS idx_images_series ON images(series);
+CREATE INDEX IF NOT EXISTS idx_images_name   ON images(name);
+"""
+
+_INDEXES_AFTER_MIGRATION = """
+CREATE INDEX IF NOT EXISTS idx_images_time ON images(COALESCE(capture_time, mtime));
+"""
+
+
+def catalog_path_for(db_path, owner=None):
+    """每个使用者（如各标签页）使用独立的数据库文件，互不影响导入和清空
+
+    例如 catalog.db 对应 catalog.tab1.db；":memory:" 本身即每个连接独立。
+    """
+    if not owner or db_path == ":memory:":
+        return db_path
+    root, ext = os.path.splitext(db_path)
+    return f"{root}.{owner}{ext or '.db'}"
+
+
+class ImageCatalog:
+    """基于SQLite的图片目录，按id/路径O(1)查找，排序和过滤在数据库中完成
+
+    owner 用于区分使用者，不同 owner 的目录保存在各自的数据库中。
+    """
+
+    def __init__(self, db_path=":memory:", owner=None):
+        db_path = catalog_path_for(db_path, owner)
+        self.db_path = db_path
+        self.owner = owner
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._migrate()
+
+    def _migrate(self):
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(images)")}
+        for name, sql_type in _EXTRA_COLUMNS:
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE images ADD COLUMN {name} {sql_type}")
+        self._conn.executescript(_INDEXES_AFTER_MIGRATION)
+        self._conn.commit()
+
+    @staticmethod
+    def series_of(path):
+        """默认以所在文件夹名作为序列名"""
+        return os.path.basename(os.path.dirname(path))
+
+    def add_images(self, paths, series=None):
+        """批量添加图片，已存在的路径会被忽略，返回新增数量"""
+        rows = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                mtime, size = stat.st_mtime, stat.st_size
+            except OSError:
+                mtime, size = None, None
+            rows.append((
+                path,
+                os.path.basename(path),
+                series if series is not None else self.series_of(path),
+                mtime,
+                size,
+            ))
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO images (path, name, series, mtime, size) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def add_records(self, records):
+        """批量写入扫描得到的元数据记录，已存在的路径会更新元数据"""
+        with self._lock:
+            last_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM images").fetchone()[0]
+            self._conn.executemany(
+                "INSERT INTO images (path, name, series, mtime, size, width, height, capture_time) "
+                "VALUES (:path, :name, :series, :mtime, :size, :width, :height, :capture_time) "
+                "ON CONFLICT(path) DO UPDATE SET mtime=excluded.mtime, size=excluded.size, "
+                "width=excluded.width, height=excluded.height, "
+                "capture_time=excluded.capture_time",
+                records
+            )
+            self._conn.commit()
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM images WHERE id > ?", (last_id,)).fetchone()[0]
+
+    def _where(self, name_filter=None, series=None):
+        clauses, params = [], []
+        if name_filter:
+            clauses.append("name LIKE ?")
+            params.append(f"%{name_filter}%")
+        if series is not None:
+            clauses.append("series = ?")
+            params.append(series)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def query_ids(self, order_by='id', descending=False, name_filter=None, series=None):
+        """按条件返回有序的图片id列表（只取id，行数据按需加载）"""
+        if order_by not in SORT_KEYS:
+            raise ValueError(f"不支持的排序字段: {order_by}")
+        where, params = self._where(name_filter, series)
+        direction = "DESC" if descending else "ASC"
+        sql = (f"SELECT id FROM images{where} "
+               f"ORDER BY {SORT_KEYS[order_by]} {direction}, id {direction}")
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params)]
+
+    def ids_after(self, last_id):
+        """返回大于指定id的新记录id（用于增量追加）"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT id FROM images WHERE id > ? ORDER BY id", (last_id,))]
+
+    def fetch(self, ids):
+        """批量读取记录，返回 {id: dict}"""
+        result = {}
+        ids = list(ids)
+        # SQLite 默认参数上限为999，分块查询
+        with self._lock:
+            for start in range(0, len(ids), 900):
+                chunk = ids[start:start + 900]
+                placeholders = ",".join("?" * len(chunk))
+                for row in self._conn.execute(
+                        f"SELECT * FROM images WHERE id IN ({placeholders})", chunk):
+                    result[row['id']] = dict(row)
+        return result
+
+    def get(self, image_id):
+        """按id读取单条记录"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM images WHERE id = ?", (image_id,)).fetchone()
+        return dict(row) if row else None
+
+    def find_by_path(self, path):
+        """按完整路径读取单条记录"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM images WHERE path = ?", (path,)).fetchone()
+        return dict(row) if row else None
+
+    def paths(self, order_by='id', series=None):
+        """返回有序的图片路径列表"""
+        if order_by not in SORT_KEYS:
+            raise ValueError(f"不支持的排序字段: {order_by}")
+        where, params = self._where(series=series)
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                f"SELECT path FROM images{where} ORDER BY {SORT_KEYS[order_by]}, id",
+                params)]
+
+    def series_names(self):
+        """返回所有序列名"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT series FROM images ORDER BY series")]
+
+    def count(self, name_filter=None, series=None):
+        where, params = self._where(name_filter, series)
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM images{where}", params).fetchone()[0]
+
+    def clear(self, series=None):
+        """清空目录（可只清空某个序列）"""
+        where, params = self._where(series=series)
+        with self._lock:
+            self._conn.execute(f"DELETE FROM images{where}", params)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
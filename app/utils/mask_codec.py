@@ -0,0 +1,250 @@
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import cv2
+except ImportError:  # 掩码转多边形需要 OpenCV
+    cv2 = None
+
+# 掩码统一使用 COCO 格式的 RLE：{'size': [h, w], 'counts': 压缩字符串}
+# 游程按列优先顺序排列，第一个游程为 0 值（掩码以 1 开头时首个游程长度为 0）
+
+
+# ---- 游程字符串压缩（与 pycocotools 兼容）----
+def counts_to_string(counts):
+    """游程长度压缩为 ASCII 字符串：与前前项做差分后按 5 位分组变长编码"""
+    chars = []
+    for i, x in enumerate(counts):
+        x = int(x)
+        if i > 2:
+            x -= int(counts[i - 2])
+        more = True
+        while more:
+            c = x & 0x1f
+            x >>= 5
+            more = (x != -1) if (c & 0x10) else (x != 0)
+            if more:
+                c |= 0x20
+            chars.append(chr(c + 48))
+    return "".join(chars)
+
+
+def string_to_counts(s):
+    """counts_to_string 的逆过程"""
+    counts = []
+    p = 0
+    while p < len(s):
+        x = 0
+        k = 0
+        more = True
+        while more:
+            c = ord(s[p]) - 48
+            x |= (c & 0x1f) << (5 * k)
+            more = c & 0x20
+            p += 1
+            k += 1
+            if not more and (c & 0x10):
+                x |= -1 << (5 * k)
+        if len(counts) > 2:
+            x += counts[-2]
+        counts.append(x)
+    return np.asarray(counts, dtype=np.int64)
+
+
+def _counts(rle):
+    counts = rle['counts']
+    if isinstance(counts, str):
+        return string_to_counts(counts)
+    if isinstance(counts, bytes):
+        return string_to_counts(counts.decode('ascii'))
+    return np.asarray(counts, dtype=np.int64)
+
+
+def _make_rle(counts, size, compress=True):
+    return {'size': [int(size[0]), int(size[1])],
+            'counts': counts_to_string(counts) if compress else [int(c) for c in counts]}
+
+
+# ---- 编解码 ----
+def encode_batch(masks, compress=True):
+    """批量编码 (N, H, W) 掩码，所有游程边界一次向量化求出"""
+    masks = np.asarray(masks)
+    if masks.ndim == 2:
+        masks = masks[None]
+    n, h, w = masks.shape
+    if n == 0:
+        return []
+    # 列优先展开
+    flat = masks.astype(bool, copy=False).transpose(0, 2, 1).reshape(n, h * w)
+    rows, cols = np.nonzero(flat[:, 1:] != flat[:, :-1])
+    splits = np.searchsorted(rows, np.arange(1, n))
+    rles = []
+    for i, changes in enumerate(np.split(cols + 1, splits)):
+        boundaries = np.concatenate(([0], changes, [h * w]))
+        counts = np.diff(boundaries)
+        if flat[i, 0]:
+            counts = np.concatenate(([0], counts))
+        rles.append(_make_rle(counts, (h, w), compress))
+    return rles
+
+
+def encode(mask, compress=True):
+    """编码单个 (H, W) 掩码"""
+    return encode_batch(np.asarray(mask)[None], compress)[0]
+
+
+def decode(rle):
+    """解码为 (H, W) 布尔掩码"""
+    h, w = rle['size']
+    counts = _counts(rle)
+    values = np.arange(len(counts)) % 2 == 1
+    return np.repeat(values, counts).reshape((h, w), order='F')
+
+
+def decode_batch(rles):
+    """批量解码为 (N, H, W) 布尔数组（尺寸需一致）"""
+    if not rles:
+        return np.zeros((0, 0, 0), dtype=bool)
+    return np.stack([decode(rle) for rle in rles])
+
+
+# ---- 直接在 RLE 上的运算 ----
+def area(rle):
+    """前景像素数（奇数位游程之和）"""
+    return int(_counts(rle)[1::2].sum())
+
+
+def to_bbox(rle):
+    """前景外接框 [x, y, w, h]，无前景时为全 0"""
+    h, _ = rle['size']
+    counts = _counts(rle)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    starts, ends = starts[1::2], ends[1::2]
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep] - 1
+    if not len(starts):
+        return [0, 0, 0, 0]
+    x0, x1 = starts // h, ends // h
+    # 游程跨列时覆盖整列高度
+    spans = x1 > x0
+    y0 = np.where(spans, 0, starts % h)
+    y1 = np.where(spans, h - 1, ends % h)
+    x_min, y_min = int(x0.min()), int(y0.min())
+    return [x_min, y_min, int(x1.max()) - x_min + 1, int(y1.max()) - y_min + 1]
+
+
+def _segments(count_list):
+    """将多个 RLE 对齐到共同的游程边界，返回 (各段长度, 每个掩码在各段上的值)"""
+    ends_list = [np.cumsum(counts) for counts in count_list]
+    ends = np.unique(np.concatenate(ends_list))
+    ends = ends[ends > 0]
+    starts = np.concatenate(([0], ends[:-1]))
+    values = np.stack([np.searchsorted(e, starts, side='right') % 2 == 1 for e in ends_list])
+    return ends - starts, values
+
+
+def _runs_from_segments(lengths, values):
+    """合并相邻同值段为游程"""
+    if not len(lengths):
+        return np.zeros(1, dtype=np.int64)
+    change = np.flatnonzero(values[1:] != values[:-1]) + 1
+    ends = np.cumsum(lengths)[np.concatenate((change - 1, [len(lengths) - 1]))]
+    counts = np.diff(np.concatenate(([0], ends)))
+    if values[0]:
+        counts = np.concatenate(([0], counts))
+    return counts
+
+
+def merge(rles, intersect=False, compress=True):
+    """多个掩码的并集（intersect=True 时为交集），结果仍为 RLE"""
+    if not rles:
+        raise ValueError("至少需要一个掩码")
+    lengths, values = _segments([_counts(rle) for rle in rles])
+    combined = values.all(axis=0) if intersect else values.any(axis=0)
+    return _make_rle(_runs_from_segments(lengths, combined), rles[0]['size'], compress)
+
+
+def iou(rles_a, rles_b):
+    """两组掩码的 IoU 矩阵 (len(a), len(b))，不解码为像素"""
+    counts_a = [_counts(rle) for rle in rles_a]
+    counts_b = [_counts(rle) for rle in rles_b]
+    areas_a = [int(c[1::2].sum()) for c in counts_a]
+    areas_b = [int(c[1::2].sum()) for c in counts_b]
+    result = np.zeros((len(counts_a), len(counts_b)), dtype=np.float64)
+    for i, a in enumerate(counts_a):
+        for j, b in enumerate(counts_b):
+            lengths, values = _segments([a, b])
+            inter = int(lengths[values[0] & values[1]].sum())
+            union = areas_a[i] + areas_b[j] - inter
+            result[i, j] = inter / union if union else 0.0
+    return result
+
+
+# ---- 多边形 ----
+def polygons_to_mask(polygons, height, width):
+    """多边形（COCO 格式 [x0, y0, x1, y1, ...] 列表）栅格化为掩码，按像素中心奇偶规则填充"""
+    mask = np.zeros((height, width), dtype=bool)
+    centers = np.arange(height) + 0.5
+    for polygon in polygons:
+        points = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+        if len(points) < 3:
+            continue
+        x0, y0 = points[:, 0], points[:, 1]
+        x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+        # 每条边与每行中心线的交点
+        lo, hi = np.minimum(y0, y1), np.maximum(y0, y1)
+        crosses = (centers[:, None] >= lo) & (centers[:, None] < hi)
+        rows, edges = np.nonzero(crosses)
+        if not len(rows):
+            continue
+        t = (centers[rows] - y0[edges]) / (y1[edges] - y0[edges])
+        xs = x0[edges] + t * (x1[edges] - x0[edges])
+        order = np.lexsort((xs, rows))
+        rows, xs = rows[order], xs[order]
+        # 同一行的交点两两配对，填充像素中心落在区间内的列
+        starts = np.clip(np.ceil(xs[0::2] - 0.5), 0, width).astype(np.int64)
+        stops = np.clip(np.ceil(xs[1::2] - 0.5), 0, width).astype(np.int64)
+        diff = np.zeros((height, width + 1), dtype=np.int32)
+        np.add.at(diff, (rows[0::2], starts), 1)
+        np.add.at(diff, (rows[0::2], stops), -1)
+        mask |= np.cumsum(diff[:, :width], axis=1) > 0
+    return mask
+
+
+def mask_to_polygons(mask, tolerance=1.0):
+    """掩码转简化多边形（外轮廓，Douglas-Peucker 简化）"""
+    if cv2 is None:
+        raise ImportError("掩码转多边形需要安装 opencv-python")
+    contours, _ = cv2.findContours(np.ascontiguousarray(mask, dtype=np.uint8),
+                                   cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    polygons = []
+    for contour in contours:
+        contour = cv2.approxPolyDP(contour, tolerance, True)
+        if len(contour) >= 3:
+            polygons.append(contour.reshape(-1).astype(float).tolist())
+    return polygons
+
+
+def to_rle(mask, height=None, width=None):
+    """将掩码的任意表示（RLE、多边形列表、数组）统一转为 RLE"""
+    if isinstance(mask, dict):
+        return mask
+    if isinstance(mask, np.ndarray):
+        return encode(mask)
+    return encode(polygons_to_mask(mask, height, width))
+
+
+def compact_detections(detections):
+    """将检测结果中的稠密掩码替换为 RLE，并补充面积（用于接口返回和结果存储）"""
+    compacted = []
+    for det in detections:
+        mask = det.get('mask')
+        if isinstance(mask, np.ndarray):
+            det = dict(det)
+            det['mask'] = encode(mask)
+            det.setdefault('mask_area', area(det['mask']))
+        compacted.append(det)
+    return compacted
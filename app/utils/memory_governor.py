@@ -0,0 +1,157 @@
+import os
+import gc
+import threading
+import weakref
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# 消费者优先级：数值越小越先被回收
+PRIORITY_CACHE = 10  # 可随时重建的缓存（瓦片、记录页）
+PRIORITY_DATA = 50  # 重建代价较高的数据（特征图、配准状态）
+PRIORITY_MODEL = 90  # 模型，最后回收
+
+
+def process_rss():
+    """返回当前进程常驻内存（字节）"""
+    if psutil is not None:
+        return psutil.Process(os.getpid()).memory_info().rss
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        # ru_maxrss 在 Linux 上单位为 KB，为峰值而非当前值
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _ref(fn):
+    """绑定方法使用弱引用，避免governor延长对象生命周期"""
+    if fn is None:
+        return None
+    if hasattr(fn, '__self__') and hasattr(fn, '__func__'):
+        return weakref.WeakMethod(fn)
+    return lambda: fn
+
+
+class MemoryGovernor:
+    """全局内存预算管理：跟踪 RSS 和已登记的消费者，超出预算时按优先级回收"""
+
+    def __init__(self, budget_mb, soft_ratio=0.9, interval=5.0):
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.soft_ratio = soft_ratio  # 超过 budget * soft_ratio 开始回收
+        self.interval = interval
+        self._consumers = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {'checks': 0, 'shrinks': 0, 'freed': 0}
+
+    def register(self, name, usage_fn, shrink_fn=None, priority=PRIORITY_CACHE):
+        """登记消费者
+
+        usage_fn() 返回当前占用字节数；shrink_fn(nbytes) 尝试释放约
+        nbytes 字节并返回实际释放量，为 None 时只统计不回收。
+        绑定方法以弱引用保存，对象销毁后自动注销。
+        """
+        with self._lock:
+            self._consumers[name] = {
+                'usage': _ref(usage_fn),
+                'shrink': _ref(shrink_fn),
+                'priority': priority,
+            }
+
+    def unregister(self, name):
+        with self._lock:
+            self._consumers.pop(name, None)
+
+    def _live_consumers(self):
+        live = []
+        with self._lock:
+            for name, consumer in list(self._consumers.items()):
+                usage_fn = consumer['usage']()
+                if usage_fn is None:
+                    del self._consumers[name]
+                    continue
+                shrink_ref = consumer['shrink']
+                live.append((name, consumer['priority'], usage_fn,
+                             shrink_ref() if shrink_ref is not None else None))
+        return live
+
+    def usage(self):
+        """返回当前 RSS、预算和各消费者占用"""
+        consumers = {}
+        for name, priority, usage_fn, _ in self._live_consumers():
+            try:
+                consumers[name] = int(usage_fn())
+            except Exception as e:
+                logger.warning(f"读取内存占用失败 {name}: {str(e)}")
+        return {'rss': process_rss(), 'budget': self.budget, 'consumers': consumers}
+
+    def check(self):
+        """检查内存，超出软上限时按优先级回收，返回释放的字节数"""
+        self.stats['checks'] += 1
+        rss = process_rss()
+        limit = self.budget * self.soft_ratio
+        if rss <= limit:
+            return 0
+        needed = rss - limit
+        freed = 0
+        logger.warning(f"内存超出预算: RSS {rss / 2**20:.0f}MB, 上限 {limit / 2**20:.0f}MB")
+        for name, priority, usage_fn, shrink_fn in sorted(
+                self._live_consumers(), key=lambda c: c[1]):
+            if shrink_fn is None:
+                continue
+            try:
+                released = shrink_fn(needed - freed) or 0
+            except Exception as e:
+                logger.warning(f"回收失败 {name}: {str(e)}")
+                continue
+            if released:
+                self.stats['shrinks'] += 1
+                logger.info(f"已回收 {name}: {released / 2**20:.1f}MB")
+            freed += released
+            if freed >= needed:
+                break
+        gc.collect()
+        self.stats['freed'] += freed
+        return freed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"内存检查失败: {str(e)}", exc_info=True)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="MemoryGovernor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor():
+    """返回进程内唯一的内存管理器"""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            from ..config.config import Config
+            _governor = MemoryGovernor(Config.memory_budget_mb,
+                                       interval=Config.memory_check_interval)
+        return _governor
@@ -0,0 +1,184 @@
+import os
+import struct
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+
+# 读取文件头时的最大字节数（EXIF 通常位于 JPEG 的前 64KB 内）
+HEADER_READ_LIMIT = 256 * 1024
+
+# EXIF 标签
+_TAG_EXIF_IFD = 0x8769
+_TAG_DATETIME = 0x0132
+_TAG_DATETIME_ORIGINAL = 0x9003
+
+# 带尺寸信息的 JPEG SOF 标记（排除 DHT/JPG/DAC）
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _parse_exif_datetime(value):
+    """将 EXIF 时间字符串 'YYYY:MM:DD HH:MM:SS' 转为时间戳"""
+    try:
+        text = value.split(b'\x00', 1)[0].decode('ascii').strip()
+        return time.mktime(time.strptime(text, '%Y:%m:%d %H:%M:%S'))
+    except (ValueError, UnicodeDecodeError, OverflowError):
+        return None
+
+
+def _read_exif_capture_time(tiff):
+    """从 TIFF 结构的 EXIF 数据中读取拍摄时间，优先 DateTimeOriginal"""
+    if len(tiff) < 8:
+        return None
+    if tiff[:2] == b'II':
+        endian = '<'
+    elif tiff[:2] == b'MM':
+        endian = '>'
+    else:
+        return None
+
+    def read_ifd(offset):
+        entries = {}
+        if offset + 2 > len(tiff):
+            return entries
+        count = struct.unpack_from(endian + 'H', tiff, offset)[0]
+        for i in range(count):
+            pos = offset + 2 + i * 12
+            if pos + 12 > len(tiff):
+                break
+            tag, typ, num, value = struct.unpack_from(endian + 'HHII', tiff, pos)
+            entries[tag] = (typ, num, value, pos + 8)
+        return entries
+
+    def ascii_value(entry):
+        typ, num, value, inline_pos = entry
+        if typ != 2:
+            return None
+        start = inline_pos if num <= 4 else value
+        return tiff[start:start + num]
+
+    ifd0 = read_ifd(struct.unpack_from(endian + 'I', tiff, 4)[0])
+    if _TAG_EXIF_IFD in ifd0:
+        exif_ifd = read_ifd(ifd0[_TAG_EXIF_IFD][2])
+        if _TAG_DATETIME_ORIGINAL in exif_ifd:
+            value = ascii_value(exif_ifd[_TAG_DATETIME_ORIGINAL])
+            if value:
+                return _parse_exif_datetime(value)
+    if _TAG_DATETIME in ifd0:
+        value = ascii_value(ifd0[_TAG_DATETIME])
+        if value:
+            return _parse_exif_datetime(value)
+    return None
+
+
+def _read_jpeg_header(f):
+    width = height = capture_time = None
+    if f.read(2) != b'\xff\xd8':
+        return None, None, None
+    read = 2
+    while read < HEADER_READ_LIMIT:
+        byte = f.read(1)
+        if not byte:
+            break
+        if byte != b'\xff':
+            read += 1
+            continue
+        marker = f.read(1)
+        while marker == b'\xff':  # 填充字节
+            marker = f.read(1)
+        if not marker:
+            break
+        marker = marker[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue
+        if marker in (0xD9, 0xDA):  # EOI / SOS 之后为压缩数据
+            break
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            break
+        length = struct.unpack('>H', length_bytes)[0]
+        if marker == 0xE1 and capture_time is None:
+            segment = f.read(length - 2)
+            if segment[:6] == b'Exif\x00\x00':
+                capture_time = _read_exif_capture_time(segment[6:])
+        elif marker in _SOF_MARKERS:
+            segment = f.read(length - 2)
+            if len(segment) >= 5:
+                height, width = struct.unpack_from('>HH', segment, 1)
+            break
+        else:
+            f.seek(length - 2, os.SEEK_CUR)
+        read += length + 2
+    return width, height, capture_time
+
+
+def read_image_header(path):
+    """只读取文件头获取 (宽, 高, 拍摄时间)，不解码像素数据"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(26)
+            if head[:2] == b'\xff\xd8':
+                f.seek(0)
+                return _read_jpeg_header(f)
+            if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+                width, height = struct.unpack_from('>II', head, 16)
+                return width, height, None
+            if head[:6] in (b'GIF87a', b'GIF89a'):
+                width, height = struct.unpack_from('<HH', head, 6)
+                return width, height, None
+            if head[:2] == b'BM' and len(head) >= 26:
+                width, height = struct.unpack_from('<ii', head, 18)
+                return width, abs(height), None
+    except (OSError, struct.error) as e:
+        logger.warning(f"读取图片头失败 {path}: {str(e)}")
+    return None, None, None
+
+
+def _iter_image_entries(paths):
+    """遍历文件和目录（目录使用 os.scandir 递归），产出 (路径, stat)"""
+    for path in paths:
+        if os.path.isdir(path):
+            stack = [path]
+            while stack:
+                try:
+                    with os.scandir(stack.pop()) as it:
+                        for entry in it:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                                try:
+                                    yield entry.path, entry.stat()
+                                except OSError:
+                                    continue
+                except OSError as e:
+                    logger.warning(f"无法读取目录: {str(e)}")
+        else:
+            try:
+                yield path, os.stat(path)
+            except OSError:
+                continue
+
+
+def scan_metadata(paths, batch_size=500):
+    """批量扫描图片元数据，每批产出一个记录列表"""
+    batch = []
+    for path, stat in _iter_image_entries(paths):
+        width, height, capture_time = read_image_header(path)
+        batch.append({
+            'path': path,
+            'name': os.path.basename(path),
+            'series': os.path.basename(os.path.dirname(path)),
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'width': width,
+            'height': height,
+            'capture_time': capture_time,
+        })
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
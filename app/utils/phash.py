@@ -0,0 +1,305 @@
+import json
+import threading
+import logging
+from collections import OrderedDict
+import numpy as np
+from ..config.config import Config
+from .memory_governor import get_governor, PRIORITY_CACHE
+
+logger = logging.getLogger(__name__)
+
+try:
+    import cv2
+except ImportError:  # 从文件计算哈希需要 OpenCV（GUI 中可用 QImageReader 解码后传入数组）
+    cv2 = None
+
+HASH_BITS = 64
+_BANDS = 4  # 多索引哈希：64 位分为 4 段，每段 16 位
+_BAND_BITS = HASH_BITS // _BANDS
+
+# 8 位数的置位个数查找表（旧版 NumPy 没有 bitwise_count）
+_POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(values):
+    """uint64 数组逐元素的置位个数"""
+    values = np.asarray(values, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return _POPCOUNT8[values.view(np.uint8).reshape(values.shape + (8,))].sum(axis=-1)
+
+
+def resize_area(stack, height, width):
+    """(N, H, W) 灰度图按区域均值缩放到 (N, height, width)"""
+    stack = np.asarray(stack, dtype=np.float32)
+    if stack.ndim == 2:
+        stack = stack[None]
+    _, h, w = stack.shape
+    rows = (np.arange(height) * h) // height
+    cols = (np.arange(width) * w) // width
+    sums = np.add.reduceat(np.add.reduceat(stack, rows, axis=1), cols, axis=2)
+    counts = np.diff(np.append(rows, h))[:, None] * np.diff(np.append(cols, w))[None, :]
+    return sums / counts
+
+
+def _pack(bits):
+    """(N, 64) 布尔数组打包为 uint64 哈希"""
+    return np.packbits(bits, axis=1).view('>u8').astype(np.uint64).ravel()
+
+
+def dhash(stack):
+    """差值哈希：缩放到 8x9，比较水平相邻像素"""
+    small = resize_area(stack, 8, 9)
+    return _pack((small[:, :, 1:] > small[:, :, :-1]).reshape(len(small), -1))
+
+
+_DCT_MATRIX = None
+
+
+def _dct_matrix(n=32):
+    global _DCT_MATRIX
+    if _DCT_MATRIX is None:
+        k = np.arange(n)[:, None]
+        x = np.arange(n)[None, :]
+        matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+        matrix[0] /= np.sqrt(2.0)
+        _DCT_MATRIX = matrix.astype(np.float32)
+    return _DCT_MATRIX
+
+
+def phash(stack):
+    """DCT 哈希：缩放到 32x32 做二维 DCT，取左上 8x8 低频系数（不含直流）与中位数比较"""
+    small = resize_area(stack, 32, 32)
+    d = _dct_matrix()
+    coeffs = (d @ small @ d.T)[:, :8, :8].reshape(len(small), -1)
+    low = coeffs[:, 1:]
+    median = np.median(low, axis=1, keepdims=True)
+    return _pack(np.concatenate([np.zeros((len(small), 1), dtype=bool), low > median], axis=1))
+
+
+HASH_FUNCTIONS = {'dhash': dhash, 'phash': phash}
+
+
+def load_gray(path, size=64):
+    """读取灰度图；JPEG 按 1/2、1/4、1/8 缩小解码，只保留计算哈希所需的分辨率"""
+    if cv2 is None:
+        raise ImportError("从文件计算感知哈希需要安装 opencv-python")
+    image = cv2.imread(path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if image is None:
+        raise IOError(f"无法读取图片: {path}")
+    return cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA)
+
+
+def hash_files(paths, method='dhash', size=64):
+    """批量计算文件哈希，读取失败的文件返回 None"""
+    grays, index = [], []
+    for i, path in enumerate(paths):
+        try:
+            grays.append(load_gray(path, size))
+            index.append(i)
+        except (IOError, OSError) as e:
+            logger.warning(f"无法计算哈希: {str(e)}")
+    result = [None] * len(paths)
+    if grays:
+        for i, value in zip(index, HASH_FUNCTIONS[method](np.stack(grays))):
+            result[i] = int(value)
+    return result
+
+
+class HashIndex:
+    """单个序列的汉明距离索引
+
+    距离阈值小于分段数时使用多索引哈希：两哈希距离 < 4 则至少有一段 16 位
+    完全相同，只需比较同段桶内的候选；否则对全部哈希做向量化比较。
+    """
+
+    def __init__(self):
+        self._hashes = np.zeros(0, dtype=np.uint64)
+        self._size = 0
+        self._buckets = [dict() for _ in range(_BANDS)]
+        self.items = []
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _bands(value):
+        return [(value >> (_BAND_BITS * b)) & 0xFFFF for b in range(_BANDS)]
+
+    def keep_last(self, count):
+        """只保留最近加入的 count 项并重建分段桶（编号重新从 0 开始）"""
+        start = max(0, self._size - count)
+        hashes = self._hashes[start:self._size].copy()
+        items = self.items[start:]
+        self.__init__()
+        for value, item in zip(hashes, items):
+            self.add(value, item)
+
+    def add(self, value, item=None):
+        """加入哈希，返回其编号"""
+        value = int(value)
+        if self._size == len(self._hashes):
+            grown = np.zeros(max(64, 2 * self._size), dtype=np.uint64)
+            grown[:self._size] = self._hashes[:self._size]
+            self._hashes = grown
+        index = self._size
+        self._hashes[index] = value
+        self._size += 1
+        self.items.append(item)
+        for bucket, band in zip(self._buckets, self._bands(value)):
+            bucket.setdefault(band, []).append(index)
+        return index
+
+    def query(self, value, max_distance):
+        """返回距离不超过 max_distance 的 [(编号, 距离)]，按距离升序"""
+        if not self._size:
+            return []
+        value = int(value)
+        if max_distance < _BANDS:
+            candidates = set()
+            for bucket, band in zip(self._buckets, self._bands(value)):
+                candidates.update(bucket.get(band, ()))
+            if not candidates:
+                return []
+            ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        else:
+            ids = np.arange(self._size)
+        distances = popcount(self._hashes[ids] ^ np.uint64(value))
+        keep = distances <= max_distance
+        ids, distances = ids[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return [(int(i), int(d)) for i, d in zip(ids[order], distances[order])]
+
+    def nearest(self, value, max_distance):
+        """最近的匹配 (编号, 距离)，没有时返回 None"""
+        matches = self.query(value, max_distance)
+        return matches[0] if matches else None
+
+    def duplicate_groups(self, max_distance):
+        """按距离阈值将近重复项合并为组（并查集），只返回多于一项的组"""
+        parent = list(range(self._size))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i in range(self._size):
+            for j, _ in self.query(self._hashes[i], max_distance):
+                if j != i:
+                    ri, rj = find(i), find(j)
+                    if ri != rj:
+                        parent[max(ri, rj)] = min(ri, rj)
+        groups = {}
+        for i in range(self._size):
+            groups.setdefault(find(i), []).append(i)
+        return [members for members in groups.values() if len(members) > 1]
+
+
+def _result_nbytes(result):
+    """按 JSON 长度粗略估计一条缓存结果的内存占用"""
+    try:
+        return len(json.dumps(result, default=str)) + 256
+    except (TypeError, ValueError):
+        return 1024
+
+
+class DedupInference:
+    """近重复帧复用推理结果：同一序列中与已分析帧哈希距离足够小的帧直接返回其结果
+
+    按序列保存索引，序列数超过 max_series 时淘汰最久未使用的序列，单个序列
+    超过 max_per_series 帧时只保留较新的一半；内存紧张时由内存管理器回收。
+    """
+
+    def __init__(self, detect_fn=None, max_distance=None, method='dhash',
+                 max_series=None, max_per_series=None):
+        self.detect_fn = detect_fn
+        self.max_distance = Config.dedup_hash_distance if max_distance is None else max_distance
+        self.method = method
+        self.max_series = max_series or Config.dedup_max_series
+        self.max_per_series = max_per_series or Config.dedup_max_per_series
+        self._indexes = OrderedDict()  # 序列 -> HashIndex，最近使用的在末尾
+        self._series_bytes = {}
+        self._lock = threading.Lock()
+        self.stats = {'frames': 0, 'skipped': 0}
+        get_governor().register(f"dedup_{id(self)}", self.memory_usage, self.shrink,
+                                priority=PRIORITY_CACHE)
+
+    def close(self):
+        """注销内存管理并清空索引"""
+        get_governor().unregister(f"dedup_{id(self)}")
+        with self._lock:
+            self._indexes.clear()
+            self._series_bytes.clear()
+
+    def index(self, series):
+        with self._lock:
+            index = self._indexes.get(series)
+            if index is None:
+                index = self._indexes[series] = HashIndex()
+                self._series_bytes[series] = 0
+                while len(self._indexes) > self.max_series:
+                    self._drop_oldest_locked()
+            self._indexes.move_to_end(series)
+            return index
+
+    def _drop_oldest_locked(self):
+        series, _ = self._indexes.popitem(last=False)
+        return self._series_bytes.pop(series, 0)
+
+    def process(self, path, series=None, gray=None, detect_fn=None):
+        """返回 (结果, 复用的源路径或 None)；gray 为已解码的灰度图时不再读取文件
+
+        detect_fn 为本次使用的检测函数（默认使用构造时传入的函数）。
+        """
+        if gray is None:
+            gray = load_gray(path)
+        value = int(HASH_FUNCTIONS[self.method](gray)[0])
+        index = self.index(series)
+        with self._lock:
+            self.stats['frames'] += 1
+            match = index.nearest(value, self.max_distance)
+            if match is not None:
+                self.stats['skipped'] += 1
+                source, result, _ = index.items[match[0]]
+                return result, source
+        result = (detect_fn or self.detect_fn)(path)
+        nbytes = _result_nbytes(result)
+        with self._lock:
+            # 检测期间该序列可能已被淘汰，此时不再缓存
+            if self._indexes.get(series) is index:
+                index.add(value, (path, result, nbytes))
+                self._series_bytes[series] += nbytes
+                if len(index) > self.max_per_series:
+                    index.keep_last(self.max_per_series // 2)
+                    self._series_bytes[series] = sum(item[2] for item in index.items)
+        return result, None
+
+    def memory_usage(self):
+        """已缓存结果的估计字节数"""
+        with self._lock:
+            return sum(self._series_bytes.values())
+
+    def shrink(self, nbytes):
+        """内存管理器回调：从最久未使用的序列开始淘汰"""
+        freed = 0
+        with self._lock:
+            while self._indexes and freed < nbytes:
+                freed += self._drop_oldest_locked()
+        return freed
+
+    def skip_rate(self):
+        with self._lock:
+            frames, skipped = self.stats['frames'], self.stats['skipped']
+        return skipped / frames if frames else 0.0
+
+    def report(self):
+        # 在锁内复制统计和各序列大小，避免与 process/shrink 并发修改冲突
+        with self._lock:
+            stats = dict(self.stats)
+            sizes = [len(index) for index in self._indexes.values()]
+            nbytes = sum(self._series_bytes.values())
+        frames = stats['frames']
+        return dict(stats, skip_rate=stats['skipped'] / frames if frames else 0.0,
+                    series=len(sizes), indexed=sum(sizes), nbytes=nbytes)
@@ -0,0 +1,50 @@
+import time
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def retry_after_of(result=None, error=None):
+    """从响应或异常中读取服务端建议的重试等待时间，没有时返回 None"""
+    if isinstance(result, dict) and result.get('status') == 'busy':
+        return float(result.get('retry_after') or 0)
+    if error is not None:
+        if getattr(error, 'retry_after', None) is not None:
+            return float(error.retry_after)
+        response = getattr(error, 'response', None)
+        if response is not None and getattr(response, 'status_code', None) in (429, 503):
+            header = response.headers.get('Retry-After')
+            try:
+                return float(header) if header is not None else 0.0
+            except ValueError:
+                return 0.0
+    return None
+
+
+def call_with_backoff(fn, *args, max_retries=3, base_delay=0.5, max_delay=30.0, **kwargs):
+    """调用 fn，服务端过载（busy / 429 / 503）时按 retry-after 和指数退避重试
+
+    等待时间取 retry-after 与指数退避中的较大者，并加入随机抖动，
+    避免多个客户端同时重试。
+    """
+    for attempt in range(max_retries + 1):
+        error = None
+        result = None
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            error = e
+        retry_after = retry_after_of(result, error)
+        if retry_after is None:
+            if error is not None:
+                raise error
+            return result
+        if attempt == max_retries:
+            if error is not None:
+                raise error
+            return result
+        backoff = min(max_delay, base_delay * 2 ** attempt)
+        delay = min(max_delay, max(retry_after, backoff)) * random.uniform(1.0, 1.25)
+        logger.info(f"服务端繁忙，{delay:.2f}s 后重试 ({attempt + 1}/{max_retries})")
+        time.sleep(delay)
@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """请求去重：相同 key 的并发请求共享同一次计算结果"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'executions': 0, 'shared': 0,
+                       'saved_seconds': 0.0, 'errors': 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        """执行 fn(*args, **kwargs)；若相同 key 正在计算则等待并返回其结果"""
+        with self._lock:
+            self._stats['calls'] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        start = time.perf_counter()
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                del self._calls[key]
+                self._stats['executions'] += 1
+                self._stats['shared'] += call.waiters
+                # 每个共享结果的请求都省下了一次完整计算
+                self._stats['saved_seconds'] += elapsed * call.waiters
+                if call.error is not None:
+                    self._stats['errors'] += 1
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        """返回去重统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        stats['dedup_ratio'] = stats['shared'] / stats['calls'] if stats['calls'] else 0.0
+        return stats
+
+
+_digest_cache = OrderedDict()
+_digest_lock = threading.Lock()
+_DIGEST_CACHE_SIZE = 4096
+
+
+def image_digest(path):
+    """图片内容哈希，按 (路径, 修改时间, 大小) 缓存避免重复读取"""
+    stat = os.stat(path)
+    cache_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _digest_lock:
+        digest = _digest_cache.get(cache_key)
+        if digest is not None:
+            _digest_cache.move_to_end(cache_key)
+            return digest
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(chunk)
+    digest = hasher.hexdigest()
+    with _digest_lock:
+        _digest_cache[cache_key] = digest
+        while len(_digest_cache) > _DIGEST_CACHE_SIZE:
+            _digest_cache.popitem(last=False)
+    return digest
+
+
+def request_key(images, model, params=None):
+    """由图片内容、模型名和参数生成去重 key，images 可为单个路径或路径列表"""
+    if isinstance(images, (str, os.PathLike)):
+        images = [images]
+    payload = {
+        'images': [image_digest(path) for path in images],
+        'model': model,
+        'params': params or {},
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
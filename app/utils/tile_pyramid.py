@@ -0,0 +1,165 @@
+import os
+import json
+import math
+import shutil
+import hashlib
+import logging
+from PyQt5.QtCore import QRect, Qt
+from PyQt5.QtGui import QImage, QImageReader
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+
+class TilePyramid:
+    """磁盘上的多分辨率瓦片金字塔，level 0 为原图，每升一级边长减半"""
+
+    def __init__(self, image_path, cache_root, tile_size=256, tile_format="JPEG"):
+        self.image_path = image_path
+        self.tile_size = tile_size
+        self.tile_format = tile_format
+        self.width = 0
+        self.height = 0
+        self.levels = 0
+        stat = os.stat(image_path)
+        key = f"{os.path.abspath(image_path)}|{stat.st_mtime}|{stat.st_size}|{tile_size}"
+        self.directory = os.path.join(cache_root, hashlib.sha1(key.encode('utf-8')).hexdigest())
+        self._load_manifest()
+
+    @property
+    def ready(self):
+        """金字塔是否已完整生成"""
+        return self.levels > 0
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            self.width = manifest['width']
+            self.height = manifest['height']
+            self.levels = manifest['levels']
+        except (OSError, ValueError, KeyError):
+            self.levels = 0
+            return
+        self.touch()
+
+    def touch(self):
+        """更新清单文件的修改时间，作为缓存清理的最近使用时间"""
+        try:
+            os.utime(os.path.join(self.directory, MANIFEST_NAME))
+        except OSError:
+            pass
+
+    def level_size(self, level):
+        """返回某层的 (宽, 高)"""
+        scale = 2 ** level
+        return max(1, math.ceil(self.width / scale)), max(1, math.ceil(self.height / scale))
+
+    def tile_count(self, level):
+        """返回某层的瓦片列数和行数"""
+        w, h = self.level_size(level)
+        return math.ceil(w / self.tile_size), math.ceil(h / self.tile_size)
+
+    def tile_path(self, level, tx, ty):
+        ext = "jpg" if self.tile_format == "JPEG" else self.tile_format.lower()
+        return os.path.join(self.directory, str(level), f"{tx}_{ty}.{ext}")
+
+    def load_tile(self, level, tx, ty):
+        """从磁盘读取单个瓦片，不存在时返回 None"""
+        image = QImage(self.tile_path(level, tx, ty))
+        return None if image.isNull() else image
+
+    def generate(self, progress=None, is_cancelled=None):
+        """生成全部瓦片（应在后台线程中调用），完成后写入清单文件"""
+        # 解码内存上限由主窗口启动时按 Config.image_decode_limit_mb 统一设置
+        reader = QImageReader(self.image_path)
+        image = reader.read()
+        if image.isNull():
+            raise IOError(f"无法读取图片: {reader.errorString()}")
+
+        width, height = image.width(), image.height()
+        levels = 1
+        while max(width, height) > self.tile_size * 2 ** (levels - 1):
+            levels += 1
+        total = sum(
+            math.ceil(math.ceil(width / 2 ** l) / self.tile_size) *
+            math.ceil(math.ceil(height / 2 ** l) / self.tile_size)
+            for l in range(levels)
+        )
+        done = 0
+        for level in range(levels):
+            level_dir = os.path.join(self.directory, str(level))
+            os.makedirs(level_dir, exist_ok=True)
+            for ty in range(0, image.height(), self.tile_size):
+                for tx in range(0, image.width(), self.tile_size):
+                    if is_cancelled and is_cancelled():
+                        return False
+                    tile = image.copy(QRect(tx, ty, self.tile_size, self.tile_size)
+                                      .intersected(image.rect()))
+                    tile.save(os.path.join(
+                        level_dir,
+                        os.path.basename(self.tile_path(level, tx // self.tile_size, ty // self.tile_size))),
+                        self.tile_format, 90)
+                    done += 1
+                    if progress:
+                        progress(int(done * 100 / total))
+            if level + 1 < levels:
+                # 下一层由当前层缩小得到，释放上一层内存
+                image = image.scaled(max(1, math.ceil(image.width() / 2)),
+                                     max(1, math.ceil(image.height() / 2)),
+                                     Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+
+        manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+        with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({'width': width, 'height': height, 'levels': levels,
+                       'tile_size': self.tile_size, 'source': self.image_path}, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        self._load_manifest()
+        return True
+
+
+def _directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _last_used(path):
+    """清单文件的修改时间；未完成的金字塔取目录的修改时间"""
+    for candidate in (os.path.join(path, MANIFEST_NAME), path):
+        try:
+            return os.path.getmtime(candidate)
+        except OSError:
+            continue
+    return 0.0
+
+
+def prune_cache(cache_root, max_bytes, keep=()):
+    """按最近使用时间（LRU）清理瓦片缓存，直到总大小不超过 max_bytes，返回释放的字节数
+
+    keep 中的目录（如正在显示或生成的金字塔）不会被删除。
+    """
+    try:
+        entries = [os.path.join(cache_root, name) for name in os.listdir(cache_root)]
+    except OSError:
+        return 0
+    keep = {os.path.abspath(path) for path in keep}
+    sizes = {path: _directory_size(path) for path in entries if os.path.isdir(path)}
+    total = sum(sizes.values())
+    freed = 0
+    for path in sorted(sizes, key=_last_used):
+        if total - freed <= max_bytes:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        freed += sizes[path]
+    if freed:
+        logger.info(f"清理瓦片缓存 {freed / 1024 / 1024:.1f}MB")
+    return freed
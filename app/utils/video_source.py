@@ -0,0 +1,195 @@
+import time
+import queue
+import argparse
+import threading
+import logging
+from collections import namedtuple
+from .memory_governor import get_governor, PRIORITY_DATA
+
+logger = logging.getLogger(__name__)
+
+try:
+    import cv2
+except ImportError:  # OpenCV 为可选依赖，仅视频输入需要
+    cv2 = None
+
+Frame = namedtuple('Frame', ['index', 'timestamp', 'image'])
+
+_END = object()
+
+
+LIVE_SCHEMES = ('rtsp://', 'rtmp://', 'http://', 'https://', 'udp://', 'tcp://')
+
+
+def is_live(source):
+    """摄像头编号或网络流地址视为实时源，其余视为文件"""
+    return isinstance(source, int) or str(source).lower().startswith(LIVE_SCHEMES)
+
+
+class VideoSource:
+    """视频文件/摄像头流输入，后台线程解码到有界队列
+
+    stride 为抽帧间隔（只解码每 stride 帧中的一帧）；队列满时
+    policy='drop_oldest' 丢弃最旧的帧以保证实时性，policy='block'
+    则阻塞解码线程，使解码速度不超过检测速度。policy 为空时实时源
+    丢帧、文件源阻塞（离线处理不丢帧）。
+    """
+
+    def __init__(self, source, stride=1, queue_size=8, policy=None, rgb=True):
+        if cv2 is None:
+            raise ImportError("视频输入需要安装 opencv-python")
+        if policy is None:
+            policy = 'drop_oldest' if is_live(source) else 'block'
+        if policy not in ('drop_oldest', 'block'):
+            raise ValueError(f"不支持的队列策略: {policy}")
+        self.source = source
+        self.stride = max(1, int(stride))
+        self.policy = policy
+        self.rgb = rgb
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {'read': 0, 'decoded': 0, 'dropped': 0, 'delivered': 0}
+        self.error = None
+        self._frame_bytes = 0
+
+    def start(self):
+        if self._thread is None:
+            get_governor().register(f"video_queue_{id(self)}", self.queue_memory,
+                                    priority=PRIORITY_DATA)
+            self._thread = threading.Thread(target=self._run, name="VideoSource", daemon=True)
+            self._thread.start()
+        return self
+
+    def queue_memory(self):
+        """队列中待处理帧占用的字节数"""
+        return self._queue.qsize() * self._frame_bytes
+
+    def stop(self):
+        """停止解码并释放队列"""
+        get_governor().unregister(f"video_queue_{id(self)}")
+        self._stop.set()
+        # 解除 block 策略下可能阻塞的 put
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _put(self, item):
+        if self.policy == 'block':
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+            return
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.stats['dropped'] += 1
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        capture = cv2.VideoCapture(self.source)
+        try:
+            if not capture.isOpened():
+                raise IOError(f"无法打开视频源: {self.source}")
+            index = 0
+            while not self._stop.is_set():
+                # 非目标帧只 grab 不 retrieve，跳过颜色转换和拷贝
+                if not capture.grab():
+                    break
+                self.stats['read'] += 1
+                if index % self.stride == 0:
+                    ok, image = capture.retrieve()
+                    if not ok:
+                        break
+                    if self.rgb:
+                        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+                    self.stats['decoded'] += 1
+                    self._frame_bytes = image.nbytes
+                    timestamp = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                    self._put(Frame(index, timestamp, image))
+                index += 1
+        except Exception as e:
+            logger.error(f"视频解码失败: {str(e)}", exc_info=True)
+            self.error = e
+        finally:
+            capture.release()
+            # 结束标记必须送达，不参与丢帧
+            while True:
+                try:
+                    self._queue.put(_END, timeout=0.1)
+                    break
+                except queue.Full:
+                    if self._stop.is_set():
+                        break
+                    try:
+                        self._queue.get_nowait()
+                        self.stats['dropped'] += 1
+                    except queue.Empty:
+                        pass
+
+    def __iter__(self):
+        self.start()
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                break
+            self.stats['delivered'] += 1
+            yield item
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def measure_fps(source, process=None, **kwargs):
+    """测量视频源的持续帧率；process(frame) 可传入检测等处理函数"""
+    video = VideoSource(source, **kwargs)
+    start = time.perf_counter()
+    count = 0
+    with video:
+        for frame in video:
+            if process is not None:
+                process(frame)
+            count += 1
+    elapsed = time.perf_counter() - start
+    result = dict(video.stats)
+    result.update({'frames': count, 'seconds': elapsed,
+                   'fps': count / elapsed if elapsed > 0 else 0.0})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量视频源的持续解码帧率")
+    parser.add_argument('source', help="视频文件路径、流地址或摄像头编号")
+    parser.add_argument('--stride', type=int, default=1)
+    parser.add_argument('--queue-size', type=int, default=8)
+    parser.add_argument('--policy', choices=['drop_oldest', 'block'], default=None,
+                        help="队列满时的策略（默认实时源丢帧、文件源阻塞）")
+    args = parser.parse_args()
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    result = measure_fps(source, stride=args.stride, queue_size=args.queue_size,
+                         policy=args.policy)
+    print(f"帧数 {result['frames']}, 耗时 {result['seconds']:.2f}s, "
+          f"{result['fps']:.1f} 帧/秒, 丢弃 {result['dropped']}")
+
+
+if __name__ == "__main__":
+    main()
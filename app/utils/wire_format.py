@@ -0,0 +1,255 @@
+import json
+import time
+import zlib
+import struct
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError:  # 没有 msgpack 时只能使用 JSON
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON = 'application/json'
+MSGPACK = 'application/x-msgpack'
+
+_NDARRAY_EXT = 1
+_COMPRESS_MIN_BYTES = 1024  # 小于该大小的消息不压缩
+
+
+def _default(obj):
+    """JSON 回退：NumPy 数组和标量转为 Python 原生类型"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"无法序列化类型: {type(obj).__name__}")
+
+
+def _pack_ndarray(array):
+    """数组头（dtype、形状）+ 原始内存，不做逐元素转换"""
+    array = np.ascontiguousarray(array)
+    dtype = array.dtype.str.encode('ascii')
+    header = struct.pack(f"<B{len(dtype)}sB{array.ndim}Q", len(dtype), dtype, array.ndim, *array.shape)
+    return header + array.tobytes()
+
+
+def _unpack_ndarray(data):
+    """从扩展类型还原数组（零拷贝，返回只读视图）"""
+    view = memoryview(data)
+    dtype_len = view[0]
+    dtype = np.dtype(bytes(view[1:1 + dtype_len]).decode('ascii'))
+    offset = 1 + dtype_len
+    ndim = view[offset]
+    shape = struct.unpack_from(f"<{ndim}Q", view, offset + 1)
+    offset += 1 + 8 * ndim
+    return np.frombuffer(view[offset:], dtype=dtype).reshape(shape)
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, np.ndarray):
+        return msgpack.ExtType(_NDARRAY_EXT, _pack_ndarray(obj))
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"无法序列化类型: {type(obj).__name__}")
+
+
+def _msgpack_ext_hook(code, data):
+    if code == _NDARRAY_EXT:
+        return _unpack_ndarray(data)
+    return msgpack.ExtType(code, data)
+
+
+# ---- 压缩 ----
+def available_encodings():
+    """本机支持的压缩算法，按优先顺序排列"""
+    encodings = []
+    if lz4_frame is not None:
+        encodings.append('lz4')
+    if zstandard is not None:
+        encodings.append('zstd')
+    encodings.append('deflate')
+    return encodings
+
+
+def compress(data, encoding):
+    if encoding == 'lz4':
+        return lz4_frame.compress(data)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if encoding == 'deflate':
+        return zlib.compress(data, 1)
+    return data
+
+
+def decompress(data, encoding):
+    if encoding == 'lz4':
+        return lz4_frame.decompress(data)
+    if encoding == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    if encoding == 'deflate':
+        return zlib.decompress(data)
+    return data
+
+
+# ---- 编解码 ----
+def encode(obj, content_type=MSGPACK, encoding=None):
+    """序列化为字节；content_type 不可用时回退为 JSON，返回 (数据, 实际类型, 实际压缩)"""
+    if content_type == MSGPACK and msgpack is not None:
+        data = msgpack.packb(obj, default=_msgpack_default, use_bin_type=True)
+    else:
+        content_type = JSON
+        data = json.dumps(obj, default=_default, ensure_ascii=False).encode('utf-8')
+    if encoding and encoding != 'identity' and len(data) >= _COMPRESS_MIN_BYTES:
+        data = compress(data, encoding)
+    else:
+        encoding = None
+    return data, content_type, encoding
+
+
+def decode(data, content_type=JSON, encoding=None):
+    """反序列化；msgpack 中的数组还原为 NumPy 数组"""
+    if encoding and encoding != 'identity':
+        data = decompress(data, encoding)
+    if content_type == MSGPACK:
+        if msgpack is None:
+            raise ImportError("解码 msgpack 数据需要安装 msgpack")
+        return msgpack.unpackb(data, ext_hook=_msgpack_ext_hook, raw=False, strict_map_key=False)
+    return json.loads(data)
+
+
+# ---- 协商 ----
+def request_headers():
+    """客户端请求头：声明支持的格式和压缩算法"""
+    headers = {'Accept-Encoding': ", ".join(available_encodings())}
+    headers['Accept'] = f"{MSGPACK}, {JSON};q=0.5" if msgpack is not None else JSON
+    return headers
+
+
+def _parse_accept(value):
+    """解析 Accept 类头部，返回按 q 值降序的取值列表"""
+    items = []
+    for position, part in enumerate((value or "").split(',')):
+        fields = [f.strip() for f in part.split(';')]
+        if not fields[0]:
+            continue
+        q = 1.0
+        for field in fields[1:]:
+            if field.startswith('q='):
+                try:
+                    q = float(field[2:])
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            items.append((-q, position, fields[0].lower()))
+    return [name for _, _, name in sorted(items)]
+
+
+def negotiate(accept=None, accept_encoding=None):
+    """服务端按请求头选择 (格式, 压缩)；无法满足时使用 JSON、不压缩"""
+    content_type = JSON
+    for name in _parse_accept(accept):
+        if name == MSGPACK and msgpack is not None:
+            content_type = MSGPACK
+            break
+        if name in (JSON, '*/*'):
+            break
+    encoding = None
+    supported = available_encodings()
+    for name in _parse_accept(accept_encoding):
+        if name in supported:
+            encoding = name
+            break
+    return content_type, encoding
+
+
+def encode_response(obj, accept=None, accept_encoding=None):
+    """服务端：按协商结果编码响应，返回 (数据, 响应头)"""
+    content_type, encoding = negotiate(accept, accept_encoding)
+    data, content_type, encoding = encode(obj, content_type, encoding)
+    headers = {'Content-Type': content_type}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return data, headers
+
+
+def decode_response(data, headers):
+    """客户端：按响应头解码"""
+    content_type = (headers.get('Content-Type') or JSON).split(';')[0].strip()
+    return decode(data, content_type, headers.get('Content-Encoding'))
+
+
+# ---- 基准测试 ----
+def sample_payloads(seed=0):
+    """典型响应：检测结果、趋势序列、特征图"""
+    rng = np.random.default_rng(seed)
+    return {
+        'detection': {
+            'status': 'success',
+            'results': [{'path': f"frame_{i:05d}.jpg",
+                         'boxes': rng.random((50, 4), dtype=np.float32) * 1024,
+                         'scores': rng.random(50, dtype=np.float32),
+                         'labels': rng.integers(0, 10, 50, dtype=np.int32)}
+                        for i in range(32)],
+        },
+        'trend': {
+            'status': 'success',
+            'result': {'timestamps': np.arange(20000, dtype=np.float64) * 3600 + 1.7e9,
+                       'values': np.cumsum(rng.normal(size=20000)).astype(np.float32)},
+        },
+        'feature': {
+            'status': 'success',
+            'features': rng.normal(size=(1, 256, 64, 64)).astype(np.float32),
+        },
+    }
+
+
+def benchmark(repeat=5):
+    """比较各格式/压缩组合的消息大小和编解码耗时"""
+    formats = [(JSON, None), (JSON, 'deflate')]
+    if msgpack is not None:
+        formats += [(MSGPACK, None)] + [(MSGPACK, e) for e in available_encodings()]
+    results = []
+    for name, payload in sample_payloads().items():
+        for content_type, encoding in formats:
+            encode_time = decode_time = 0.0
+            for _ in range(repeat):
+                start = time.perf_counter()
+                data, actual_type, actual_encoding = encode(payload, content_type, encoding)
+                encode_time += time.perf_counter() - start
+                start = time.perf_counter()
+                decode(data, actual_type, actual_encoding)
+                decode_time += time.perf_counter() - start
+            results.append({
+                'payload': name,
+                'format': content_type,
+                'encoding': encoding or 'identity',
+                'bytes': len(data),
+                'encode_ms': encode_time / repeat * 1000,
+                'decode_ms': decode_time / repeat * 1000,
+            })
+    return results
+
+
+def main():
+    if msgpack is None:
+        print("未安装 msgpack，仅测试 JSON")
+    for r in benchmark():
+        print(f"{r['payload']:<10} {r['format']:<22} {r['encoding']:<8} "
+              f"{r['bytes'] / 1024:>10.1f} KB  编码 {r['encode_ms']:>8.2f} ms  解码 {r['decode_ms']:>8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import logging
+from PyQt5.QtCore import QThread, pyqtSignal
+
+# 添加父目录到系统路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(os.path.dirname(current_dir))
+if app_dir not in sys.path:
+    sys.path.append(app_dir)
+
+from App.config.config import Config
+from App.backends.detectionAPIs.batch_job import BatchJob, journal_path_for
+from App.backends.detectionAPIs.cascade import load_cascade
+
+logger = logging.getLogger(__name__)
+
+
+class BatchJobThread(QThread):
+    """后台批量检测线程，进度写入任务日志，中断后再次提交同一目录即可续跑"""
+    progress = pyqtSignal(dict)  # total/done/failed/rate/eta
+    job_finished = pyqtSignal(dict)
+    error = pyqtSignal(str)
+
+    def __init__(self, inputs, detect_fn, model_name, workers=None):
+        super().__init__()
+        self.inputs = list(inputs)
+        self.detect_fn = detect_fn
+        self.journal_path = journal_path_for(self.inputs, model_name)
+        self.workers = workers
+        self._job = None
+        self._stopped = False
+
+    def stop(self):
+        """请求停止（已提交的条目完成并保存后退出）"""
+        self._stopped = True
+        if self._job is not None:
+            self._job.stop()
+
+    def run(self):
+        try:
+            # 配置了初筛分类头时启用级联模式
+            cascade = load_cascade() if Config.cascade_head_path else None
+            self._job = BatchJob(self.journal_path, self.detect_fn, workers=self.workers,
+                                 cascade=cascade)
+            self._job.add_inputs(self.inputs)
+            if self._stopped:
+                return
+            info = self._job.run(self.progress.emit)
+            self.job_finished.emit(info)
+        except Exception as e:
+            logger.error(f"批量检测失败: {str(e)}", exc_info=True)
+            self.error.emit(str(e))
+        finally:
+            if self._job is not None:
+                self._job.close()
@@ -0,0 +1,161 @@
+import os
+import sys
+from collections import OrderedDict
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QMetaObject, pyqtSlot
+
+# 添加父目录到系统路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(os.path.dirname(current_dir))
+if app_dir not in sys.path:
+    sys.path.append(app_dir)
+
+from App.utils.memory_governor import get_governor, PRIORITY_CACHE
+
+
+class ImageListModel(QAbstractListModel):
+    """图片目录的虚拟化列表模型，行数据按页从数据库懒加载"""
+
+    IdRole = Qt.UserRole + 1
+    PathRole = Qt.UserRole + 2
+    RecordRole = Qt.UserRole + 3
+
+    FETCH_BATCH = 1000  # 每次 fetchMore 暴露给视图的行数
+    PAGE_SIZE = 256  # 每次从数据库读取的记录数
+    MAX_PAGES = 64  # 记录页缓存上限
+    RECORD_BYTES = 512  # 单条记录内存估算（用于内存管理统计）
+
+    def __init__(self, catalog, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self._ids = []  # 当前查询结果（有序id）
+        self._rows = {}  # id -> 行号
+        self._loaded = 0  # 已暴露给视图的行数
+        self._pages = OrderedDict()  # 页号 -> {id: 记录}
+        self._query = {'order_by': 'id', 'descending': False,
+                       'name_filter': None, 'series': None}
+        get_governor().register(f"image_list_{id(self)}", self.cache_memory,
+                                self.shrink_cache, PRIORITY_CACHE)
+
+    # ---- QAbstractListModel 接口 ----
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._loaded
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self._loaded < len(self._ids)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.FETCH_BATCH, len(self._ids) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._loaded:
+            return None
+        image_id = self._ids[index.row()]
+        if role == self.IdRole:
+            return image_id
+        record = self._record_at(index.row())
+        if record is None:
+            return None
+        if role == Qt.DisplayRole:
+            return record['name']
+        if role == Qt.ToolTipRole or role == self.PathRole:
+            return record['path']
+        if role == self.RecordRole:
+            return record
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """QAbstractItemModel 排序接口，按文件名排序"""
+        self.set_query(order_by='name', descending=(order == Qt.DescendingOrder))
+
+    # ---- 查询 ----
+    def set_query(self, **query):
+        """更新排序/过滤条件并重新查询（只取id，开销很小）"""
+        self._query.update(query)
+        self.beginResetModel()
+        self._ids = self.catalog.query_ids(**self._query)
+        self._rows = {image_id: row for row, image_id in enumerate(self._ids)}
+        self._loaded = min(self.FETCH_BATCH, len(self._ids))
+        self._pages.clear()
+        self.endResetModel()
+
+    def refresh(self):
+        """目录新增记录后刷新；默认排序且无过滤时增量追加，否则重新查询"""
+        q = self._query
+        if q['order_by'] != 'id' or q['descending'] or q['name_filter'] or q['series'] is not None:
+            self.set_query()
+            return
+        new_ids = self.catalog.ids_after(self._ids[-1] if self._ids else 0)
+        if not new_ids:
+            return
+        start = len(self._ids)
+        for offset, image_id in enumerate(new_ids):
+            self._rows[image_id] = start + offset
+        self._ids.extend(new_ids)
+        # 新行先作为可 fetchMore 的部分，视图滚动时再暴露
+        if self._loaded == start:
+            self.fetchMore()
+
+    def clear(self):
+        self.beginResetModel()
+        self._ids = []
+        self._rows = {}
+        self._loaded = 0
+        self._pages.clear()
+        self.endResetModel()
+
+    # ---- 内存管理 ----
+    def cache_memory(self):
+        """估算记录页缓存和 id 索引占用的字节数"""
+        return len(self._pages) * self.PAGE_SIZE * self.RECORD_BYTES + len(self._ids) * 100
+
+    def shrink_cache(self, nbytes):
+        """内存管理器回调（可能在后台线程），在 GUI 线程中清空记录页缓存"""
+        estimate = len(self._pages) * self.PAGE_SIZE * self.RECORD_BYTES
+        QMetaObject.invokeMethod(self, "_clear_pages", Qt.QueuedConnection)
+        return estimate
+
+    @pyqtSlot()
+    def _clear_pages(self):
+        self._pages.clear()
+
+    # ---- 查找 ----
+    def record(self, index):
+        """返回索引对应的记录"""
+        if not index.isValid():
+            return None
+        return self._record_at(index.row())
+
+    def index_of(self, image_id):
+        """O(1) 返回 id 对应的模型索引，必要时先加载到该行"""
+        row = self._rows.get(image_id)
+        if row is None:
+            return QModelIndex()
+        if row >= self._loaded:
+            self.beginInsertRows(QModelIndex(), self._loaded, row)
+            self._loaded = row + 1
+            self.endInsertRows()
+        return self.index(row)
+
+    def _record_at(self, row):
+        page = row // self.PAGE_SIZE
+        records = self._pages.get(page)
+        if records is None:
+            ids = self._ids[page * self.PAGE_SIZE:(page + 1) * self.PAGE_SIZE]
+            records = self.catalog.fetch(ids)
+            self._pages[page] = records
+            if len(self._pages) > self.MAX_PAGES:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page)
+        return records.get(self._ids[row])
@@ -0,0 +1,114 @@
+import os
+import sys
+import logging
+import numpy as np
+from PyQt5.QtCore import QThread, QSize, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+
+# 添加父目录到系统路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(os.path.dirname(current_dir))
+if app_dir not in sys.path:
+    sys.path.append(app_dir)
+
+from App.config.config import Config
+from App.utils.metadata_scanner import scan_metadata
+from App.utils.phash import HashIndex, HASH_FUNCTIONS
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataScanThread(QThread):
+    """后台元数据扫描线程，分批写入图片目录"""
+    batch_added = pyqtSignal(int)  # 本批新增数量
+    scan_finished = pyqtSignal(int)  # 扫描的文件总数
+    error = pyqtSignal(str)
+
+    def __init__(self, catalog, paths, batch_size=500):
+        super().__init__()
+        self.catalog = catalog
+        self.paths = list(paths)
+        self.batch_size = batch_size
+        self._stopped = False
+
+    def stop(self):
+        """请求停止扫描（当前批次完成后退出）"""
+        self._stopped = True
+
+    def run(self):
+        total = 0
+        try:
+            for batch in scan_metadata(self.paths, self.batch_size):
+                if self._stopped:
+                    break
+                self.catalog.add_records(batch)
+                total += len(batch)
+                self.batch_added.emit(len(batch))
+        except Exception as e:
+            logger.error(f"元数据扫描失败: {str(e)}", exc_info=True)
+            self.error.emit(str(e))
+        self.scan_finished.emit(total)
+
+
+def _read_gray(path, size=64):
+    """用 QImageReader 缩小解码为灰度数组（QImage 可在非 GUI 线程使用）"""
+    reader = QImageReader(path)
+    reader.setScaledSize(QSize(size, size))
+    image = reader.read()
+    if image.isNull():
+        raise IOError(f"无法读取图片: {path}")
+    image = image.convertToFormat(QImage.Format_Grayscale8)
+    ptr = image.constBits()
+    ptr.setsize(image.bytesPerLine() * image.height())
+    array = np.frombuffer(ptr, dtype=np.uint8).reshape(image.height(), image.bytesPerLine())
+    return array[:, :image.width()].copy()
+
+
+class DuplicateScanThread(QThread):
+    """后台按序列计算感知哈希并查找近重复图片"""
+    progress = pyqtSignal(int, int)  # 已处理, 总数
+    groups_found = pyqtSignal(list)  # [[路径, ...], ...]
+    error = pyqtSignal(str)
+
+    def __init__(self, catalog, max_distance=None, method='dhash', batch_size=256):
+        super().__init__()
+        self.catalog = catalog
+        self.max_distance = Config.dedup_hash_distance if max_distance is None else max_distance
+        self.method = method
+        self.batch_size = batch_size
+        self._stopped = False
+
+    def stop(self):
+        self._stopped = True
+
+    def run(self):
+        try:
+            hash_fn = HASH_FUNCTIONS[self.method]
+            series_paths = [self.catalog.paths(order_by='time', series=name)
+                            for name in self.catalog.series_names()]
+            total = sum(len(paths) for paths in series_paths)
+            done = 0
+            groups = []
+            for paths in series_paths:
+                index = HashIndex()
+                for start in range(0, len(paths), self.batch_size):
+                    if self._stopped:
+                        return
+                    grays, valid = [], []
+                    for path in paths[start:start + self.batch_size]:
+                        try:
+                            grays.append(_read_gray(path))
+                            valid.append(path)
+                        except IOError as e:
+                            logger.warning(str(e))
+                    if grays:
+                        for path, value in zip(valid, hash_fn(np.stack(grays))):
+                            index.add(value, path)
+                    done += min(self.batch_size, len(paths) - start)
+                    self.progress.emit(done, total)
+                groups.extend([[index.items[i] for i in members]
+                               for members in index.duplicate_groups(self.max_distance)])
+            self.groups_found.emit(groups)
+        except Exception as e:
+            logger.error(f"查找重复失败: {str(e)}", exc_info=True)
+            self.error.emit(str(e))
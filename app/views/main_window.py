@@ -6,7 +6,7 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QHBoxLayout,
                             QVBoxLayout, QPushButton, QStackedWidget, QProgressBar,
                             QLabel, QSplashScreen, QMessageBox)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
-from PyQt5.QtGui import QPalette, QColor, QPixmap
+from PyQt5.QtGui import QPalette, QColor, QPixmap, QImageReader
 
 # 添加父目录到系统路径
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -19,6 +19,8 @@ from App.views.tabs.tab2 import Tab2Widget
 from App.views.tabs.tab3 import Tab3Widget
 from App.views.tabs.tab4 import Tab4Widget
 from App.utils.api_client import APIClient
+from App.utils.memory_governor import get_governor
+from App.config.config import Config
 
 logger = logging.getLogger(__name__)
 
@@ -91,6 +93,10 @@ class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.api_client = APIClient(max_retries=3)  # 设置API客户端重试次数
+        get_governor().start()  # 启动内存预算管理
+        if hasattr(QImageReader, 'setAllocationLimit'):
+            # 进程级设置，只在启动时设置一次，允许生成大图瓦片但仍保留上限
+            QImageReader.setAllocationLimit(Config.image_decode_limit_mb)
         self.initUI()
         
     def initUI(self):
@@ -0,0 +1,31 @@
+import os
+import sys
+import logging
+from PyQt5.QtCore import QThread, pyqtSignal
+
+# 添加父目录到系统路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(os.path.dirname(current_dir))
+if app_dir not in sys.path:
+    sys.path.append(app_dir)
+
+logger = logging.getLogger(__name__)
+
+
+class ModelLoadThread(QThread):
+    """后台加载并预热新权重，完成后由 HotSwapModel 原子切换"""
+    loaded = pyqtSignal(dict)  # 新版本信息
+    error = pyqtSignal(str)
+
+    def __init__(self, model_slot, source):
+        super().__init__()
+        self.model_slot = model_slot
+        self.source = source
+
+    def run(self):
+        try:
+            version = self.model_slot.load(self.source)
+            self.loaded.emit(version.info())
+        except Exception as e:
+            logger.error(f"加载权重失败: {str(e)}", exc_info=True)
+            self.error.emit(str(e))
@@ -1,7 +1,7 @@
 import sys
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, 
                             QPushButton, QLabel, QFrame, QCheckBox, QGroupBox, 
-                            QFileDialog, QSizePolicy, QMessageBox, QListWidget,
+                            QFileDialog, QSizePolicy, QMessageBox, QListView,
                             QSplitter, QComboBox)
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QPixmap, QImage
@@ -15,6 +15,13 @@ if app_dir not in sys.path:
     sys.path.append(app_dir)
 
 from App.models.model_manager import ModelManager
+from App.config.config import Config
+from App.config.autotune import apply_thread_settings
+from App.utils.image_catalog import ImageCatalog
+from App.views.image_list_model import ImageListModel
+from App.views.tiled_image_viewer import TiledImageViewer
+from App.views.model_load_thread import ModelLoadThread
+from App.backends.detectionAPIs.model_registry import HotSwapModel, attribute_nbytes
 
 class Tab1Widget(QWidget):
     # 添加信号
@@ -24,8 +31,12 @@ class Tab1Widget(QWidget):
     def __init__(self):
         super().__init__()
         self.current_image_path = None
-        self.image_list = []  # 存储所有导入的图片路径
-        self.model_manager = None  # 稍后初始化
+        self.catalog = ImageCatalog(Config.catalog_path, owner='tab1')  # 存储所有导入的图片
+        self.image_model = ImageListModel(self.catalog)
+        self.model_slot = None  # 稍后初始化，支持后台热替换权重
+        self.image_ready = False
+        self.load_thread = None
+        self._load_threads = []  # 运行中的加载线程（包括已被替换的模型槽的），退出前保留引用
         self.initUI()
         
     def initUI(self):
@@ -57,9 +68,11 @@ class Tab1Widget(QWidget):
         left_layout.addLayout(button_layout)
         
         # 图片列表
-        self.image_list_widget = QListWidget()
+        self.image_list_widget = QListView()
+        self.image_list_widget.setModel(self.image_model)
+        self.image_list_widget.setUniformItemSizes(True)
         self.image_list_widget.setMinimumWidth(200)
-        self.image_list_widget.itemClicked.connect(self.show_selected_image)
+        self.image_list_widget.clicked.connect(self.show_selected_image)
         left_layout.addWidget(self.image_list_widget)
         
         # 中间部分 - 图像显示区域
@@ -72,11 +85,11 @@ class Tab1Widget(QWidget):
         self.image_frame.setMinimumSize(500, 500)
         self.image_frame.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         
-        # 图像显示标签
+        # 图像显示区域（支持滚轮缩放、拖动平移）
         image_layout = QVBoxLayout(self.image_frame)
-        self.image_label = QLabel("请导入图像")
-        self.image_label.setAlignment(Qt.AlignCenter)
-        image_layout.addWidget(self.image_label)
+        self.image_viewer = TiledImageViewer()
+        self.image_viewer.setText("请导入图像")
+        image_layout.addWidget(self.image_viewer)
         
         middle_layout.addWidget(self.image_frame)
         
@@ -105,6 +118,12 @@ class Tab1Widget(QWidget):
         self.load_weights_btn.clicked.connect(self.load_custom_weights)
         model_layout.addWidget(self.load_weights_btn)
         
+        # 回滚到上一版本权重
+        self.rollback_btn = QPushButton("回滚权重")
+        self.rollback_btn.setEnabled(False)
+        self.rollback_btn.clicked.connect(self.rollback_weights)
+        model_layout.addWidget(self.rollback_btn)
+        
         # 分析按钮
         self.analyze_btn = QPushButton("分析图像")
         self.analyze_btn.setMinimumHeight(40)
@@ -146,10 +165,8 @@ class Tab1Widget(QWidget):
         )
         
         if files:
-            self.image_list.extend(files)
-            self.image_list_widget.clear()
-            for file_path in self.image_list:
-                self.image_list_widget.addItem(os.path.basename(file_path))
+            self.catalog.add_images(files)
+            self.image_model.refresh()
             
             # 显示第一张图片
             if not self.current_image_path:
@@ -157,45 +174,69 @@ class Tab1Widget(QWidget):
                 self.show_image(files[0])
     
     def clear_list(self):
-        self.image_list.clear()
-        self.image_list_widget.clear()
+        self.catalog.clear()
+        self.image_model.clear()
         self.current_image_path = None
-        self.image_label.setText("请导入图像")
-        self.image_label.setPixmap(QPixmap())  # 清除图片
+        self.image_viewer.clear()  # 清除图片
+        self.image_viewer.setText("请导入图像")
+        self.image_ready = False
         self.analyze_btn.setEnabled(False)
     
-    def show_selected_image(self, item):
+    def show_selected_image(self, index):
         """当在列表中选择图片时显示"""
-        for image_path in self.image_list:
-            if os.path.basename(image_path) == item.text():
-                self.current_image_path = image_path
-                self.show_image(image_path)
-                break
+        image_path = index.data(ImageListModel.PathRole)
+        if image_path:
+            self.current_image_path = image_path
+            self.show_image(image_path)
     
     def show_image(self, file_path):
         """显示指定路径的图片"""
-        pixmap = QPixmap(file_path)
-        if not pixmap.isNull():
-            # 调整图像大小以适应框架，保持纵横比
-            scaled_pixmap = pixmap.scaled(
-                self.image_frame.width() - 20, 
-                self.image_frame.height() - 20,
-                Qt.KeepAspectRatio, 
-                Qt.SmoothTransformation
-            )
-            self.image_label.setPixmap(scaled_pixmap)
-            self.image_label.setText("")  # 清除默认文本
-            self.analyze_btn.setEnabled(True)  # 启用分析按钮
-        else:
-            self.image_label.setText("图像加载失败")
-            self.analyze_btn.setEnabled(False)
+        # 查看器按需解码可见瓦片，大图首次打开时在后台生成瓦片
+        self.image_ready = self.image_viewer.set_image(file_path)
+        self.update_analyze_button()
+    
+    def update_analyze_button(self):
+        """图片已显示且模型槽已有可用版本时才允许分析"""
+        self.analyze_btn.setEnabled(
+            self.image_ready and self.model_slot is not None
+            and self.model_slot.version is not None)
     
     def on_model_changed(self, model_name):
         """当选择的模型改变时调用"""
-        self.model_manager = ModelManager(
-            model_name=model_name,
-            pretrained=self.pretrained_cb.isChecked()
-        )
+        # 应用本机针对该模型的自动调优结果（如有）
+        Config.load_profile(model_name)
+        apply_thread_settings()
+        pretrained = self.pretrained_cb.isChecked()
+        
+        def build(weights_path):
+            # 每个版本使用独立的 ModelManager，切换前不影响正在使用的版本
+            manager = ModelManager(model_name=model_name, pretrained=pretrained)
+            if weights_path:
+                manager.load_weights(weights_path)
+            return manager
+        
+        # 丢弃旧模型槽：注销内存管理，其未完成的后台加载结果将被忽略
+        if self.model_slot is not None:
+            self.model_slot.close()
+        # ModelManager 的网络保存在自身属性中，按属性统计显存/内存占用
+        self.model_slot = HotSwapModel(model_name, build, nbytes=attribute_nbytes)
+        self.rollback_btn.setEnabled(False)
+        self.update_analyze_button()  # 初始权重加载完成前不可分析
+        # 初始权重同样在后台加载，不阻塞界面
+        self.start_model_load(None, "正在加载模型...")
+    
+    def start_model_load(self, source, text):
+        """在后台线程中为当前模型槽加载 source 对应的权重（None 为初始权重）"""
+        slot = self.model_slot
+        thread = ModelLoadThread(slot, source)
+        thread.loaded.connect(lambda info: self.on_weights_loaded(slot, source, info))
+        thread.error.connect(lambda message: self.on_weights_load_error(slot, message))
+        thread.finished.connect(lambda: self.on_weights_load_finished(thread))
+        self.load_thread = thread
+        self._load_threads.append(thread)
+        self.load_weights_btn.setEnabled(False)
+        self.load_weights_btn.setText(text)
+        thread.start()
     
     def load_custom_weights(self):
         """加载自定义权重文件"""
@@ -209,11 +250,39 @@ class Tab1Widget(QWidget):
         )
         
         if file_path:
-            try:
-                self.model_manager.load_weights(file_path)
-                QMessageBox.information(self, "成功", "权重加载成功！")
-            except Exception as e:
-                QMessageBox.warning(self, "错误", f"加载权重文件时出错：{str(e)}")
+            # 在后台加载并预热，完成后原子切换，期间仍可使用当前权重分析
+            self.start_model_load(file_path, "正在加载权重...")
+    
+    def on_weights_loaded(self, slot, source, info):
+        if slot is not self.model_slot:
+            return  # 加载期间已切换模型，结果属于被丢弃的模型槽
+        self.rollback_btn.setEnabled(slot.can_rollback())
+        self.update_analyze_button()
+        if source:
+            QMessageBox.information(
+                self, "成功",
+                f"权重加载成功！当前版本 {info['version']}（加载 {info['load_seconds']:.1f}s）")
+    
+    def on_weights_load_error(self, slot, message):
+        if slot is not self.model_slot:
+            return
+        QMessageBox.warning(self, "错误", f"加载权重文件时出错：{message}")
+    
+    def on_weights_load_finished(self, thread):
+        self._load_threads.remove(thread)
+        if thread is self.load_thread:
+            self.load_thread = None
+            self.load_weights_btn.setEnabled(True)
+            self.load_weights_btn.setText("加载自定义权重")
+    
+    def rollback_weights(self):
+        """回滚到上一个版本的权重"""
+        try:
+            version = self.model_slot.rollback()
+            self.rollback_btn.setEnabled(self.model_slot.can_rollback())
+            QMessageBox.information(self, "成功", f"已回滚到版本 {version}")
+        except RuntimeError as e:
+            QMessageBox.warning(self, "错误", str(e))
     
     def analyze_image(self):
         if not self.current_image_path:
@@ -224,7 +293,9 @@ class Tab1Widget(QWidget):
             self.analysis_started.emit(self.current_image_path)
             
             # 处理图像获取特征图和预测结果
-            results = self.model_manager.process_image(self.current_image_path)
+            # 持有当前版本直到处理结束，期间切换权重不影响本次分析
+            with self.model_slot.use() as model_manager:
+                results = model_manager.process_image(self.current_image_path)
             
             # 发送完成信号和特征图数据
             self.analysis_completed.emit(results['features'])
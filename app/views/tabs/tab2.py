@@ -2,17 +2,31 @@ import sys
 import psutil
 import os
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, 
-                           QPushButton, QLabel, QFrame, QGridLayout, QSizePolicy)
+                           QPushButton, QLabel, QFrame, QGridLayout, QSizePolicy,
+                           QGroupBox, QFileDialog, QMessageBox)
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QPixmap, QImage, QPainter, QColor, QBrush
 import numpy as np
 
+# 添加父目录到系统路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+if app_dir not in sys.path:
+    sys.path.append(app_dir)
+
+from App.utils.memory_governor import get_governor
+from App.config.config import Config
+from App.backends.systemAPIs.profiler import SamplingProfiler
+
 class Tab2Widget(QWidget):
     def __init__(self):
         super().__init__()
         self.monitoring = False
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_monitoring)
+        self.profiler = SamplingProfiler()
+        self.profile_timer = QTimer()
+        self.profile_timer.timeout.connect(self.update_profiling)
         self.initUI()
         
     def initUI(self):
@@ -44,10 +58,19 @@ class Tab2Widget(QWidget):
         self.gpu_label = QLabel("GPU占用: --")
         self.gpu_label.setStyleSheet("font-size: 14px; font-weight: bold;")
         
+        # 内存占用（进程 RSS / 预算，以及各缓存占用）
+        self.memory_label = QLabel("内存占用: --")
+        self.memory_label.setStyleSheet("font-size: 14px; font-weight: bold;")
+        self.memory_detail_label = QLabel()
+        self.memory_detail_label.setStyleSheet("font-size: 12px; color: #666;")
+        self.memory_detail_label.setWordWrap(True)
+        
         # 添加信息标签到布局
         info_layout.addWidget(self.pid_label)
         info_layout.addWidget(self.cpu_label)
         info_layout.addWidget(self.gpu_label)
+        info_layout.addWidget(self.memory_label)
+        info_layout.addWidget(self.memory_detail_label)
         
         # 控制按钮
         control_layout = QHBoxLayout()
@@ -65,9 +88,25 @@ class Tab2Widget(QWidget):
         control_layout.addWidget(self.start_btn)
         control_layout.addWidget(self.stop_btn)
         
+        # 性能采样（采集本进程所有线程的调用栈）
+        profile_group = QGroupBox("性能采样")
+        profile_layout = QVBoxLayout(profile_group)
+        profile_btn_layout = QHBoxLayout()
+        self.profile_start_btn = QPushButton("开始采样")
+        self.profile_stop_btn = QPushButton("停止并保存")
+        self.profile_stop_btn.setEnabled(False)
+        self.profile_start_btn.clicked.connect(self.start_profiling)
+        self.profile_stop_btn.clicked.connect(self.stop_profiling)
+        profile_btn_layout.addWidget(self.profile_start_btn)
+        profile_btn_layout.addWidget(self.profile_stop_btn)
+        self.profile_label = QLabel("采样: 未开始")
+        profile_layout.addLayout(profile_btn_layout)
+        profile_layout.addWidget(self.profile_label)
+        
         # 将信息框和控制按钮添加到左侧面板
         left_layout.addWidget(info_frame)
         left_layout.addLayout(control_layout)
+        left_layout.addWidget(profile_group)
         left_layout.addStretch()
         
         # 设置左侧面板的固定宽度
@@ -126,6 +165,8 @@ class Tab2Widget(QWidget):
         self.pid_label.setText("PID号: --")
         self.cpu_label.setText("CPU占用: --")
         self.gpu_label.setText("GPU占用: --")
+        self.memory_label.setText("内存占用: --")
+        self.memory_detail_label.clear()
     
     def update_monitoring(self):
         if not self.monitoring:
@@ -141,6 +182,46 @@ class Tab2Widget(QWidget):
         else:
             gpu_percent = 0
         self.gpu_label.setText(f"GPU占用: {gpu_percent}%")
+        
+        # 更新内存占用
+        usage = get_governor().usage()
+        self.memory_label.setText(
+            f"内存占用: {usage['rss'] / 2**20:.0f}MB / {usage['budget'] / 2**20:.0f}MB"
+        )
+        details = sorted(usage['consumers'].items(), key=lambda item: -item[1])
+        self.memory_detail_label.setText("\n".join(
+            f"{name}: {size / 2**20:.1f}MB" for name, size in details if size > 0
+        ))
+    
+    def start_profiling(self):
+        """开始采样，超过最长时间自动停止"""
+        self.profiler.start(duration=Config.profile_max_duration)
+        self.profile_start_btn.setEnabled(False)
+        self.profile_stop_btn.setEnabled(True)
+        self.profile_timer.start(500)
+        
+    def update_profiling(self):
+        self.profile_label.setText(f"采样: {self.profiler.samples} 次")
+        if not self.profiler.running:
+            self.profile_timer.stop()
+            self.profile_label.setText(f"采样: 已结束（{self.profiler.samples} 次）")
+        
+    def stop_profiling(self):
+        """停止采样并保存折叠栈（可用 flamegraph.pl / speedscope 查看）"""
+        self.profiler.stop()
+        self.profile_timer.stop()
+        self.profile_start_btn.setEnabled(True)
+        self.profile_stop_btn.setEnabled(False)
+        self.profile_label.setText(f"采样: 已结束（{self.profiler.samples} 次）")
+        
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "保存采样结果", "profile.collapsed", "折叠栈 (*.collapsed *.txt);;所有文件 (*)"
+        )
+        if file_path:
+            try:
+                self.profiler.write_collapsed(file_path)
+            except OSError as e:
+                QMessageBox.warning(self, "错误", f"保存采样结果失败：{str(e)}")
     
     def update_feature_maps(self, features):
         """更新特征图显示"""
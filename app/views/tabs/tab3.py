@@ -1,15 +1,23 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, 
-                           QLabel, QPushButton, QListWidget, QFileDialog,
-                           QSplitter, QFrame)
+                           QLabel, QPushButton, QListView, QFileDialog,
+                           QSplitter, QFrame, QDialog, QTreeWidget,
+                           QTreeWidgetItem, QMessageBox)
 from PyQt5.QtCore import Qt, QDateTime, QSize
-from PyQt5.QtGui import QIcon, QPixmap
+from PyQt5.QtGui import QIcon, QPixmap, QImageReader
 import os
 from datetime import datetime
+from ...config.config import Config
+from ...utils.image_catalog import ImageCatalog
+from ..image_list_model import ImageListModel
+from ..image_scan_thread import MetadataScanThread, DuplicateScanThread
 
 class Tab3Widget(QWidget):
     def __init__(self):
         super().__init__()
-        self.image_list = []
+        self.catalog = ImageCatalog(Config.catalog_path, owner='tab3')
+        self.image_model = ImageListModel(self.catalog)
+        self.scan_threads = []
+        self.duplicate_thread = None
         self.initUI()
         
     def initUI(self):
@@ -32,6 +40,12 @@ class Tab3Widget(QWidget):
         self.add_btn.clicked.connect(self.add_images)
         toolbar.addWidget(self.add_btn)
         
+        # 添加文件夹按钮
+        self.add_dir_btn = QPushButton('添加文件夹')
+        self.add_dir_btn.setMinimumHeight(40)
+        self.add_dir_btn.clicked.connect(self.add_directory)
+        toolbar.addWidget(self.add_dir_btn)
+        
         # 清空列表按钮
         self.clear_btn = QPushButton('清空列表')
         self.clear_btn.setMinimumHeight(40)
@@ -44,14 +58,27 @@ class Tab3Widget(QWidget):
         self.sort_btn.clicked.connect(self.sort_by_time)
         toolbar.addWidget(self.sort_btn)
         
+        # 查找重复按钮（感知哈希）
+        self.dup_btn = QPushButton('查找重复')
+        self.dup_btn.setMinimumHeight(40)
+        self.dup_btn.clicked.connect(self.find_duplicates)
+        toolbar.addWidget(self.dup_btn)
+        
         left_layout.addLayout(toolbar)
         
         # 创建图片列表
-        self.image_list_widget = QListWidget()
+        self.image_list_widget = QListView()
+        self.image_list_widget.setModel(self.image_model)
+        self.image_list_widget.setUniformItemSizes(True)
         self.image_list_widget.setMinimumWidth(300)
-        self.image_list_widget.itemClicked.connect(self.show_image_details)
+        self.image_list_widget.clicked.connect(self.show_image_details)
         left_layout.addWidget(self.image_list_widget)
         
+        # 扫描状态
+        self.scan_label = QLabel()
+        self.scan_label.setStyleSheet("font-size: 12px; color: #666;")
+        left_layout.addWidget(self.scan_label)
+        
         # 右侧图片预览面板
         right_panel = QFrame()
         right_panel.setFrameShape(QFrame.Box)
@@ -94,50 +121,130 @@ class Tab3Widget(QWidget):
             "图片文件 (*.png *.jpg *.jpeg *.bmp *.gif)"
         )
         
-        for file_path in files:
-            file_info = {
-                'path': file_path,
-                'name': os.path.basename(file_path),
-                'time': os.path.getmtime(file_path),
-                'size': os.path.getsize(file_path)
-            }
-            self.image_list.append(file_info)
-            self.image_list_widget.addItem(file_info['name'])
+        if files:
+            self.start_scan(files)
             
+    def add_directory(self):
+        directory = QFileDialog.getExistingDirectory(self, "选择文件夹")
+        if directory:
+            self.start_scan([directory])
+            
+    def start_scan(self, paths):
+        """在后台线程扫描元数据，分批刷新列表"""
+        thread = MetadataScanThread(self.catalog, paths)
+        thread.batch_added.connect(self.on_scan_batch)
+        thread.scan_finished.connect(lambda total, t=thread: self.on_scan_finished(t, total))
+        self.scan_threads.append(thread)
+        self.scan_label.setText("正在扫描...")
+        thread.start()
+        
+    def on_scan_batch(self, count):
+        self.image_model.refresh()
+        self.scan_label.setText(f"正在扫描... 已导入 {self.catalog.count()} 张")
+        
+    def on_scan_finished(self, thread, total):
+        if thread in self.scan_threads:
+            self.scan_threads.remove(thread)
+        if not self.scan_threads:
+            self.scan_label.setText(f"扫描完成，共 {self.catalog.count()} 张")
+            
+    def find_duplicates(self):
+        """在后台按序列计算感知哈希，查找近重复图片"""
+        if self.duplicate_thread is not None and self.duplicate_thread.isRunning():
+            return
+        if not self.catalog.count():
+            QMessageBox.information(self, "提示", "请先添加图片")
+            return
+        self.duplicate_thread = DuplicateScanThread(self.catalog)
+        self.duplicate_thread.progress.connect(
+            lambda done, total: self.scan_label.setText(f"正在查找重复... {done}/{total}"))
+        self.duplicate_thread.groups_found.connect(self.show_duplicates)
+        self.duplicate_thread.error.connect(
+            lambda message: QMessageBox.warning(self, "错误", f"查找重复失败：{message}"))
+        self.duplicate_thread.finished.connect(lambda: self.dup_btn.setEnabled(True))
+        self.dup_btn.setEnabled(False)
+        self.duplicate_thread.start()
+        
+    def show_duplicates(self, groups):
+        """以分组列表显示近重复图片，点击可预览"""
+        count = sum(len(group) for group in groups)
+        self.scan_label.setText(f"找到 {len(groups)} 组近重复图片，共 {count} 张")
+        dialog = QDialog(self)
+        dialog.setWindowTitle("近重复图片")
+        dialog.resize(600, 500)
+        layout = QVBoxLayout(dialog)
+        tree = QTreeWidget()
+        tree.setHeaderLabels(["图片"])
+        for i, group in enumerate(groups):
+            parent = QTreeWidgetItem([f"第 {i + 1} 组（{len(group)} 张）"])
+            for path in group:
+                child = QTreeWidgetItem([os.path.basename(path)])
+                child.setToolTip(0, path)
+                child.setData(0, Qt.UserRole, path)
+                parent.addChild(child)
+            tree.addTopLevelItem(parent)
+        tree.itemClicked.connect(self.on_duplicate_clicked)
+        layout.addWidget(tree)
+        dialog.show()
+        
+    def on_duplicate_clicked(self, item, column):
+        path = item.data(0, Qt.UserRole)
+        if path:
+            image = self.catalog.find_by_path(path)
+            if image is not None:
+                self.show_record(image)
+        
     def clear_list(self):
-        self.image_list.clear()
-        self.image_list_widget.clear()
+        if self.duplicate_thread is not None:
+            self.duplicate_thread.stop()
+            self.duplicate_thread.wait()
+        for thread in self.scan_threads:
+            thread.stop()
+            thread.wait()
+        self.scan_threads.clear()
+        self.scan_label.clear()
+        self.catalog.clear()
+        self.image_model.clear()
         self.detail_label.clear()
         self.info_label.clear()
         
     def sort_by_time(self):
-        self.image_list.sort(key=lambda x: x['time'])
-        self.image_list_widget.clear()
-        for image in self.image_list:
-            self.image_list_widget.addItem(image['name'])
+        # 排序在数据库中完成，模型只重新读取有序id
+        self.image_model.set_query(order_by='time')
             
-    def show_image_details(self, item):
-        for image in self.image_list:
-            if image['name'] == item.text():
-                # 显示图片
-                pixmap = QPixmap(image['path'])
-                scaled_pixmap = pixmap.scaled(
-                    self.detail_label.width() - 20,
-                    self.detail_label.height() - 20,
-                    Qt.KeepAspectRatio,
-                    Qt.SmoothTransformation
-                )
-                self.detail_label.setPixmap(scaled_pixmap)
-                
-                # 显示图片信息
-                time_str = datetime.fromtimestamp(image['time']).strftime('%Y-%m-%d %H:%M:%S')
-                size_mb = image['size'] / (1024 * 1024)
-                info_text = f"文件名: {image['name']}\n"
-                info_text += f"创建时间: {time_str}\n"
-                info_text += f"文件大小: {size_mb:.2f} MB\n"
-                info_text += f"分辨率: {pixmap.width()} x {pixmap.height()}"
-                self.info_label.setText(info_text)
-                break
+    def show_image_details(self, index):
+        image = index.data(ImageListModel.RecordRole)
+        if image is None:
+            return
+        self.show_record(image)
+        
+    def show_record(self, image):
+        # 显示图片（按预览尺寸解码，JPEG 可直接缩放解码）
+        reader = QImageReader(image['path'])
+        full_size = reader.size()
+        if full_size.isValid():
+            reader.setScaledSize(full_size.scaled(
+                self.detail_label.width() - 20,
+                self.detail_label.height() - 20,
+                Qt.KeepAspectRatio
+            ))
+        self.detail_label.setPixmap(QPixmap.fromImage(reader.read()))
+        
+        # 显示图片信息（分辨率和拍摄时间来自扫描得到的文件头元数据）
+        width, height = image.get('width'), image.get('height')
+        if width is None and full_size.isValid():
+            width, height = full_size.width(), full_size.height()
+        if image.get('capture_time') is not None:
+            time_title, timestamp = "拍摄时间", image['capture_time']
+        else:
+            time_title, timestamp = "修改时间", image['mtime'] or 0
+        time_str = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+        size_mb = (image['size'] or 0) / (1024 * 1024)
+        info_text = f"文件名: {image['name']}\n"
+        info_text += f"{time_title}: {time_str}\n"
+        info_text += f"文件大小: {size_mb:.2f} MB\n"
+        info_text += f"分辨率: {width} x {height}"
+        self.info_label.setText(info_text)
 
 if __name__ == "__main__":
     import sys
@@ -1,5 +1,5 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, 
-                           QLabel, QPushButton, QListWidget, QFileDialog,
+                           QLabel, QPushButton, QListView, QFileDialog,
                            QSplitter, QFrame, QComboBox, QProgressBar,
                            QMessageBox, QGroupBox)
 from PyQt5.QtCore import Qt, QTimer
@@ -7,6 +7,12 @@ from PyQt5.QtGui import QPixmap
 import os
 from datetime import datetime
 from ...utils.api_client import APIClient
+from ...utils.image_catalog import ImageCatalog
+from ...utils.mask_codec import area as mask_area, merge as merge_masks
+from ...config.config import Config
+from ..image_list_model import ImageListModel
+from ..tiled_image_viewer import TiledImageViewer
+from ..batch_job_thread import BatchJobThread
 import time
 
 class Tab4Widget(QWidget):
@@ -15,8 +21,11 @@ class Tab4Widget(QWidget):
         self.api_client = APIClient()
         self.current_image = None
         self.image_series = []
+        self.catalog = ImageCatalog(Config.catalog_path, owner='tab4')
+        self.image_model = ImageListModel(self.catalog)
         self.last_alert_check = 0  # 上次检查报警的时间
         self.alert_check_interval = 5  # 报警检查间隔（秒）
+        self.batch_thread = None
         self.initUI()
         
     def initUI(self):
@@ -40,8 +49,10 @@ class Tab4Widget(QWidget):
         import_layout.addWidget(self.import_btn)
         
         # 图片列表
-        self.image_list = QListWidget()
-        self.image_list.itemClicked.connect(self.show_image)
+        self.image_list = QListView()
+        self.image_list.setModel(self.image_model)
+        self.image_list.setUniformItemSizes(True)
+        self.image_list.clicked.connect(self.show_image)
         import_layout.addWidget(self.image_list)
         
         left_layout.addWidget(import_group)
@@ -65,17 +76,26 @@ class Tab4Widget(QWidget):
         self.trend_btn.clicked.connect(self.run_trend_prediction)
         model_layout.addWidget(self.trend_btn)
         
+        # 批量检测（可中断续跑）
+        self.batch_btn = QPushButton('批量检测目录')
+        self.batch_btn.clicked.connect(self.run_batch_detection)
+        model_layout.addWidget(self.batch_btn)
+        
+        self.batch_stop_btn = QPushButton('停止批量检测')
+        self.batch_stop_btn.setEnabled(False)
+        self.batch_stop_btn.clicked.connect(self.stop_batch_detection)
+        model_layout.addWidget(self.batch_stop_btn)
+        
         left_layout.addWidget(model_group)
         
         # 中间面板 - 图片显示
         middle_panel = QWidget()
         middle_layout = QVBoxLayout(middle_panel)
         
-        # 图片显示区域
-        self.image_label = QLabel()
-        self.image_label.setAlignment(Qt.AlignCenter)
-        self.image_label.setMinimumSize(500, 400)
-        middle_layout.addWidget(self.image_label)
+        # 图片显示区域（支持滚轮缩放、拖动平移）
+        self.image_viewer = TiledImageViewer()
+        self.image_viewer.setMinimumSize(500, 400)
+        middle_layout.addWidget(self.image_viewer)
         
         # 进度条
         self.progress_bar = QProgressBar()
@@ -143,25 +163,18 @@ class Tab4Widget(QWidget):
         )
         
         if files:
-            self.image_list.clear()
-            self.image_series = files
-            for file_path in files:
-                self.image_list.addItem(os.path.basename(file_path))
+            self.catalog.clear()
+            self.catalog.add_images(files)
+            self.image_series = self.catalog.paths()
+            self.image_model.set_query()
     
-    def show_image(self, item):
+    def show_image(self, index):
         """显示选中的图片"""
-        for image_path in self.image_series:
-            if os.path.basename(image_path) == item.text():
-                self.current_image = image_path
-                pixmap = QPixmap(image_path)
-                scaled_pixmap = pixmap.scaled(
-                    self.image_label.width() - 20,
-                    self.image_label.height() - 20,
-                    Qt.KeepAspectRatio,
-                    Qt.SmoothTransformation
-                )
-                self.image_label.setPixmap(scaled_pixmap)
-                break
+        image_path = index.data(ImageListModel.PathRole)
+        if not image_path:
+            return
+        self.current_image = image_path
+        self.image_viewer.set_image(image_path)
     
     def run_detection(self):
         """执行残余物检测"""
@@ -180,6 +193,12 @@ class Tab4Widget(QWidget):
                 results = response['results']
                 result_text = f"检测结果：{'有' if results['detected'] else '无'}残余物\n"
                 result_text += f"置信度：{results['confidence']:.2%}"
+                masks = results.get('masks')
+                if masks:
+                    # 掩码以 RLE 返回，面积直接在编码上计算
+                    h, w = masks[0]['size']
+                    covered = mask_area(merge_masks(masks))
+                    result_text += f"\n残余物面积：{covered} 像素 ({covered / (h * w):.2%})"
                 self.result_label.setText(result_text)
             else:
                 raise Exception(response['message'])
@@ -187,6 +206,60 @@ class Tab4Widget(QWidget):
         except Exception as e:
             QMessageBox.warning(self, "错误", f"检测失败：{str(e)}")
     
+    def run_batch_detection(self):
+        """对整个目录执行批量检测，进度保存在任务日志中，中断后可续跑"""
+        if self.batch_thread is not None and self.batch_thread.isRunning():
+            return
+        folder = QFileDialog.getExistingDirectory(self, "选择图片目录")
+        if not folder:
+            return
+        model_name = self.model_combo.currentText()
+        
+        def detect(path):
+            response = self.api_client.inference(path, model_name)
+            if response['status'] != 'success':
+                raise Exception(response.get('message', '检测失败'))
+            return response['results']
+        
+        self.batch_thread = BatchJobThread([folder], detect, model_name)
+        self.batch_thread.progress.connect(self.on_batch_progress)
+        self.batch_thread.job_finished.connect(self.on_batch_finished)
+        self.batch_thread.error.connect(
+            lambda message: QMessageBox.warning(self, "错误", f"批量检测失败：{message}"))
+        self.batch_thread.finished.connect(self.on_batch_stopped)
+        self.batch_btn.setEnabled(False)
+        self.batch_stop_btn.setEnabled(True)
+        self.result_label.setText("批量检测准备中...")
+        self.batch_thread.start()
+    
+    def stop_batch_detection(self):
+        """停止批量检测（已完成的结果会保存）"""
+        if self.batch_thread is not None:
+            self.batch_thread.stop()
+            self.batch_stop_btn.setEnabled(False)
+    
+    def on_batch_progress(self, info):
+        """更新批量检测进度、吞吐量和剩余时间"""
+        total = max(info['total'], 1)
+        self.progress_bar.setValue(int(info['done'] * 100 / total))
+        eta = "--" if info['eta'] is None else time.strftime('%H:%M:%S', time.gmtime(info['eta']))
+        self.result_label.setText(
+            f"批量检测：{info['done']}/{info['total']}\n"
+            f"速度：{info['rate']:.1f} 张/秒\n"
+            f"失败：{info['failed']}\n"
+            f"剩余时间：{eta}")
+    
+    def on_batch_finished(self, info):
+        """批量检测结束"""
+        self.on_batch_progress(info)
+        if info['done'] >= info['total']:
+            QMessageBox.information(
+                self, "完成", f"批量检测完成：共 {info['total']} 张，失败 {info['failed']} 张")
+    
+    def on_batch_stopped(self):
+        self.batch_btn.setEnabled(True)
+        self.batch_stop_btn.setEnabled(False)
+    
     def run_trend_prediction(self):
         """执行趋势预测"""
         if len(self.image_series) < 2:
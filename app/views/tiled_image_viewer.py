@@ -0,0 +1,285 @@
+import os
+import sys
+import math
+import logging
+from collections import OrderedDict
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+from PyQt5.QtCore import (Qt, QThread, pyqtSignal, pyqtSlot, QPointF, QRectF, QSize,
+                          QMetaObject)
+from PyQt5.QtGui import QPainter, QPixmap, QImageReader
+
+# 添加父目录到系统路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(os.path.dirname(current_dir))
+if app_dir not in sys.path:
+    sys.path.append(app_dir)
+
+from App.config.config import Config
+from App.utils.tile_pyramid import TilePyramid, prune_cache
+from App.utils.memory_governor import get_governor, PRIORITY_CACHE
+
+logger = logging.getLogger(__name__)
+
+
+class PyramidBuildThread(QThread):
+    """后台生成瓦片金字塔"""
+    progress = pyqtSignal(int)
+    built = pyqtSignal(str)  # 图片路径
+    error = pyqtSignal(str)
+
+    def __init__(self, pyramid):
+        super().__init__()
+        self.pyramid = pyramid
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        try:
+            if self.pyramid.generate(self.progress.emit, lambda: self._cancelled):
+                prune_cache(Config.tile_cache_dir, Config.tile_cache_max_mb * 1024 * 1024,
+                            keep=[self.pyramid.directory])
+                self.built.emit(self.pyramid.image_path)
+        except Exception as e:
+            logger.error(f"瓦片生成失败: {str(e)}", exc_info=True)
+            self.error.emit(str(e))
+
+
+class TiledImageViewer(QWidget):
+    """支持缩放/平移的瓦片图像查看器，只解码当前层级可见区域的瓦片"""
+
+    MIN_SCALE_FACTOR = 0.5  # 相对适应窗口比例的最小缩放
+    MAX_SCALE = 8.0  # 最大放大倍数（显示像素 / 原图像素）
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.image_path = None
+        self.pyramid = None
+        self.preview = None  # 瓦片生成前的低分辨率预览
+        self.image_size = QSize()
+        self.scale = 1.0  # 显示像素 / 原图像素
+        self.offset = QPointF(0, 0)  # 窗口左上角对应的原图坐标
+        self._fitted = True  # 是否仍为适应窗口的缩放（用户缩放/平移后为 False）
+        self.text = ""
+        self._drag_pos = None
+        self._build_thread = None
+        self._retired_threads = []  # 已取消但尚未退出的生成线程
+        self._tiles = OrderedDict()  # (level, tx, ty) -> QPixmap
+        self._tile_bytes = 0  # 瓦片缓存占用（供内存管理器在其他线程读取）
+        self.max_tiles = Config.tile_memory_tiles
+        get_governor().register(f"viewer_tiles_{id(self)}", self.tile_memory,
+                                self.shrink_tiles, PRIORITY_CACHE)
+
+    # ---- 对外接口 ----
+    def set_image(self, image_path):
+        """显示图片；瓦片尚未生成时先显示预览并在后台生成，返回是否可读"""
+        self._cancel_build()
+        self.release_tiles()
+        self.pyramid = None
+        self.preview = None
+        self.text = ""
+
+        reader = QImageReader(image_path)
+        size = reader.size()
+        if not reader.canRead() or not size.isValid():
+            self.image_path = None
+            self.setText("图像加载失败")
+            return False
+
+        self.image_path = image_path
+        self.image_size = size
+        pyramid = TilePyramid(image_path, Config.tile_cache_dir, Config.tile_size)
+        if pyramid.ready:
+            self.pyramid = pyramid
+        else:
+            # 按窗口尺寸缩放解码预览（JPEG 可在解码时直接缩放）
+            target = self.size().expandedTo(QSize(500, 500))
+            reader.setScaledSize(size.scaled(target, Qt.KeepAspectRatio))
+            self.preview = QPixmap.fromImage(reader.read())
+            os.makedirs(Config.tile_cache_dir, exist_ok=True)
+            self._build_thread = PyramidBuildThread(pyramid)
+            self._build_thread.built.connect(self._on_pyramid_built)
+            self._build_thread.start()
+        self.fit_to_window()
+        return True
+
+    def setText(self, text):
+        """显示提示文字（与 QLabel 接口保持一致）"""
+        self.text = text
+        self.update()
+
+    def clear(self):
+        self._cancel_build()
+        self.image_path = None
+        self.pyramid = None
+        self.preview = None
+        self.release_tiles()
+        self.update()
+
+    def fit_to_window(self):
+        """缩放到适应窗口并居中"""
+        if not self.image_size.isValid():
+            return
+        self.scale = min(self.width() / self.image_size.width(),
+                         self.height() / self.image_size.height())
+        self.offset = QPointF(
+            (self.image_size.width() - self.width() / self.scale) / 2,
+            (self.image_size.height() - self.height() / self.scale) / 2,
+        )
+        self._fitted = True
+        self.update()
+
+    def release_tiles(self, keep=0):
+        """释放瓦片缓存（保留最近使用的 keep 个），返回释放的数量"""
+        released = 0
+        while len(self._tiles) > keep:
+            self._pop_oldest_tile()
+            released += 1
+        return released
+
+    def tile_memory(self):
+        """瓦片缓存占用的字节数"""
+        return self._tile_bytes
+
+    def shrink_tiles(self, nbytes):
+        """内存管理器回调（可能在后台线程），在 GUI 线程中释放一半瓦片"""
+        estimate = self._tile_bytes // 2
+        QMetaObject.invokeMethod(self, "_release_half_tiles", Qt.QueuedConnection)
+        return estimate
+
+    @pyqtSlot()
+    def _release_half_tiles(self):
+        self.release_tiles(keep=len(self._tiles) // 2)
+
+    # ---- 内部实现 ----
+    def _cancel_build(self):
+        if self._build_thread is not None:
+            thread = self._build_thread
+            thread.cancel()
+            thread.built.disconnect(self._on_pyramid_built)
+            # 保留引用直到线程真正退出，避免线程运行中被回收
+            self._retired_threads.append(thread)
+            thread.finished.connect(lambda t=thread: self._retired_threads.remove(t))
+            self._build_thread = None
+
+    def _on_pyramid_built(self, image_path):
+        if image_path != self.image_path:
+            return
+        self.pyramid = TilePyramid(image_path, Config.tile_cache_dir, Config.tile_size)
+        self._build_thread = None
+        self.update()
+
+    def _pop_oldest_tile(self):
+        _, pixmap = self._tiles.popitem(last=False)
+        self._tile_bytes -= pixmap.width() * pixmap.height() * 4
+
+    def _tile(self, level, tx, ty):
+        key = (level, tx, ty)
+        pixmap = self._tiles.get(key)
+        if pixmap is not None:
+            self._tiles.move_to_end(key)
+            return pixmap
+        image = self.pyramid.load_tile(level, tx, ty)
+        if image is None:
+            return None
+        pixmap = QPixmap.fromImage(image)
+        self._tiles[key] = pixmap
+        self._tile_bytes += pixmap.width() * pixmap.height() * 4
+        # 同时受瓦片数和图片缓存预算限制（预算可能随性能配置变化，每次读取）
+        max_bytes = Config.image_cache_mb * 1024 * 1024
+        while len(self._tiles) > 1 and (len(self._tiles) > self.max_tiles
+                                        or self._tile_bytes > max_bytes):
+            self._pop_oldest_tile()
+        return pixmap
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.palette().window())
+        if self.image_path is None:
+            if self.text:
+                painter.drawText(self.rect(), Qt.AlignCenter, self.text)
+            return
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+
+        if self.pyramid is None:
+            # 瓦片未就绪时绘制预览
+            if self.preview is not None and not self.preview.isNull():
+                painter.drawPixmap(self._to_widget(QRectF(0, 0, self.image_size.width(),
+                                                          self.image_size.height())),
+                                   self.preview, QRectF(self.preview.rect()))
+            return
+
+        # 选择分辨率不低于显示分辨率的最粗层级
+        level = 0
+        if self.scale < 1.0:
+            level = min(self.pyramid.levels - 1, int(math.floor(math.log2(1.0 / self.scale))))
+        level_scale = 2 ** level
+        tile_size = self.pyramid.tile_size
+        cols, rows = self.pyramid.tile_count(level)
+
+        # 可见区域（原图坐标）对应的瓦片范围
+        visible = QRectF(self.offset.x(), self.offset.y(),
+                         self.width() / self.scale, self.height() / self.scale)
+        span = tile_size * level_scale
+        tx0 = max(0, int(visible.left() // span))
+        ty0 = max(0, int(visible.top() // span))
+        tx1 = min(cols - 1, int(visible.right() // span))
+        ty1 = min(rows - 1, int(visible.bottom() // span))
+
+        for ty in range(ty0, ty1 + 1):
+            for tx in range(tx0, tx1 + 1):
+                pixmap = self._tile(level, tx, ty)
+                if pixmap is None:
+                    continue
+                source = QRectF(tx * span, ty * span,
+                                pixmap.width() * level_scale, pixmap.height() * level_scale)
+                painter.drawPixmap(self._to_widget(source), pixmap, QRectF(pixmap.rect()))
+
+    def _to_widget(self, rect):
+        """原图坐标矩形 -> 窗口坐标矩形"""
+        return QRectF((rect.x() - self.offset.x()) * self.scale,
+                      (rect.y() - self.offset.y()) * self.scale,
+                      rect.width() * self.scale, rect.height() * self.scale)
+
+    def wheelEvent(self, event):
+        if self.image_path is None:
+            return
+        factor = 1.25 if event.angleDelta().y() > 0 else 0.8
+        fit = min(self.width() / self.image_size.width(),
+                  self.height() / self.image_size.height())
+        new_scale = max(fit * self.MIN_SCALE_FACTOR, min(self.MAX_SCALE, self.scale * factor))
+        # 以鼠标位置为中心缩放
+        pos = event.pos()
+        anchor = QPointF(self.offset.x() + pos.x() / self.scale,
+                         self.offset.y() + pos.y() / self.scale)
+        self.scale = new_scale
+        self.offset = QPointF(anchor.x() - pos.x() / self.scale,
+                              anchor.y() - pos.y() / self.scale)
+        self._fitted = False
+        self.update()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self._drag_pos = event.pos()
+
+    def mouseMoveEvent(self, event):
+        if self._drag_pos is not None:
+            delta = event.pos() - self._drag_pos
+            self._drag_pos = event.pos()
+            self.offset -= QPointF(delta.x() / self.scale, delta.y() / self.scale)
+            self._fitted = False
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        self._drag_pos = None
+
+    def mouseDoubleClickEvent(self, event):
+        self.fit_to_window()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        # 只在仍为适应窗口缩放时重新适应，保留用户的缩放和平移
+        if self._fitted:
+            self.fit_to_window()